@@ -1,5 +1,6 @@
 import re
-import pandas as pd
+from instrumentation import traced
+from chunk_store import ChunkTable, line_spans
 
 class GeneralDocumentChunker:
     """
@@ -40,35 +41,32 @@ class GeneralDocumentChunker:
         문서를 파싱하여 청크를 나누기 위한 초기 데이터를 생성합니다.
 
         :param text: 파싱할 문서 전체 텍스트
-        :return: 파싱된 청크 리스트
+        :return: 파싱된 청크 테이블 (ChunkTable, 청킹내용은 줄을 '\n'으로 이은 문자열, 원문 위치 포함)
         """
-        lines = text.splitlines()
-        current_chunk = {"분류": "", "세분류": "", "청킹내용": []}
-        chunks = []
+        chunks = ChunkTable(('분류', '세분류'), '청킹내용', spans=True)
+        category, subcategory, content = "", "", []
 
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
+        def add_chunk():
+            start, end = (content[0][1], content[-1][2]) if content else (None, None)
+            chunks.append("\n".join(line[0] for line in content), start, end, 분류=category, 세분류=subcategory)
 
-            section_type, content = self.classify_section(line)
+        for line in line_spans(text):
+            section_type, section = self.classify_section(line[0])
             if section_type == '분류':
-                if current_chunk["분류"]:  # 새로운 분류가 나오면 현재 청크 저장
-                    chunks.append(current_chunk)
-                    current_chunk = {"분류": content, "세분류": "", "청킹내용": []}
-                else:
-                    current_chunk["분류"] = content
+                if category:  # 새로운 분류가 나오면 현재 청크 저장
+                    add_chunk()
+                    subcategory, content = "", []
+                category = section
             elif section_type == '세분류':
-                if current_chunk["세분류"]:  # 새로운 세분류가 나오면 현재 청크 저장
-                    chunks.append(current_chunk)
-                    current_chunk = {"분류": current_chunk["분류"], "세분류": content, "청킹내용": []}
-                else:
-                    current_chunk["세분류"] = content
+                if subcategory:  # 새로운 세분류가 나오면 현재 청크 저장
+                    add_chunk()
+                    content = []
+                subcategory = section
             else:
-                current_chunk["청킹내용"].append(line)
+                content.append(line)
 
-        if current_chunk["분류"]:  # 마지막 청크 저장
-            chunks.append(current_chunk)
+        if category:  # 마지막 청크 저장
+            add_chunk()
 
         return chunks
 
@@ -76,35 +74,33 @@ class GeneralDocumentChunker:
         """
         청킹 처리: 청크 사이즈 초과시 중복 라인을 포함한 새로운 청크를 생성합니다.
 
-        :param chunks: parse_document 메서드에서 생성된 초기 청크 리스트
-        :return: 최종 처리된 청크 리스트
+        :param chunks: parse_document 메서드에서 생성된 초기 청크 테이블
+        :return: 최종 처리된 청크 테이블 (ChunkTable)
         """
-        chunked_data = []
-        buffer = {"분류": "", "세분류": "", "청킹내용": []}
-        
-        for chunk in chunks:
-            current_lines = chunk["청킹내용"]
-
-            if len(buffer["청킹내용"]) + len(current_lines) <= self.max_chunk_size:
-                buffer["청킹내용"].extend(current_lines)
+        chunked_data = ChunkTable(('분류', '세분류'), '청킹내용')
+        category, subcategory, buffer = "", "", []
+
+        for i in range(len(chunks)):
+            content = chunks.content(i)
+            current_lines = content.split("\n") if content else []
+
+            if len(buffer) + len(current_lines) <= self.max_chunk_size:
+                buffer.extend(current_lines)
             else:
-                chunked_data.append(buffer.copy())
+                chunked_data.append("\n".join(buffer), 분류=category, 세분류=subcategory)
 
                 # 중복 라인 포함
-                overlap_lines = buffer["청킹내용"][-self.overlap_lines:] if len(buffer["청킹내용"]) >= self.overlap_lines else buffer["청킹내용"]
-                buffer["청킹내용"] = overlap_lines + current_lines
+                overlap_lines = buffer[-self.overlap_lines:] if len(buffer) >= self.overlap_lines else buffer
+                buffer = overlap_lines + current_lines
 
-            buffer.update({key: chunk[key] for key in ["분류", "세분류"]})
-        
-        if buffer["청킹내용"]:
-            chunked_data.append(buffer)
+            category, subcategory = chunks.value('분류', i), chunks.value('세분류', i)
 
-        # 청킹내용을 다시 하나의 문자열로 변환
-        for chunk in chunked_data:
-            chunk["청킹내용"] = "\n".join(chunk["청킹내용"])
+        if buffer:
+            chunked_data.append("\n".join(buffer), 분류=category, 세분류=subcategory)
 
         return chunked_data
 
+    @traced('chunk')
     def process_document_to_dataframe(self, text):
         """
         문서를 처리하여 데이터프레임으로 반환합니다.
@@ -114,8 +110,7 @@ class GeneralDocumentChunker:
         """
         chunks = self.parse_document(text)
         chunked_data = self.chunk_document(chunks)
-        df = pd.DataFrame(chunked_data)
-        return df
+        return chunked_data.to_pandas()
 
 # 사용 예시
 # insurance_text = """
@@ -1,6 +1,7 @@
 import re
-import pandas as pd
+from instrumentation import traced
 from collections import deque
+from chunk_store import ChunkTable, line_spans
 
 class TermsAndConditionsDocumentProcessor:
     """
@@ -39,53 +40,50 @@ class TermsAndConditionsDocumentProcessor:
         - text: 처리할 문서 텍스트
 
         반환값:
-        - list: 청크 딕셔너리의 리스트
+        - ChunkTable: '분류', '세분류', '청킹내용' 열과 원문 위치를 가진 청크 테이블 (딕셔너리로 순회 가능)
         """
         category_pattern = re.compile(r'제\d{1,2}관\s.+|부표\s*\d+\s+.+', re.IGNORECASE)
         subcategory_pattern = re.compile(r'제\d{1,2}(?:\s*\d+)?조(?:의\d+)?\s.+')
         
-        lines = text.splitlines()
         current_category = ""
         current_subcategory = ""
-        chunks = []
+        chunks = ChunkTable(('분류', '세분류'), '청킹내용', spans=True)
         chunk_content = []
         current_chunk_size = 0
         overlap_buffer = deque(maxlen=self.overlap_lines if self.overlap_lines else 0)
         initial_content = []
 
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-
-            if category_pattern.match(line):
+        # 줄은 (텍스트, 원문 시작, 원문 끝) 튜플로 다룹니다.
+        for line in line_spans(text):
+            line_text = line[0]
+            if category_pattern.match(line_text):
                 if initial_content:
                     self._add_chunk(chunks, current_category, current_subcategory, initial_content + chunk_content, overlap_buffer)
                     initial_content = []
                 else:
                     self._add_chunk(chunks, current_category, current_subcategory, chunk_content, overlap_buffer)
-                current_category = line
+                current_category = line_text
                 current_subcategory = ""
                 chunk_content = []
                 current_chunk_size = 0
-            elif subcategory_pattern.match(line):
+            elif subcategory_pattern.match(line_text):
                 if initial_content:
                     chunk_content = initial_content + chunk_content
                     initial_content = []
                 self._add_chunk(chunks, current_category, current_subcategory, chunk_content, overlap_buffer)
-                current_subcategory = line
+                current_subcategory = line_text
                 chunk_content = [line]
-                current_chunk_size = len(line) + 1
+                current_chunk_size = len(line_text) + 1
             else:
                 if not current_category and not current_subcategory:
                     initial_content.append(line)
                 else:
-                    if self.chunk_size and current_chunk_size + len(line) + 1 > self.chunk_size and chunk_content:
+                    if self.chunk_size and current_chunk_size + len(line_text) + 1 > self.chunk_size and chunk_content:
                         self._add_chunk(chunks, current_category, current_subcategory, chunk_content, overlap_buffer)
                         chunk_content = list(overlap_buffer)
-                        current_chunk_size = sum(len(l) + 1 for l in chunk_content)
+                        current_chunk_size = sum(len(l[0]) + 1 for l in chunk_content)
                     chunk_content.append(line)
-                    current_chunk_size += len(line) + 1
+                    current_chunk_size += len(line_text) + 1
 
             if self.overlap_lines:
                 overlap_buffer.append(line)
@@ -99,28 +97,25 @@ class TermsAndConditionsDocumentProcessor:
     
     def _add_chunk(self, chunks, category, subcategory, content, overlap_buffer):
         """
-        청크를 리스트에 추가합니다.
+        청크를 테이블에 추가합니다.
 
         매개변수:
-        - chunks: 청크 리스트
+        - chunks: 청크 테이블
         - category: 현재 분류
         - subcategory: 현재 세분류
-        - content: 청크 내용
+        - content: 청크 내용 줄 (텍스트, 원문 시작, 원문 끝) 리스트
         - overlap_buffer: 중복 라인 버퍼
         """
         if content:
             if not subcategory:
                 subcategory = category
-            chunk = {
-                "분류": category,
-                "세분류": subcategory,
-                "청킹내용": "\n".join(content).strip()
-            }
-            if chunk["세분류"] != chunk["청킹내용"] and chunk["분류"].strip() and chunk["세분류"].strip():
-                chunks.append(chunk)
+            chunk_text = "\n".join(line[0] for line in content).strip()
+            if subcategory != chunk_text and category.strip() and subcategory.strip():
+                chunks.append(chunk_text, content[0][1], content[-1][2], 분류=category, 세분류=subcategory)
             overlap_buffer.clear()
             overlap_buffer.extend(content[-self.overlap_lines:] if self.overlap_lines else [])
     
+    @traced('chunk')
     def process_document_to_dataframe(self, text):
         """
         문서를 처리하여 DataFrame으로 변환합니다.
@@ -131,8 +126,5 @@ class TermsAndConditionsDocumentProcessor:
         반환값:
         - DataFrame: '분류', '세분류', '청킹내용' 열을 포함하는 DataFrame
         """
-        chunks = self.parse_document(text)
-        df = pd.DataFrame(chunks)
-        # "분류"와 "세분류"가 공백인 행 제거
-        df = df[(df['분류'].str.strip() != '') & (df['세분류'].str.strip() != '')]
-        return df
\ No newline at end of file
+        # 분류와 세분류가 공백인 청크는 parse_document에서 이미 제외됩니다.
+        return self.parse_document(text).to_pandas()
\ No newline at end of file
@@ -0,0 +1,314 @@
+"""
+ko_kiwi BM25 역색인 사전 구축
+
+AutoRAG의 bm25 모듈(bm25_tokenizer: ko_kiwi)은 main.py를 실행할 때마다 corpus 전체를 kiwipiepy로
+다시 토큰화합니다. 약관 corpus에서는 이 토큰화가 retrieval 평가 시간의 대부분을 차지합니다.
+이 모듈은 corpus를 한 번만 (멀티프로세스 kiwi 풀로) 토큰화하여 압축된 역색인을 만들고,
+corpus 해시를 키로 저장합니다.
+
+색인 구조 (index_root/<corpus 해시 앞 16자리>/)
+- meta.json: corpus 해시, 문서 수, 평균 문서 길이
+- vocab.json: 용어 리스트 (용어 id 순서)
+- doc_ids.json: 문서 id 리스트 (문서 번호 순서)
+- doc_hashes.npy: 문서 내용 해시 (증분 갱신 시 변경 여부 판단)
+- doc_lengths.npy: 문서별 토큰 수
+- term_offsets.npy, posting_docs.npy, posting_tfs.npy: 용어별 posting 배열 (CSR 형식)
+
+배열은 np.load(mmap_mode='r')로 읽으므로 trial마다 색인을 메모리에 통째로 올리지 않습니다.
+corpus 일부만 바뀐 경우 index_root/latest.json이 가리키는 이전 색인에서 바뀐 문서만 토큰화하여
+posting을 갱신합니다.
+
+사용법
+    python bm25_index.py build --corpus_path data/corpus.parquet --index_root bm25_index --processes 4
+    python bm25_index.py search --corpus_path data/corpus.parquet --index_root bm25_index --query "보험금 지급사유"
+"""
+
+import hashlib
+import json
+import os
+import pickle
+from collections import Counter
+import multiprocessing
+
+import click
+import numpy as np
+import pandas as pd
+
+_kiwi = None
+
+
+def _init_kiwi():
+    global _kiwi
+    from kiwipiepy import Kiwi
+    _kiwi = Kiwi()
+
+
+def _count_tokens(texts):
+    """워커 프로세스에서 텍스트 묶음을 토큰화하여 문서별 용어 빈도를 돌려줍니다."""
+    if _kiwi is None:
+        _init_kiwi()
+    # AutoRAG의 ko_kiwi 토크나이저와 같은 전처리(strip, lower)를 사용합니다.
+    tokenized = _kiwi.tokenize([text.strip().lower() for text in texts])
+    return [dict(Counter(token.form for token in tokens)) for tokens in tokenized]
+
+
+def tokenize_corpus(texts, processes=None, batch_size=64):
+    """
+    kiwi 프로세스 풀로 텍스트들을 토큰화합니다.
+
+    반환값:
+    - list: 문서별 {용어: 빈도} 딕셔너리
+    """
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+    if processes == 1 or len(batches) <= 1:
+        results = [_count_tokens(batch) for batch in batches]
+    else:
+        # kiwi는 내부 스레드를 사용하므로 fork 대신 spawn으로 워커를 만듭니다.
+        with multiprocessing.get_context('spawn').Pool(processes, initializer=_init_kiwi) as pool:
+            results = pool.map(_count_tokens, batches)
+    return [counts for batch in results for counts in batch]
+
+
+def content_hashes(contents):
+    """문서 내용별 64비트 해시 배열"""
+    return np.array([int.from_bytes(hashlib.sha256(text.encode('utf-8')).digest()[:8], 'little')
+                     for text in contents], dtype=np.uint64)
+
+
+def corpus_hash(doc_ids, hashes):
+    sha = hashlib.sha256()
+    for doc_id in doc_ids:
+        sha.update(str(doc_id).encode('utf-8') + b'\x00')
+    sha.update(np.asarray(hashes, dtype=np.uint64).tobytes())
+    return sha.hexdigest()
+
+
+class BM25Index:
+    """memory-map으로 읽는 BM25 역색인입니다."""
+
+    def __init__(self, index_dir, k1=1.2, b=0.75):
+        self.index_dir = index_dir
+        self.k1 = k1
+        self.b = b
+        with open(os.path.join(index_dir, 'meta.json'), 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+        with open(os.path.join(index_dir, 'vocab.json'), 'r', encoding='utf-8') as f:
+            self.vocab = json.load(f)
+        with open(os.path.join(index_dir, 'doc_ids.json'), 'r', encoding='utf-8') as f:
+            self.doc_ids = json.load(f)
+        self.term_ids = {term: i for i, term in enumerate(self.vocab)}
+        load = lambda name: np.load(os.path.join(index_dir, f'{name}.npy'), mmap_mode='r')
+        self.doc_hashes = load('doc_hashes')
+        self.doc_lengths = load('doc_lengths')
+        self.term_offsets = load('term_offsets')
+        self.posting_docs = load('posting_docs')
+        self.posting_tfs = load('posting_tfs')
+
+    @property
+    def n_docs(self):
+        return len(self.doc_ids)
+
+    def idf(self, term_id):
+        df = self.term_offsets[term_id + 1] - self.term_offsets[term_id]
+        return np.log((self.n_docs - df + 0.5) / (df + 0.5) + 1.0)
+
+    def score_counts(self, term_counts):
+        """질의 하나의 {용어: 빈도}에 대한 전체 문서 BM25 점수 벡터"""
+        scores = np.zeros(self.n_docs, dtype=np.float32)
+        avgdl = self.meta['avg_doc_length'] or 1.0
+        for term, qtf in term_counts.items():
+            term_id = self.term_ids.get(term)
+            if term_id is None:
+                continue
+            start, end = self.term_offsets[term_id], self.term_offsets[term_id + 1]
+            docs = self.posting_docs[start:end]
+            tfs = self.posting_tfs[start:end].astype(np.float32)
+            norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[docs] / avgdl)
+            scores[docs] += qtf * self.idf(term_id) * tfs * (self.k1 + 1) / (tfs + norm)
+        return scores
+
+    def score_matrix(self, queries):
+        """질의 리스트에 대한 (질의 수, 문서 수) 점수 행렬"""
+        return np.stack([self.score_counts(counts) for counts in tokenize_corpus(queries, processes=1)])
+
+    def search(self, query, top_k=3):
+        scores = self.score_matrix([query])[0]
+        top = np.argsort(-scores)[:top_k]
+        return [(self.doc_ids[i], float(scores[i])) for i in top]
+
+    def doc_tokens(self):
+        """문서별 토큰 리스트를 복원합니다 (용어 순서는 보존되지 않지만 BM25에는 영향이 없습니다)."""
+        term_per_posting = np.repeat(np.arange(len(self.vocab)), np.diff(self.term_offsets))
+        order = np.argsort(self.posting_docs, kind='stable')
+        doc_bounds = np.searchsorted(self.posting_docs[order], np.arange(self.n_docs + 1))
+        tokens = []
+        for d in range(self.n_docs):
+            idx = order[doc_bounds[d]:doc_bounds[d + 1]]
+            tokens.append([self.vocab[t] for t, tf in zip(term_per_posting[idx], self.posting_tfs[idx])
+                           for _ in range(tf)])
+        return tokens
+
+
+def _write_index(index_dir, doc_ids, hashes, doc_lengths, vocab, term_ids, posting_docs, posting_tfs):
+    """(용어, 문서, 빈도) posting을 용어별 CSR 배열로 정렬하여 저장합니다."""
+    os.makedirs(index_dir, exist_ok=True)
+    order = np.lexsort((posting_docs, term_ids))
+    term_offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(term_ids, minlength=len(vocab)), out=term_offsets[1:])
+    np.save(os.path.join(index_dir, 'term_offsets.npy'), term_offsets)
+    np.save(os.path.join(index_dir, 'posting_docs.npy'), posting_docs[order].astype(np.int32))
+    np.save(os.path.join(index_dir, 'posting_tfs.npy'), posting_tfs[order].astype(np.int32))
+    np.save(os.path.join(index_dir, 'doc_lengths.npy'), np.asarray(doc_lengths, dtype=np.int32))
+    np.save(os.path.join(index_dir, 'doc_hashes.npy'), np.asarray(hashes, dtype=np.uint64))
+    with open(os.path.join(index_dir, 'vocab.json'), 'w', encoding='utf-8') as f:
+        json.dump(vocab, f, ensure_ascii=False)
+    with open(os.path.join(index_dir, 'doc_ids.json'), 'w', encoding='utf-8') as f:
+        json.dump(list(doc_ids), f, ensure_ascii=False)
+    with open(os.path.join(index_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump({
+            'corpus_hash': corpus_hash(doc_ids, hashes),
+            'tokenizer': 'ko_kiwi',
+            'n_docs': len(doc_ids),
+            'n_terms': len(vocab),
+            'avg_doc_length': float(np.mean(doc_lengths)) if len(doc_lengths) else 0.0,
+        }, f)
+
+
+def _latest_index(index_root):
+    latest_path = os.path.join(index_root, 'latest.json')
+    if not os.path.exists(latest_path):
+        return None
+    with open(latest_path, 'r', encoding='utf-8') as f:
+        index_dir = os.path.join(index_root, json.load(f)['index'])
+    return BM25Index(index_dir) if os.path.exists(os.path.join(index_dir, 'meta.json')) else None
+
+
+def build_index(corpus_df, index_root, processes=None):
+    """
+    corpus에 대한 색인을 찾거나 만듭니다.
+
+    1. 같은 corpus 해시의 색인이 있으면 그대로 사용합니다.
+    2. 이전 색인(latest.json)이 있으면 바뀐 문서만 토큰화하여 posting을 갱신합니다.
+    3. 없으면 전체를 토큰화하여 새로 만듭니다.
+
+    반환값:
+    - str: 색인 디렉토리 경로
+    """
+    doc_ids = corpus_df['doc_id'].tolist()
+    contents = corpus_df['contents'].tolist()
+    hashes = content_hashes(contents)
+    key = corpus_hash(doc_ids, hashes)
+    index_dir = os.path.join(index_root, key[:16])
+    if os.path.exists(os.path.join(index_dir, 'meta.json')):
+        print(f"기존 BM25 색인을 사용합니다: {index_dir}")
+        return index_dir
+
+    base = _latest_index(index_root)
+    reuse = {}
+    if base is not None:
+        reuse = {(doc_id, int(h)): i for i, (doc_id, h) in enumerate(zip(base.doc_ids, base.doc_hashes))}
+    old_to_new = np.full(base.n_docs if base is not None else 0, -1, dtype=np.int64)
+    new_docs = []
+    for i, (doc_id, h) in enumerate(zip(doc_ids, hashes)):
+        old = reuse.get((doc_id, int(h)))
+        if old is None:
+            new_docs.append(i)
+        else:
+            old_to_new[old] = i
+    print(f"BM25 색인: 문서 {len(doc_ids)}개 중 {len(new_docs)}개 토큰화, {len(doc_ids) - len(new_docs)}개 재사용")
+
+    vocab = list(base.vocab) if base is not None else []
+    term_id_of = {term: i for i, term in enumerate(vocab)}
+    doc_lengths = np.zeros(len(doc_ids), dtype=np.int64)
+    term_parts, doc_parts, tf_parts = [], [], []
+
+    if base is not None and (old_to_new >= 0).any():
+        # 유지되는 문서의 posting은 문서 번호만 새 번호로 바꿉니다.
+        old_terms = np.repeat(np.arange(len(base.vocab)), np.diff(base.term_offsets))
+        mapped_docs = old_to_new[np.asarray(base.posting_docs)]
+        keep = mapped_docs >= 0
+        term_parts.append(old_terms[keep])
+        doc_parts.append(mapped_docs[keep])
+        tf_parts.append(np.asarray(base.posting_tfs)[keep])
+        kept_old = np.nonzero(old_to_new >= 0)[0]
+        doc_lengths[old_to_new[kept_old]] = np.asarray(base.doc_lengths)[kept_old]
+
+    if new_docs:
+        term_list, doc_list, tf_list = [], [], []
+        for i, counts in zip(new_docs, tokenize_corpus([contents[i] for i in new_docs], processes)):
+            for term, tf in counts.items():
+                if term not in term_id_of:
+                    term_id_of[term] = len(vocab)
+                    vocab.append(term)
+                term_list.append(term_id_of[term])
+                doc_list.append(i)
+                tf_list.append(tf)
+            doc_lengths[i] = sum(counts.values())
+        term_parts.append(np.array(term_list, dtype=np.int64))
+        doc_parts.append(np.array(doc_list, dtype=np.int64))
+        tf_parts.append(np.array(tf_list, dtype=np.int64))
+
+    concat = lambda parts: np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64)
+    _write_index(index_dir, doc_ids, hashes, doc_lengths, vocab,
+                 concat(term_parts), concat(doc_parts), concat(tf_parts))
+    with open(os.path.join(index_root, 'latest.json'), 'w', encoding='utf-8') as f:
+        json.dump({'index': key[:16]}, f)
+    return index_dir
+
+
+def write_autorag_bm25(index, project_dir, tokenizer='ko_kiwi'):
+    """
+    색인의 토큰을 AutoRAG bm25 모듈이 읽는 pickle(resources/bm25_<tokenizer>.pkl)로 기록합니다.
+    AutoRAG는 pickle에 이미 있는 passage id는 다시 토큰화하지 않습니다.
+    """
+    resources_dir = os.path.join(project_dir, 'resources')
+    os.makedirs(resources_dir, exist_ok=True)
+    pkl_path = os.path.join(resources_dir, f"bm25_{tokenizer.replace('/', '')}.pkl")
+    with open(pkl_path, 'wb') as f:
+        pickle.dump({'tokens': index.doc_tokens(), 'passage_id': list(index.doc_ids),
+                     'tokenizer_name': tokenizer}, f)
+    return pkl_path
+
+
+def config_uses_ko_kiwi(config):
+    """YAML 설정에 bm25_tokenizer: ko_kiwi 인 bm25 모듈이 있는지 확인합니다."""
+    for node_line in config.get('node_lines', []):
+        for node in node_line.get('nodes', []):
+            for module in node.get('modules', []):
+                tokenizer = module.get('bm25_tokenizer')
+                tokenizers = tokenizer if isinstance(tokenizer, list) else [tokenizer]
+                if module.get('module_type') == 'bm25' and 'ko_kiwi' in tokenizers:
+                    return True
+    return False
+
+
+@click.group()
+def cli():
+    pass
+
+
+@cli.command()
+@click.option('--corpus_path', type=click.Path(exists=True), default=os.path.join('data', 'corpus.parquet'))
+@click.option('--index_root', type=click.Path(file_okay=False), default='bm25_index')
+@click.option('--processes', type=int, default=None, help='kiwi 토큰화 프로세스 수 (기본값: CPU 수)')
+def build(corpus_path, index_root, processes):
+    corpus_df = pd.read_parquet(corpus_path, engine='pyarrow', columns=['doc_id', 'contents'])
+    index_dir = build_index(corpus_df, index_root, processes)
+    index = BM25Index(index_dir)
+    print(f"{index_dir}: 문서 {index.n_docs}개, 용어 {len(index.vocab)}개, posting {len(index.posting_docs)}개")
+
+
+@cli.command()
+@click.option('--corpus_path', type=click.Path(exists=True), default=os.path.join('data', 'corpus.parquet'))
+@click.option('--index_root', type=click.Path(file_okay=False), default='bm25_index')
+@click.option('--query', type=str, required=True)
+@click.option('--top_k', type=int, default=3)
+def search(corpus_path, index_root, query, top_k):
+    corpus_df = pd.read_parquet(corpus_path, engine='pyarrow', columns=['doc_id', 'contents'])
+    index = BM25Index(build_index(corpus_df, index_root))
+    for doc_id, score in index.search(query, top_k):
+        print(f"{score:.3f}\t{doc_id}")
+
+
+if __name__ == '__main__':
+    cli()
@@ -0,0 +1,99 @@
+"""
+AutoRAG 임베딩 모델에 영구 임베딩 캐시(embedding_store.EmbeddingStore)를 연결합니다.
+
+config/tutorial_ko.yaml의 vectordb 모듈과 sem_score 지표는 모두 embedding_model: openai 를 사용합니다.
+install_embedding_cache를 호출하면 autorag.embedding_models의 해당 항목이 CachedEmbedding으로 감싸져,
+이미 임베딩한 텍스트는 API 대신 디스크에서 읽습니다.
+"""
+
+from typing import Any, List
+
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from pydantic import PrivateAttr
+
+from embedding_store import EmbeddingStore
+from fake_backends import fake_embeddings
+
+
+class CachedEmbedding(BaseEmbedding):
+    """EmbeddingStore를 거쳐 임베딩을 계산하는 llama_index 임베딩 래퍼입니다."""
+
+    _inner: Any = PrivateAttr()
+    _store: Any = PrivateAttr()
+
+    def __init__(self, inner: BaseEmbedding, store: EmbeddingStore, **kwargs: Any):
+        super().__init__(model_name=inner.model_name, embed_batch_size=inner.embed_batch_size, **kwargs)
+        self._inner = inner
+        self._store = store
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CachedEmbedding"
+
+    @property
+    def store(self) -> EmbeddingStore:
+        return self._store
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self._store.get_or_compute([query], lambda texts: [self._inner.get_query_embedding(texts[0])],
+                                          self.model_name, kind='query')[0].tolist()
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self._get_query_embedding(query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._get_text_embeddings([text])[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return self._store.get_or_compute(texts, self._inner.get_text_embedding_batch,
+                                          self.model_name, kind='text').tolist()
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return self._get_text_embeddings(texts)
+
+
+class FakeEmbedding(BaseEmbedding):
+    """API 호출 없이 결정적인 벡터를 돌려주는 테스트용 임베딩입니다."""
+
+    dim: int = 64
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "FakeEmbedding"
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return fake_embeddings([query], self.dim)[0]
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self._get_query_embedding(query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return fake_embeddings([text], self.dim)[0]
+
+
+def install_embedding_cache(store_dir, names=('openai',)):
+    """
+    autorag.embedding_models의 지정한 항목을 CachedEmbedding으로 교체합니다.
+
+    매개변수:
+    - store_dir: EmbeddingStore 디렉토리
+    - names: 캐시를 적용할 임베딩 모델 이름들
+
+    반환값:
+    - EmbeddingStore: 적중률 통계 확인용 저장소
+    """
+    import autorag
+
+    try:
+        from autorag import LazyInit
+    except ImportError:
+        LazyInit = None
+
+    store = EmbeddingStore(store_dir)
+    for name in names:
+        entry = autorag.embedding_models[name]
+        if LazyInit is not None and isinstance(entry, LazyInit):
+            autorag.embedding_models[name] = LazyInit(lambda entry=entry: CachedEmbedding(entry(), store))
+        else:
+            autorag.embedding_models[name] = CachedEmbedding(entry, store)
+    return store
@@ -0,0 +1,171 @@
+"""
+청커 공용 열 기반(struct-of-arrays) 청크 테이블
+
+TermsAndConditionsDocumentProcessor, GeneralDocumentChunker, pdf_section_extractor의 섹션 분리는
+청크마다 딕셔너리를 만들고 마지막에 DataFrame으로 한 번 더 복사했습니다. ChunkTable은 청크를 열 단위로 바로 쌓습니다.
+- 분류/세분류 같은 범주 문자열: 값마다 한 번만 저장하고 청크에는 int32 코드만 둡니다 (interning).
+- 청크 내용: 하나의 UTF-8 버퍼와 int64 오프셋 (Arrow large_string과 같은 배치)
+- 페이지 번호, 원문 문자 위치 같은 정수 열: int64 배열
+
+to_arrow()는 버퍼를 복사하지 않고 Arrow 테이블을 만들고 (범주 열은 dictionary 타입), to_pandas()는 그 테이블을 변환합니다.
+기존 코드와의 호환을 위해 청크를 딕셔너리로 순회(for chunk in table, table[i])할 수도 있습니다.
+
+원문 위치(start_char_idx, end_char_idx)는 청크 내용의 첫 줄 시작과 마지막 줄 끝의 원문 문자 위치입니다.
+딕셔너리 순회와 기본 to_arrow()에는 넣지 않으며 include_spans=True로 함께 내보냅니다.
+"""
+
+from array import array
+
+from lazy_import import lazy_module
+
+pa = lazy_module('pyarrow')
+pd = lazy_module('pandas')
+
+SPAN_FIELDS = ('start_char_idx', 'end_char_idx')
+
+
+class ChunkTable:
+    """
+    열 기반 청크 테이블입니다.
+
+    매개변수:
+    - category_fields: 범주(문자열) 열 이름들 (예: ('분류', '세분류'))
+    - content_field: 청크 내용 열 이름 (예: '청킹내용')
+    - integer_fields: 정수 열 이름들 (예: ('Page', 'EndPage'))
+    - spans: 원문 문자 위치 열을 둘지 여부
+    """
+
+    def __init__(self, category_fields, content_field, integer_fields=(), spans=False):
+        self.category_fields = tuple(category_fields)
+        self.content_field = content_field
+        self.integer_fields = tuple(integer_fields)
+        self.fields = self.category_fields + self.integer_fields + (content_field,)
+        self._codes = {field: array('i') for field in self.category_fields}
+        self._pools = {field: {} for field in self.category_fields}
+        self._values = {field: [] for field in self.category_fields}
+        self._integers = {field: array('q') for field in self.integer_fields}
+        self._spans = {field: array('q') for field in SPAN_FIELDS} if spans else None
+        self._content = bytearray()
+        self._offsets = array('q', [0])
+        self._exported = False
+
+    def append(self, content, start=None, end=None, **fields):
+        """
+        청크 하나를 추가합니다.
+
+        매개변수:
+        - content: 청크 내용 문자열
+        - start, end: 원문 문자 위치 (spans=True인 테이블에서만, 모르면 -1)
+        - fields: 범주 열과 정수 열 값 (열 이름=값)
+        """
+        if self._exported:
+            raise ValueError("to_arrow()로 내보낸 ChunkTable에는 청크를 추가할 수 없습니다.")
+        for field in self.category_fields:
+            value = fields[field]
+            pool = self._pools[field]
+            code = pool.get(value)
+            if code is None:
+                code = pool[value] = len(self._values[field])
+                self._values[field].append(value)
+            self._codes[field].append(code)
+        for field in self.integer_fields:
+            self._integers[field].append(fields[field])
+        if self._spans is not None:
+            self._spans['start_char_idx'].append(-1 if start is None else start)
+            self._spans['end_char_idx'].append(-1 if end is None else end)
+        self._content += content.encode('utf-8')
+        self._offsets.append(len(self._content))
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def content(self, i):
+        return self._content[self._offsets[i]:self._offsets[i + 1]].decode('utf-8')
+
+    def value(self, field, i):
+        """i번째 청크의 열 값"""
+        if field == self.content_field:
+            return self.content(i)
+        if field in self._codes:
+            return self._values[field][self._codes[field][i]]
+        if field in self._integers:
+            return self._integers[field][i]
+        return self._spans[field][i]
+
+    def span(self, i):
+        """i번째 청크의 원문 위치 (start, end). 위치를 모르면 None"""
+        if self._spans is None or self._spans['start_char_idx'][i] < 0:
+            return None
+        return self._spans['start_char_idx'][i], self._spans['end_char_idx'][i]
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return {field: self.value(field, i) for field in self.fields}
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def column(self, field):
+        """열 값 리스트 (범주 열은 같은 문자열 객체를 공유합니다)"""
+        if field in self._codes:
+            values = self._values[field]
+            return [values[code] for code in self._codes[field]]
+        return [self.value(field, i) for i in range(len(self))]
+
+    def to_arrow(self, include_spans=False):
+        """
+        버퍼를 복사하지 않고 Arrow 테이블로 변환합니다. 내보낸 뒤에는 청크를 추가할 수 없습니다.
+        열 순서는 범주 열, 정수 열, 내용 열 (include_spans=True면 원문 위치 열) 순입니다.
+        """
+        self._exported = True
+        count = len(self)
+        columns, names = [], []
+        for field in self.category_fields:
+            indices = pa.Array.from_buffers(pa.int32(), count, [None, pa.py_buffer(self._codes[field])])
+            columns.append(pa.DictionaryArray.from_arrays(indices, pa.array(self._values[field], pa.string())))
+            names.append(field)
+        for field, values in self._integers.items():
+            columns.append(pa.Array.from_buffers(pa.int64(), count, [None, pa.py_buffer(values)]))
+            names.append(field)
+        columns.append(pa.LargeStringArray.from_buffers(count, pa.py_buffer(self._offsets),
+                                                        pa.py_buffer(self._content)))
+        names.append(self.content_field)
+        if include_spans and self._spans is not None:
+            for field in SPAN_FIELDS:
+                columns.append(pa.Array.from_buffers(pa.int64(), count, [None, pa.py_buffer(self._spans[field])]))
+                names.append(field)
+        return pa.Table.from_arrays(columns, names=names)
+
+    def to_pandas(self, include_spans=False, arrow_dtypes=False):
+        """
+        DataFrame으로 변환합니다. 범주 열은 Categorical이 됩니다.
+
+        매개변수:
+        - include_spans: 원문 위치 열 포함 여부
+        - arrow_dtypes: True면 pandas ArrowDtype 열로 만들어 내용 버퍼까지 복사하지 않습니다.
+        """
+        table = self.to_arrow(include_spans)
+        if arrow_dtypes:
+            return table.to_pandas(types_mapper=pd.ArrowDtype)
+        return table.to_pandas()
+
+
+def line_spans(text):
+    """
+    빈 줄을 뺀 줄들을 앞뒤 공백을 지워 원문 위치와 함께 하나씩 돌려줍니다.
+
+    반환값:
+    - generator: (줄, 시작, 끝) 튜플
+    """
+    position = 0
+    for line in text.splitlines():
+        line = line.strip()
+        if line:
+            # 앞 줄 끝과 이 줄 사이에는 공백뿐이므로 처음 찾은 위치가 이 줄의 위치입니다.
+            position = text.find(line, position)
+            yield line, position, position + len(line)
+            position += len(line)
@@ -28,6 +28,8 @@ import pandas as pd
 import time
 from langchain_upstage import UpstageLayoutAnalysisLoader
 from rainbow_html_transformer import HTMLToTextWithMarkdownTables
+from document_router import route_documents
+from instrumentation import span, tracer
 
 
 # 1. 문서 유형별 키워드 Json 파일 및 PDF 파일 읽기
@@ -58,14 +60,17 @@ def get_pdf_files(folder_path):
 def extract_text_from_pdf(pdf_path, max_pages=3):
     extracted_text = []
     try:
-        doc = fitz.open(pdf_path)
-        print(f"{pdf_path} 페이지 수", len(doc))
-
-        for page_num in range(max_pages):
-            page_content = doc[page_num].get_text()
-            extracted_text.append(page_content)
-        
-        doc.close()
+        with span('extract_text', document=os.path.basename(pdf_path)) as extract_span:
+            doc = fitz.open(pdf_path)
+            print(f"{pdf_path} 페이지 수", len(doc))
+
+            for page_num in range(max_pages):
+                page_content = doc[page_num].get_text()
+                extracted_text.append(page_content)
+                extract_span.count('pages')
+                extract_span.count('bytes', len(page_content.encode('utf-8')))
+            
+            doc.close()
     except Exception as e:
         print(f"Error processing {pdf_path}: {e}")
 
@@ -73,11 +78,14 @@ def extract_text_from_pdf(pdf_path, max_pages=3):
 
     return ' '.join(extracted_text)
 
-def extract_text_with_ocr(pdf_path, max_pages=3):
+def extract_text_with_ocr(pdf_path, max_pages=3, html_transformer=None):
     extracted_text = []
+    html_transformer = html_transformer or HTMLToTextWithMarkdownTables()
     try:
         # PDF를 이미지로 변환
-        images = convert_from_path(pdf_path, first_page=1, last_page=max_pages)
+        with span('rasterize', document=os.path.basename(pdf_path)) as rasterize_span:
+            images = convert_from_path(pdf_path, first_page=1, last_page=max_pages)
+            rasterize_span.count('pages', len(images))
         
         for i, img in enumerate(images):
             with tempfile.NamedTemporaryFile(delete=False, suffix='.png') as temp_file:
@@ -85,16 +93,19 @@ def extract_text_with_ocr(pdf_path, max_pages=3):
                 temp_file_path = temp_file.name
             
             try:
-                loader = UpstageLayoutAnalysisLoader(
-                    file_path=temp_file_path,
-                    use_ocr=True
-                )
-                documents = loader.load()
+                with span('layout_analysis', document=os.path.basename(pdf_path), page=i + 1) as layout_span:
+                    loader = UpstageLayoutAnalysisLoader(
+                        file_path=temp_file_path,
+                        use_ocr=True
+                    )
+                    documents = loader.load()
+                    layout_span.count('pages')
+                    layout_span.count('bytes', os.path.getsize(temp_file_path))
                 
-                html_transformer = HTMLToTextWithMarkdownTables()
                 for doc in documents:
                     # HTML 태그 제거
-                    transformed_doc = html_transformer.transform_documents([doc])[0]
+                    with span('html_transform', document=os.path.basename(pdf_path)):
+                        transformed_doc = html_transformer.transform_documents([doc])[0]
                     extracted_text.append(transformed_doc.page_content)
             finally:
                 os.unlink(temp_file_path)
@@ -105,25 +116,40 @@ def extract_text_with_ocr(pdf_path, max_pages=3):
     return ' '.join(extracted_text)
 
 # 3. 문서 유형 분류
+def compile_document_classes(document_classes):
+    """
+    문서 유형별 키워드를 유형마다 하나의 정규식으로 미리 컴파일함 (ingest_daemon 워커가 한 번만 수행)
+    document_classes : 문서 유형별 키워드
+    반환 : (분류 결과 값, 컴파일된 정규식) 리스트
+    """
+    return [(keywords[0], re.compile('|'.join(f'(?:{keyword})' for keyword in keywords), re.IGNORECASE))
+            for keywords in document_classes.values()]
+
 def classify_document(text, document_classes):
     """
     문서 유형 분류
     text : 텍스트
-    document_classes : 문서 유형별 키워드
+    document_classes : 문서 유형별 키워드 (또는 compile_document_classes 결과)
     반환 : 분류된 문서 유형
     """
+    if isinstance(document_classes, list):
+        for doc_type, pattern in document_classes:
+            if pattern.search(text):
+                return doc_type
+        return "Unknown"
     for doc_type, keywords in document_classes.items():
         if any(re.search(keyword, text, re.IGNORECASE) for keyword in keywords):
             return keywords[0]  # 키워드 리스트의 첫 번째 값 반환
     return "Unknown"
 
 # 4. & 5. 문서 분류 및 결과 저장
-def classify_documents(folder_path, json_path, output_path):
+def classify_documents(folder_path, json_path, output_path, use_routing=True):
     """
     문서 분류 및 결과 저장
     folder_path : PDF 파일이 있는 폴더 경로
     json_path : 문서 유형별 키워드 Json 파일 경로
     output_path : 분류 결과 엑셀 파일 경로
+    use_routing : 참이면 다운로드 계획과 파일 이름으로 먼저 분류하고(document_router.py), 정하지 못한 파일만 PDF를 읽어 분류
     """
     print("Starting document classification process...")
     start_time = time.time()
@@ -137,33 +163,54 @@ def classify_documents(folder_path, json_path, output_path):
     print(f"Found {len(pdf_files)} PDF files to process.")
     
     results = []
+    routed = {}
+    if use_routing:
+        with span('route') as route_span:
+            routes = route_documents(folder_path, pdf_files, document_classes)
+            routes = routes[routes['document_type'].notna()]
+            routed = dict(zip(routes['file_name'], zip(routes['document_type'], routes['routed_by'])))
+            route_span.count('routed', len(routed))
+        print(f"Routed {len(routed)} of {len(pdf_files)} files without reading the PDF.")
 
     for i, pdf_file in enumerate(pdf_files, 1):
         print(f"Processing file {i} of {len(pdf_files)}: {pdf_file}")
         pdf_path = os.path.join(folder_path, pdf_file)
+        if pdf_file in routed:
+            doc_type, routed_by = routed[pdf_file]
+            results.append({'File Name': pdf_file, 'Document Type': doc_type, 'Classified By': routed_by})
+            print(f"Classified as: {doc_type} ({routed_by})")
+            continue
         
         print("Extracting text from PDF...")
         text = extract_text_from_pdf(pdf_path)
         
         print("Classifying document...")
-        doc_type = classify_document(text, document_classes)
+        with span('classify', document=pdf_file):
+            doc_type = classify_document(text, document_classes)
+        classified_by = 'content'
     
         if doc_type == "Unknown":
             print(f"Document type unknown. Attempting OCR processing for {pdf_file}")
             ocr_text = extract_text_with_ocr(pdf_path)
-            doc_type = classify_document(ocr_text, document_classes)
+            with span('classify', document=pdf_file) as classify_span:
+                doc_type = classify_document(ocr_text, document_classes)
+                classify_span.count('ocr_fallbacks')
+            classified_by = 'ocr'
                     
-        results.append({'File Name': pdf_file, 'Document Type': doc_type})
+        results.append({'File Name': pdf_file, 'Document Type': doc_type, 'Classified By': classified_by})
         print(f"Classified as: {doc_type}")
 
     print("Creating DataFrame and saving to Excel...")
     df = pd.DataFrame(results)
-    df.to_excel(output_path, index=False)
+    with span('write', document=output_path):
+        df.to_excel(output_path, index=False)
     
     end_time = time.time()
     elapsed_time = end_time - start_time
     print(f"Classification results saved to {output_path}")
     print(f"Total time taken: {elapsed_time:.2f} seconds")
+    if tracer.enabled:
+        tracer.print_summary()
     return elapsed_time
 
 if __name__ == "__main__":
@@ -0,0 +1,224 @@
+"""
+corpus / QA Parquet 입출력
+
+pandas 기본 설정(snappy, 전체 열 사전 인코딩 시도, 단일 row group)으로 쓰던 corpus/qa parquet를
+읽는 쪽에 맞게 배치합니다.
+- 압축: zstd
+- 사전(dictionary) 인코딩: 반복되는 메타데이터(source, 분류, 세분류 등)에만 사용하고,
+  값이 모두 다른 doc_id/contents는 사전 인코딩을 시도하지 않습니다.
+- corpus에는 metadata['source']를 최상위 'source' 범주형 열로도 저장하고 source 순서로 정렬하므로,
+  row group 통계로 특정 문서(상품)의 행만 읽을 수 있습니다 (predicate pushdown).
+- row group은 row_group_mb 크기에 맞춰 나누고 페이지 색인을 기록합니다.
+
+읽기는 read_corpus/read_qa로 필요한 열만(column projection), 필요한 source만 읽습니다.
+    corpus_df = read_corpus('data/corpus.parquet', columns=['doc_id', 'contents'])
+    product_df = read_corpus('data/corpus.parquet', sources=['processed_txt/약관_P1.txt'])
+
+기존 파일 변환 (parquet 또는 new_data의 csv)
+    python corpus_io.py convert new_data/corpus.csv new_data/corpus.parquet --kind corpus
+    python corpus_io.py inspect new_data/corpus.parquet
+"""
+
+import ast
+import os
+import re
+
+import click
+
+from lazy_import import lazy_module
+
+pd = lazy_module('pandas')
+pa = lazy_module('pyarrow')
+pq = lazy_module('pyarrow.parquet')
+
+COMPRESSION = 'zstd'
+COMPRESSION_LEVEL = 6
+ROW_GROUP_MB = 32
+# corpus에서 사전 인코딩할 최상위 열 (존재하는 열만 사용). metadata의 하위 필드는 모두 사전 인코딩합니다.
+CORPUS_DICTIONARY_COLUMNS = ['source', 'parent_id', '분류', '세분류']
+# source로 사용할 metadata 키 (앞에서부터 처음 있는 값)
+SOURCE_KEYS = ('source', 'file_path', 'file_name')
+
+
+def _rows_per_group(table, row_group_mb):
+    average_row_bytes = table.nbytes / max(table.num_rows, 1)
+    return max(1024, int(row_group_mb * 1e6 / max(average_row_bytes, 1)))
+
+
+def _leaf_paths(schema, prefix=''):
+    paths = []
+    for field in schema:
+        path = f'{prefix}{field.name}'
+        if pa.types.is_struct(field.type):
+            paths += _leaf_paths(field.type, path + '.')
+        else:
+            paths.append(path)
+    return paths
+
+
+def write_table(df, path, dictionary_columns=(), sort_by=None, row_group_mb=ROW_GROUP_MB,
+                compression_level=COMPRESSION_LEVEL):
+    """
+    DataFrame을 최적화된 Parquet 배치로 저장합니다.
+
+    매개변수:
+    - df: 저장할 DataFrame
+    - path: 저장 경로
+    - dictionary_columns: 사전 인코딩할 열 경로 (중첩 필드는 'metadata.source' 형식)
+    - sort_by: 정렬 기준 열 이름 (같은 값 안에서는 원래 순서 유지)
+    - row_group_mb: row group 목표 크기 (MB, 압축 전)
+    - compression_level: zstd 압축 수준
+    """
+    if sort_by is not None and sort_by in df.columns:
+        df = df.sort_values(sort_by, kind='stable')
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    leaves = set(_leaf_paths(table.schema))
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    pq.write_table(
+        table, path,
+        compression=COMPRESSION,
+        compression_level=compression_level,
+        use_dictionary=[column for column in dictionary_columns if column in leaves] or False,
+        row_group_size=_rows_per_group(table, row_group_mb),
+        write_statistics=True,
+        write_page_index=True,
+    )
+
+
+def _metadata_source(metadata):
+    if not isinstance(metadata, dict):
+        return None
+    return next((metadata[key] for key in SOURCE_KEYS if metadata.get(key)), None)
+
+
+def write_corpus(corpus_df, path, **kwargs):
+    """
+    AutoRAG corpus(doc_id, contents, metadata[, ...])를 저장합니다.
+    metadata의 source(없으면 file_path, file_name)로 최상위 범주형 'source' 열을 추가하고 source 순서로 정렬합니다.
+    """
+    if 'source' not in corpus_df.columns and 'metadata' in corpus_df.columns:
+        sources = corpus_df['metadata'].map(_metadata_source)
+        if sources.notna().any():
+            corpus_df = corpus_df.assign(source=sources.astype('category'))
+    metadata_leaves = [path for path in _leaf_paths(pa.Schema.from_pandas(corpus_df.head(1), preserve_index=False))
+                       if path.startswith('metadata.')]
+    write_table(corpus_df, path, dictionary_columns=CORPUS_DICTIONARY_COLUMNS + metadata_leaves, sort_by='source',
+                **kwargs)
+
+
+def write_qa(qa_df, path, **kwargs):
+    """AutoRAG QA(qid, query, retrieval_gt, generation_gt)를 저장합니다."""
+    write_table(qa_df, path, **kwargs)
+
+
+def read_corpus(path, columns=None, sources=None, filters=None):
+    """
+    corpus parquet를 읽습니다.
+
+    매개변수:
+    - path: parquet 경로
+    - columns: 읽을 열 리스트 (None이면 전체)
+    - sources: 읽을 source 값 리스트 (None이면 전체). 'source' 열이 있으면 row group 통계로 걸러 읽고,
+      없는 이전 형식 파일은 읽은 뒤 metadata로 거릅니다.
+    - filters: pyarrow 형식의 추가 필터 (예: [('parent_id', '==', ...)])
+
+    반환값:
+    - DataFrame
+    """
+    schema_names = pq.read_schema(path).names
+    filters = list(filters or [])
+    post_filter = None
+    if sources is not None:
+        if 'source' in schema_names:
+            filters.append(('source', 'in', list(sources)))
+        else:
+            post_filter = set(sources)
+    read_columns = columns
+    if post_filter is not None and columns is not None and 'metadata' not in columns:
+        read_columns = list(columns) + ['metadata']
+    table = pq.read_table(path, columns=read_columns, filters=filters or None,
+                          read_dictionary=[c for c in ['source'] if c in schema_names and
+                                           (read_columns is None or c in read_columns)])
+    df = table.to_pandas()
+    if post_filter is not None:
+        # source 열이 없는 이전 형식의 파일은 읽은 뒤 metadata로 거릅니다.
+        df = df[df['metadata'].map(_metadata_source).isin(post_filter)].reset_index(drop=True)
+        if columns is not None and 'metadata' not in columns:
+            df = df.drop(columns=['metadata'])
+    return df
+
+
+def read_qa(path, columns=None):
+    return pq.read_table(path, columns=columns).to_pandas()
+
+
+_datetime_repr = re.compile(r'datetime\.datetime\(([\d,\s]+)\)')
+
+
+def _parse_literal(text):
+    """csv에 저장된 파이썬 repr(리스트, datetime.datetime(...)을 포함한 딕셔너리)을 값으로 되돌립니다."""
+    if not isinstance(text, str):
+        return text
+    converted = _datetime_repr.sub(lambda m: repr('__datetime__' + m.group(1)), text)
+    value = ast.literal_eval(converted)
+
+    def restore(item):
+        if isinstance(item, str) and item.startswith('__datetime__'):
+            return pd.Timestamp(*[int(part) for part in item[len('__datetime__'):].split(',')]).to_pydatetime()
+        if isinstance(item, dict):
+            return {key: restore(v) for key, v in item.items()}
+        if isinstance(item, list):
+            return [restore(v) for v in item]
+        return item
+    return restore(value)
+
+
+def load_any(path, kind):
+    """parquet 또는 (new_data의) csv 파일을 AutoRAG 형식 DataFrame으로 읽습니다."""
+    if path.endswith('.csv'):
+        df = pd.read_csv(path)
+        literal_columns = ['metadata'] if kind == 'corpus' else ['retrieval_gt', 'generation_gt']
+        for column in literal_columns:
+            if column in df.columns:
+                df[column] = df[column].map(_parse_literal)
+        return df
+    return pd.read_parquet(path)
+
+
+@click.group()
+def cli():
+    pass
+
+
+@cli.command()
+@click.argument('input_path', type=click.Path(exists=True, dir_okay=False))
+@click.argument('output_path', type=click.Path(dir_okay=False))
+@click.option('--kind', type=click.Choice(['corpus', 'qa']), default='corpus')
+@click.option('--row_group_mb', type=float, default=ROW_GROUP_MB)
+def convert(input_path, output_path, kind, row_group_mb):
+    """기존 parquet/csv를 최적화된 배치로 다시 씁니다."""
+    df = load_any(input_path, kind)
+    if kind == 'corpus':
+        write_corpus(df, output_path, row_group_mb=row_group_mb)
+    else:
+        write_qa(df, output_path, row_group_mb=row_group_mb)
+    print(f"{input_path} ({os.path.getsize(input_path) / 1e6:.2f}MB) → "
+          f"{output_path} ({os.path.getsize(output_path) / 1e6:.2f}MB), {len(df)}행")
+
+
+@cli.command()
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+def inspect(path):
+    """row group과 열별 인코딩/압축 크기를 출력합니다."""
+    metadata = pq.ParquetFile(path).metadata
+    print(f"{path}: {metadata.num_rows}행, row group {metadata.num_row_groups}개")
+    for column_index in range(metadata.num_columns):
+        chunks = [metadata.row_group(i).column(column_index) for i in range(metadata.num_row_groups)]
+        compressed = sum(chunk.total_compressed_size for chunk in chunks)
+        uncompressed = sum(chunk.total_uncompressed_size for chunk in chunks)
+        print(f"  {chunks[0].path_in_schema:40s} {chunks[0].compression:6s} {compressed / 1e3:9.1f}KB "
+              f"(압축 전 {uncompressed / 1e3:9.1f}KB) {','.join(chunks[0].encodings)}")
+
+
+if __name__ == '__main__':
+    cli()
@@ -0,0 +1,148 @@
+"""
+메타데이터 우선 문서 유형 라우팅
+
+classify_documents.py는 사업방법서/상품요약서/약관을 구분하려고 PDF를 열고 (실패하면 OCR까지) 텍스트를 읽습니다.
+하지만 대부분의 파일은 PDF를 열지 않고도 유형을 알 수 있습니다.
+1. 다운로드 계획 (download_plan.py가 PDF 폴더에 저장하는 download_plan.parquet)에 URL이 어느 열('요약서', '방법서', '약관')에서
+   왔는지가 기록되어 있습니다.
+2. 파일 이름에 '상품요약서_', '사업방법서_', '판매약관_' 같은 접두어가 있습니다.
+두 단계 모두에서 유형이 하나로 정해지지 않는 파일만 내용 기반 분류(classify_documents.classify_document)로 보냅니다.
+
+유형 값은 분류에 쓰는 document_class.json의 키워드 리스트 첫 번째 값(classify_document의 반환값)이므로
+두 분류 방식이 같은 값을 씁니다. 호출하는 쪽이 같은 json에서 읽은 문서 유형을 넘기며, json에 없는 유형은 라우팅하지 않고
+내용 기반 분류로 보냅니다.
+
+사용법
+    python document_router.py --dir_path ./raw_docs --document_class_path document_class.json
+"""
+
+import json
+import os
+import re
+
+import click
+
+from lazy_import import lazy_module
+
+pd = lazy_module('pandas')
+
+MANIFEST_NAME = 'download_plan.parquet'
+DOCUMENT_CLASS_PATH = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'document_class.json')
+# document_class.json의 유형 키 → 다운로드 계획의 URL 열 이름 (파일 이름 규칙으로도 사용)
+ROUTING_TOKENS = {'product_summary': '요약서', 'business_method_document': '방법서', 'terms_and_conditions': '약관'}
+
+
+def make_routing(document_classes):
+    """
+    문서 유형별 키워드(document_class.json 내용)로 라우팅 규칙을 만듭니다.
+
+    매개변수:
+    - document_classes: 문서 유형 키 → 키워드 리스트 딕셔너리
+
+    반환값:
+    - (URL 열 → 문서 유형, 문서 유형 → 파일 이름 패턴) 튜플
+    """
+    tokens = {key: token for key, token in ROUTING_TOKENS.items() if document_classes.get(key)}
+    column_types = {token: document_classes[key][0] for key, token in tokens.items()}
+    filename_patterns = {document_classes[key][0]: re.compile(re.escape(token)) for key, token in tokens.items()}
+    return column_types, filename_patterns
+
+
+_manifest_cache = {}
+
+
+def load_manifest(pdf_dir, column_types):
+    """
+    PDF 폴더의 다운로드 계획에서 파일 이름 → 문서 유형 딕셔너리를 만듭니다.
+    같은 파일이 서로 다른 유형의 열에서 참조되면 모호하므로 제외합니다. 계획 파일이 바뀌면 다시 읽습니다.
+
+    매개변수:
+    - pdf_dir: PDF 폴더 경로
+    - column_types: URL 열 → 문서 유형 딕셔너리 (make_routing의 반환값)
+
+    반환값:
+    - dict: 파일 이름 → 문서 유형 (계획 파일이 없으면 빈 딕셔너리)
+    """
+    manifest_path = os.path.join(pdf_dir, MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        return {}
+    mtime = os.path.getmtime(manifest_path)
+    cache_key = (manifest_path, tuple(sorted(column_types.items())))
+    cached = _manifest_cache.get(cache_key)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    mapping = pd.read_parquet(manifest_path, columns=['file_name', 'url_column'])
+    mapping['document_type'] = mapping['url_column'].astype(str).map(column_types)
+    mapping = mapping.dropna(subset=['document_type']).drop_duplicates(['file_name', 'document_type'])
+    unambiguous = mapping.drop_duplicates('file_name', keep=False)
+    manifest = dict(zip(unambiguous['file_name'], unambiguous['document_type']))
+    _manifest_cache[cache_key] = (mtime, manifest)
+    return manifest
+
+
+def route_by_filename(file_name, filename_patterns):
+    """파일 이름 규칙으로 유형을 정합니다. 맞는 유형이 없거나 둘 이상이면 None"""
+    matches = [doc_type for doc_type, pattern in filename_patterns.items() if pattern.search(file_name)]
+    return matches[0] if len(matches) == 1 else None
+
+
+def route_document(pdf_path, document_classes):
+    """
+    PDF를 열지 않고 문서 유형을 정합니다.
+
+    매개변수:
+    - pdf_path: PDF 파일 경로
+    - document_classes: 내용 기반 분류에 쓰는 문서 유형별 키워드 (load_document_classes의 반환값)
+
+    반환값:
+    - (문서 유형, 근거) 튜플. 근거는 'manifest' 또는 'filename', 정하지 못하면 (None, None)
+    """
+    column_types, filename_patterns = make_routing(document_classes)
+    file_name = os.path.basename(pdf_path)
+    doc_type = load_manifest(os.path.dirname(pdf_path) or '.', column_types).get(file_name)
+    if doc_type is not None:
+        return doc_type, 'manifest'
+    doc_type = route_by_filename(file_name, filename_patterns)
+    return (doc_type, 'filename') if doc_type is not None else (None, None)
+
+
+def route_documents(pdf_dir, file_names, document_classes):
+    """
+    폴더의 PDF 파일들을 한 번에 라우팅합니다.
+
+    매개변수:
+    - pdf_dir: PDF 폴더 경로
+    - file_names: PDF 파일 이름 리스트
+    - document_classes: 내용 기반 분류에 쓰는 문서 유형별 키워드 (load_document_classes의 반환값)
+
+    반환값:
+    - DataFrame: file_name, document_type, routed_by 열 (정하지 못한 파일은 document_type이 None)
+    """
+    column_types, filename_patterns = make_routing(document_classes)
+    routes = pd.DataFrame({'file_name': list(file_names)})
+    routes['document_type'] = routes['file_name'].map(load_manifest(pdf_dir, column_types))
+    routes['routed_by'] = routes['document_type'].notna().map({True: 'manifest', False: None})
+    unresolved = routes['document_type'].isna()
+    by_name = routes.loc[unresolved, 'file_name'].map(lambda file_name: route_by_filename(file_name, filename_patterns))
+    routes.loc[by_name.index, 'document_type'] = by_name
+    routes.loc[by_name[by_name.notna()].index, 'routed_by'] = 'filename'
+    routes['document_type'] = routes['document_type'].astype(object).where(routes['document_type'].notna(), None)
+    return routes
+
+
+@click.command()
+@click.option('--dir_path', type=click.Path(exists=True, file_okay=False), default='./raw_docs')
+@click.option('--document_class_path', type=click.Path(exists=True, dir_okay=False), default=DOCUMENT_CLASS_PATH)
+def main(dir_path, document_class_path):
+    with open(document_class_path, 'r', encoding='utf-8') as f:
+        document_classes = json.load(f)
+    file_names = sorted(f for f in os.listdir(dir_path) if f.lower().endswith('.pdf'))
+    routes = route_documents(dir_path, file_names, document_classes)
+    counts = routes['routed_by'].fillna('content').value_counts()
+    print(routes.to_string(index=False))
+    print(f"PDF {len(routes)}개 중 계획 {counts.get('manifest', 0)}개, 파일 이름 {counts.get('filename', 0)}개, "
+          f"내용 분류 필요 {counts.get('content', 0)}개")
+
+
+if __name__ == '__main__':
+    main()
@@ -30,29 +30,37 @@ Download pdf files from excel file
 - 파일명에 한글이 포함되어 있어 unquote를 사용하여 URL 디코딩을 수행합니다.
 - 오류 처리를 포함하여 안정적으로 다운로드를 수행합니다.
 
+7. 다운로드 계획 (download_plan.py):
+- 엑셀 외에 CSV/Parquet 상품 목록도 읽습니다.
+- URL 열을 한 번에 펼쳐 중복 URL은 한 번만 내려받습니다.
+- 파일 이름에 URL 해시를 붙여, 파일 이름이 같은 다른 상품의 PDF가 서로 덮어쓰지 않습니다.
+- 상품 행 → 파일 대응을 output_dir/download_plan.parquet에 저장합니다.
+- 이미 받은 파일은 건너뛰므로 중단된 다운로드를 이어서 할 수 있습니다.
+
 사용법
 python download_pdf.py --excel_path custom.xlsx --output_dir custom_pdfs --url_columns 요약서 방법서 약관
+python download_pdf.py --catalog_path products.csv --output_dir custom_pdfs
 
 """
 
-import pandas as pd
 import requests
 import os
-from urllib.parse import unquote
 from pathlib import Path
 from tqdm import tqdm
 from datetime import datetime
 import argparse
 import warnings
 import time  # 추가된 import
+from download_plan import DEFAULT_URL_COLUMNS, plan_from_catalog, save_plan
+from instrumentation import span, tracer
 warnings.filterwarnings('ignore')
 
 def download_pdf(excel_path, output_dir, url_columns, delay=1.0):  # delay 매개변수 추가
     """
-    엑셀 파일에서 URL을 읽어 PDF 파일을 다운로드하는 함수
+    상품 목록 파일에서 URL을 읽어 PDF 파일을 다운로드하는 함수
     
     Args:
-        excel_path (str): 엑셀 파일 경로
+        excel_path (str): 상품 목록 파일 경로 (엑셀, CSV, Parquet)
         output_dir (str): PDF 파일 저장 디렉토리
         url_columns (list): PDF URL이 있는 컬럼명 리스트
         delay (float): 각 다운로드 사이의 대기 시간(초)
@@ -70,91 +78,98 @@ def download_pdf(excel_path, output_dir, url_columns, delay=1.0):  # delay 매
         "total": 0,
         "success": 0,
         "failed": 0,
-        "skipped": 0
+        "skipped": 0,
+        "existing": 0
     }
     
-    # 엑셀 파일 읽기
-    print("엑셀 파일 읽는 중...")
-    df = pd.read_excel(excel_path, sheet_name=0)
-    
-    # 전체 URL 개수 계산 (http로 시작하는 URL만)
-    total_urls = sum(1 for _, row in df.iterrows() 
-                    for column in url_columns 
-                    if str(row[column]).strip().startswith('http'))
-    stats["total"] = total_urls
+    # 상품 목록을 읽어 다운로드 계획 작성 (URL 열 펼치기, 중복 제거, 파일 이름 지정)
+    print("상품 목록 읽는 중...")
+    files, mapping, skipped = plan_from_catalog(excel_path, url_columns)
+    plan_path = save_plan(files, mapping, os.path.join(output_dir, 'download_plan.parquet'))
+    stats["total"] = len(files)
+    stats["skipped"] = len(skipped)
+    print(f"URL 참조 {len(mapping)}개 중 중복을 제외한 파일 {len(files)}개를 내려받습니다. (계획: {plan_path})")
     
     # 진행바 설정
-    with tqdm(total=total_urls, desc="PDF 다운로드") as pbar:
+    with tqdm(total=len(files), desc="PDF 다운로드") as pbar:
         # 로그 파일 시작
         with open(log_file, 'w', encoding='utf-8') as log:
             log.write(f"다운로드 시작 시간: {datetime.now()}\n")
-            log.write(f"엑셀 파일: {excel_path}\n")
+            log.write(f"상품 목록 파일: {excel_path}\n")
             log.write("-" * 50 + "\n")
+            for value in skipped['value']:
+                log.write(f"건너뜀: {value} (올바른 URL 형식 아님)\n")
             
-            # 각 행에 대해 처리
-            for idx, row in df.iterrows():
-                for column in url_columns:
-                    url = str(row[column]).strip()
-                    
-                    if not url.startswith('http'):
-                        if url != "X" and url.strip():  # 빈 문자열이나 'X'가 아닌 경우만 기록
-                            stats["skipped"] += 1
-                            log.write(f"건너뜀: {url} (올바른 URL 형식 아님)\n")
-                        continue
-                    
-                    try:
-                        # PDF 다운로드
+            # 파일마다 한 번씩 처리
+            for url, filename in zip(files['url'], files['file_name']):
+                file_path = Path(output_dir) / filename
+                if file_path.exists():
+                    stats["existing"] += 1
+                    log.write(f"이미 있음: {filename}\n")
+                    pbar.update(1)
+                    continue
+                
+                try:
+                    # PDF 다운로드
+                    with span('download', document=url) as download_span:
                         response = requests.get(url, verify=False)
-                        if response.status_code == 200:
-                            # URL에서 파일명 추출 및 디코딩
-                            filename = unquote(url.split('/')[-1])
-                            
-                            # 파일 저장
-                            file_path = Path(output_dir) / filename
-                            with open(file_path, 'wb') as f:
+                        download_span.count('bytes', len(response.content))
+                        download_span.set(status_code=response.status_code)
+                    if response.status_code == 200:
+                        # 임시 파일에 쓴 뒤 이름을 바꿔, 중단되어도 반쯤 쓴 파일이 남지 않게 함
+                        temp_path = file_path.with_name(file_path.name + '.part')
+                        with span('write', document=filename) as write_span:
+                            with open(temp_path, 'wb') as f:
                                 f.write(response.content)
-                            
-                            stats["success"] += 1
-                            log.write(f"성공: {filename}\n")
-                        else:
-                            stats["failed"] += 1
-                            log.write(f"실패 (상태 코드: {response.status_code}): {url}\n")
-                            
-                    except Exception as e:
+                            os.replace(temp_path, file_path)
+                            write_span.count('bytes', len(response.content))
+                        
+                        stats["success"] += 1
+                        log.write(f"성공: {filename}\n")
+                    else:
                         stats["failed"] += 1
-                        log.write(f"오류: {url}\n")
-                        log.write(f"에러 메시지: {str(e)}\n")
-                    
-                    pbar.update(1)
-                    time.sleep(delay)  # 다음 다운로드 전 대기
+                        log.write(f"실패 (상태 코드: {response.status_code}): {url}\n")
+                        
+                except Exception as e:
+                    stats["failed"] += 1
+                    log.write(f"오류: {url}\n")
+                    log.write(f"에러 메시지: {str(e)}\n")
+                
+                pbar.update(1)
+                time.sleep(delay)  # 다음 다운로드 전 대기
             
             # 최종 통계 기록
             log.write("\n" + "=" * 50 + "\n")
             log.write(f"다운로드 완료 시간: {datetime.now()}\n")
-            log.write(f"총 URL 수: {stats['total']}\n")
+            log.write(f"총 파일 수: {stats['total']}\n")
             log.write(f"성공: {stats['success']}\n")
+            log.write(f"이미 있음: {stats['existing']}\n")
             log.write(f"실패: {stats['failed']}\n")
             log.write(f"건너뜀: {stats['skipped']}\n")
     
     # 최종 결과 출력
     print("\n다운로드 완료!")
-    print(f"총 URL 수: {stats['total']}")
+    print(f"총 파일 수: {stats['total']} (URL 참조 {len(mapping)}개)")
     print(f"성공: {stats['success']}")
+    print(f"이미 있음: {stats['existing']}")
     print(f"실패: {stats['failed']}")
     print(f"건너뜀: {stats['skipped']}")
     print(f"\n로그 파일 위치: {log_file}")
+    if tracer.enabled:
+        tracer.print_summary()
 
 def main():
     # 명령줄 인수 파서 설정
-    parser = argparse.ArgumentParser(description='엑셀 파일에서 PDF 파일 다운로드')
-    parser.add_argument('--excel_path', 
+    parser = argparse.ArgumentParser(description='상품 목록 파일(엑셀/CSV/Parquet)에서 PDF 파일 다운로드')
+    parser.add_argument('--excel_path', '--catalog_path',
+                      dest='excel_path',
                       default='shinhan_life_products_combined.xlsx',
-                      help='엑셀 파일 경로 (기본값: shinhan_life_products_combined.xlsx)')
+                      help='상품 목록 파일 경로 (.xlsx, .csv, .parquet) (기본값: shinhan_life_products_combined.xlsx)')
     parser.add_argument('--output_dir', 
                       default='data/pdf_docs',
                       help='PDF 파일 저장 디렉토리 (기본값: data/pdf_docs)')
     parser.add_argument('url_columns', nargs='*',
-                      default=['요약서', '방법서', '약관'],
+                      default=DEFAULT_URL_COLUMNS,
                       help='URL이 포함된 컬럼명들 (기본값: 요약서 방법서 약관)')
     parser.add_argument('--delay',
                       type=float,
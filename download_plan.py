@@ -0,0 +1,132 @@
+"""
+PDF 다운로드 계획 만들기
+
+상품 목록(엑셀/CSV/Parquet)의 URL 열('요약서', '방법서', '약관')을 한 번에 세로로 펼쳐(melt)
+http로 시작하는 URL만 남기고 중복을 제거한 다운로드 계획을 만듭니다.
+
+- 파일 이름은 URL 끝의 이름에 URL 해시를 붙여 만듭니다 (예: 판매약관_..._20241022_3fa2b1c9.pdf).
+  같은 URL은 항상 같은 이름이 되고, 이름이 같은 다른 상품의 파일이 서로 덮어쓰지 않습니다.
+- files: 내려받을 파일 목록 (URL 하나당 한 행). 순서와 무관하게 어떤 다운로더로도 실행할 수 있습니다.
+- mapping: 상품 행 × URL 열 → 파일 대응 (같은 파일을 여러 상품이 참조할 수 있습니다)
+
+사용법
+    python download_plan.py shinhan_life_products_combined.xlsx --output_path data/pdf_docs/download_plan.parquet
+"""
+
+import hashlib
+import os
+import re
+from urllib.parse import unquote, urlsplit
+
+import click
+
+from lazy_import import lazy_module
+
+pd = lazy_module('pandas')
+
+DEFAULT_URL_COLUMNS = ['요약서', '방법서', '약관']
+# mapping에 함께 남길 상품 정보 열 (존재하는 열만 사용)
+DEFAULT_KEEP_COLUMNS = ['판매구분', '판매사', '분류', '상품명', '판매기간']
+URL_HASH_LENGTH = 8
+# 한글은 UTF-8로 3바이트이므로 파일 이름(255바이트 제한)의 원래 이름 부분은 이 바이트 수로 자릅니다.
+MAX_STEM_BYTES = 180
+_unsafe_characters = re.compile(r'[\\/:*?"<>|\x00-\x1f]')
+
+
+def read_catalog(path, columns=None):
+    """
+    상품 목록 파일을 읽습니다. 모든 값은 문자열로 읽습니다.
+
+    매개변수:
+    - path: .xlsx/.xls(첫 번째 시트), .csv, .parquet 파일 경로
+    - columns: 읽을 열 리스트 (None이면 전체, 없는 열은 무시)
+    """
+    extension = os.path.splitext(path)[1].lower()
+    usecols = None if columns is None else (lambda column: column in set(columns))
+    if extension == '.csv':
+        return pd.read_csv(path, usecols=usecols, dtype=str, keep_default_na=False)
+    if extension == '.parquet':
+        import pyarrow.parquet as pq
+        names = pq.read_schema(path).names
+        return pd.read_parquet(path, columns=None if columns is None else [c for c in names if c in set(columns)])
+    if extension in ('.xlsx', '.xls'):
+        return pd.read_excel(path, sheet_name=0, usecols=usecols, dtype=str, keep_default_na=False)
+    raise ValueError(f"지원하지 않는 상품 목록 형식입니다: {path} (xlsx, xls, csv, parquet)")
+
+
+def url_file_name(url, url_hash):
+    """URL 끝의 파일 이름(디코딩)에 URL 해시를 붙여 충돌하지 않는 파일 이름을 만듭니다."""
+    base = unquote(urlsplit(url).path.rsplit('/', 1)[-1]) or 'document'
+    stem, extension = os.path.splitext(base)
+    stem = _unsafe_characters.sub('_', stem).strip(' .') or 'document'
+    stem = stem.encode('utf-8')[:MAX_STEM_BYTES].decode('utf-8', errors='ignore')
+    return f"{stem}_{url_hash[:URL_HASH_LENGTH]}{extension.lower() or '.pdf'}"
+
+
+def build_download_plan(catalog_df, url_columns=DEFAULT_URL_COLUMNS, keep_columns=DEFAULT_KEEP_COLUMNS):
+    """
+    상품 목록에서 다운로드 계획을 만듭니다.
+
+    매개변수:
+    - catalog_df: 상품 목록 DataFrame
+    - url_columns: URL이 있는 열 리스트
+    - keep_columns: mapping에 남길 상품 정보 열 (없는 열은 무시)
+
+    반환값:
+    - files: url_id, url, file_name, references (참조한 상품 행 수) 열의 DataFrame
+    - mapping: row, (keep_columns), url_column, url_id, file_name 열의 DataFrame
+    - skipped: http로 시작하지 않는 값 ('X'와 빈 값 제외) - row, url_column, value 열의 DataFrame
+    """
+    missing = [column for column in url_columns if column not in catalog_df.columns]
+    if missing:
+        raise ValueError(f"상품 목록에 URL 열이 없습니다: {missing}")
+    keep_columns = [column for column in keep_columns if column in catalog_df.columns]
+    long_df = (catalog_df[keep_columns + list(url_columns)]
+               .rename_axis('row').reset_index()
+               .melt(id_vars=['row'] + keep_columns, value_vars=list(url_columns),
+                     var_name='url_column', value_name='url'))
+    long_df['url'] = long_df['url'].fillna('').astype(str).str.strip()
+    is_url = long_df['url'].str.startswith('http')
+    is_placeholder = long_df['url'].isin(['', 'X', 'nan'])
+    skipped = long_df.loc[~is_url & ~is_placeholder, ['row', 'url_column', 'url']].rename(columns={'url': 'value'})
+
+    mapping = long_df.loc[is_url].sort_values(['row', 'url_column'], kind='stable').reset_index(drop=True)
+    unique_urls = mapping['url'].drop_duplicates()
+    url_ids = [hashlib.sha256(url.encode('utf-8')).hexdigest() for url in unique_urls]
+    files = pd.DataFrame({'url_id': url_ids, 'url': unique_urls.to_numpy(),
+                          'file_name': [url_file_name(url, url_id) for url, url_id in zip(unique_urls, url_ids)]})
+    mapping = mapping.merge(files[['url', 'url_id', 'file_name']], on='url', how='left')
+    files['references'] = files['url_id'].map(mapping['url_id'].value_counts()).astype(int)
+    return files, mapping.drop(columns=['url']), skipped.reset_index(drop=True)
+
+
+def plan_from_catalog(catalog_path, url_columns=DEFAULT_URL_COLUMNS, keep_columns=DEFAULT_KEEP_COLUMNS):
+    """상품 목록 파일에서 필요한 열만 읽어 다운로드 계획을 만듭니다."""
+    catalog_df = read_catalog(catalog_path, list(keep_columns) + list(url_columns))
+    return build_download_plan(catalog_df, url_columns, keep_columns)
+
+
+def save_plan(files, mapping, path):
+    """mapping을 path에, files를 <path 기본 이름>.files.parquet에 저장합니다."""
+    from corpus_io import write_table
+
+    write_table(mapping, path, dictionary_columns=['url_column', '판매구분', '판매사', '분류', '상품명', '판매기간'])
+    files_path = f"{os.path.splitext(path)[0]}.files.parquet"
+    write_table(files, files_path)
+    return files_path
+
+
+@click.command()
+@click.argument('catalog_path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--url_columns', default=','.join(DEFAULT_URL_COLUMNS), help='URL 열 (쉼표로 구분)')
+@click.option('--output_path', type=click.Path(dir_okay=False), default=os.path.join('data', 'pdf_docs', 'download_plan.parquet'))
+def main(catalog_path, url_columns, output_path):
+    files, mapping, skipped = plan_from_catalog(catalog_path, url_columns.split(','))
+    files_path = save_plan(files, mapping, output_path)
+    print(f"URL 참조 {len(mapping)}개 → 내려받을 파일 {len(files)}개 (중복 {len(mapping) - len(files)}개), "
+          f"URL 형식이 아닌 값 {len(skipped)}개")
+    print(f"계획: {output_path}, {files_path}")
+
+
+if __name__ == '__main__':
+    main()
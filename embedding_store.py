@@ -0,0 +1,209 @@
+"""
+영구 임베딩 저장소
+
+텍스트 해시 → 벡터를 디스크에 보관하여, 같은 청크나 답변을 trial마다 다시 임베딩하지 않도록 합니다.
+
+저장 구조 (store_dir)
+- meta.json: 벡터 차원
+- vectors.f32: float32 벡터 행렬 (행 단위로 이어 붙임, 읽을 때 memory-map)
+- hashes.bin: 각 행에 대응하는 16바이트 키 (sha256(모델명 + 종류 + 텍스트) 앞부분)
+
+파일은 append-only이므로 중간에 중단되어도 짝이 맞는 행까지만 읽어 들입니다.
+여러 프로세스(main.py --grid의 워커)가 같은 저장소를 쓸 수 있도록 읽기/추가는 파일 잠금(.lock) 안에서
+하며, 추가하기 전에 다른 프로세스가 그 사이에 추가한 행을 먼저 읽어 들입니다.
+
+사용법
+    python embedding_store.py --store_dir embedding_cache
+"""
+
+import hashlib
+import json
+import os
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows에서는 프로세스 간 잠금 없이 동작합니다.
+    fcntl = None
+
+import click
+import numpy as np
+
+KEY_SIZE = 16
+
+
+def text_key(text, model_name='', kind='text'):
+    """모델명, 임베딩 종류(text/query), 텍스트로 저장소 키를 만듭니다."""
+    return hashlib.sha256(f"{model_name}\x00{kind}\x00{text}".encode('utf-8')).digest()[:KEY_SIZE]
+
+
+class EmbeddingStore:
+    """
+    memory-map 기반 임베딩 저장소입니다.
+
+    사용 방법:
+    1. store = EmbeddingStore('embedding_cache')
+    2. vectors, missing = store.lookup(keys)  # missing: 저장소에 없는 위치 리스트
+    3. store.add([keys[i] for i in missing], new_vectors)
+    """
+
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+        os.makedirs(store_dir, exist_ok=True)
+        self.meta_path = os.path.join(store_dir, 'meta.json')
+        self.vectors_path = os.path.join(store_dir, 'vectors.f32')
+        self.hashes_path = os.path.join(store_dir, 'hashes.bin')
+        self.lock_path = os.path.join(store_dir, '.lock')
+        self.dim = None
+        self.index = {}
+        self.n_rows = 0
+        self.hits = 0
+        self.misses = 0
+        self._matrix = None
+        with self._locked():
+            self._load()
+
+    @contextmanager
+    def _locked(self):
+        """다른 프로세스와 저장소 파일을 동시에 고치지 않도록 배타 잠금을 잡습니다."""
+        if fcntl is None:
+            yield
+            return
+        with open(self.lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _load(self):
+        """디스크의 행 중 아직 읽지 않은 부분(다른 프로세스가 추가한 행 포함)을 색인에 더합니다."""
+        if not os.path.exists(self.meta_path):
+            return
+        with open(self.meta_path, 'r', encoding='utf-8') as f:
+            self.dim = json.load(f)['dim']
+        with open(self.hashes_path, 'rb') as f:
+            f.seek(self.n_rows * KEY_SIZE)
+            hashes = f.read()
+        n_rows = min(self.n_rows + len(hashes) // KEY_SIZE, os.path.getsize(self.vectors_path) // (4 * self.dim))
+        # 중단된 쓰기로 짝이 맞지 않는 꼬리 부분은 잘라냅니다.
+        for path, size in ((self.hashes_path, n_rows * KEY_SIZE), (self.vectors_path, n_rows * 4 * self.dim)):
+            if os.path.getsize(path) != size:
+                with open(path, 'r+b') as f:
+                    f.truncate(size)
+        for i in range(n_rows - self.n_rows):
+            self.index.setdefault(hashes[i * KEY_SIZE:(i + 1) * KEY_SIZE], self.n_rows + i)
+        self.n_rows = n_rows
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def matrix(self):
+        """저장된 전체 벡터 행렬 (읽기 전용 memory-map)"""
+        if self._matrix is None or self._matrix.shape[0] != self.n_rows:
+            if not self.n_rows:
+                return np.empty((0, self.dim or 0), dtype=np.float32)
+            self._matrix = np.memmap(self.vectors_path, dtype=np.float32, mode='r',
+                                     shape=(self.n_rows, self.dim))
+        return self._matrix
+
+    def lookup(self, keys):
+        """
+        키에 해당하는 벡터를 찾습니다.
+
+        반환값:
+        - (list, list): 위치별 벡터(없으면 None) 리스트와 저장소에 없는 위치 리스트
+        """
+        vectors = [None] * len(keys)
+        missing = []
+        rows = [self.index.get(key) for key in keys]
+        matrix = self.matrix if any(row is not None for row in rows) else None
+        for i, row in enumerate(rows):
+            if row is None:
+                missing.append(i)
+            else:
+                vectors[i] = np.array(matrix[row])
+        self.hits += len(keys) - len(missing)
+        self.misses += len(missing)
+        return vectors, missing
+
+    def add(self, keys, vectors):
+        """새 벡터를 저장소 끝에 추가합니다. 이미 있는 키(다른 프로세스가 추가한 키 포함)는 건너뜁니다."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if len(keys) == 0:
+            return
+        with self._locked():
+            self._load()
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+                with open(self.meta_path, 'w', encoding='utf-8') as f:
+                    json.dump({'dim': self.dim}, f)
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"벡터 차원 {vectors.shape[1]}이 저장소 차원 {self.dim}과 다릅니다.")
+
+            new_rows = {}
+            for key, vector in zip(keys, vectors):
+                if key not in self.index and key not in new_rows:
+                    new_rows[key] = vector
+            if not new_rows:
+                return
+            with open(self.vectors_path, 'ab') as f:
+                f.write(np.stack(list(new_rows.values())).astype(np.float32).tobytes())
+            with open(self.hashes_path, 'ab') as f:
+                f.write(b''.join(new_rows.keys()))
+            for key in new_rows:
+                self.index[key] = self.n_rows
+                self.n_rows += 1
+
+    def get_or_compute(self, texts, embed_fn, model_name='', kind='text'):
+        """
+        저장소에 있는 벡터는 읽고, 없는 텍스트만 embed_fn으로 계산하여 저장합니다.
+
+        매개변수:
+        - texts: 텍스트 리스트
+        - embed_fn: 텍스트 리스트를 받아 벡터 리스트를 돌려주는 함수
+        - model_name, kind: 키를 구분하기 위한 모델명과 임베딩 종류
+
+        반환값:
+        - np.ndarray: (len(texts), dim) float32 행렬
+        """
+        keys = [text_key(text, model_name, kind) for text in texts]
+        vectors, missing = self.lookup(keys)
+        if missing:
+            new_vectors = np.asarray(embed_fn([texts[i] for i in missing]), dtype=np.float32)
+            self.add([keys[i] for i in missing], new_vectors)
+            for i, vector in zip(missing, new_vectors):
+                vectors[i] = vector
+        if not vectors:
+            return np.empty((0, self.dim or 0), dtype=np.float32)
+        return np.stack(vectors).astype(np.float32)
+
+    def stats(self):
+        """현재 프로세스에서의 조회 적중률 통계"""
+        total = self.hits + self.misses
+        return {
+            'rows': len(self.index),
+            'dim': self.dim,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
+
+
+def print_store_stats(store):
+    stats = store.stats()
+    print(f"임베딩 캐시: {stats['rows']}개 벡터 (차원 {stats['dim']}), "
+          f"적중 {stats['hits']} / 미적중 {stats['misses']} (적중률 {stats['hit_rate']:.1%})")
+
+
+@click.command()
+@click.option('--store_dir', type=click.Path(exists=True, file_okay=False), default='embedding_cache')
+def main(store_dir):
+    store = EmbeddingStore(store_dir)
+    size_mb = sum(os.path.getsize(os.path.join(store_dir, name)) for name in os.listdir(store_dir)) / 1e6
+    print(f"{store_dir}: {len(store)}개 벡터, 차원 {store.dim}, {size_mb:.1f}MB")
+
+
+if __name__ == '__main__':
+    main()
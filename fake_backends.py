@@ -0,0 +1,78 @@
+"""
+오프라인 실행용 가짜(fake) 백엔드
+
+API 키나 네트워크 없이 파이프라인 흐름을 확인할 수 있도록 LLM 응답을 결정적으로 흉내 냅니다.
+같은 입력에는 항상 같은 출력을 돌려주므로 재실행 결과를 비교하기 쉽습니다.
+"""
+
+import hashlib
+import re
+
+_text_pattern = re.compile(r'(?:기사|단락|문서):\s*\n?(.*?)(?:\n\s*\n생성할 질문 개수|\Z)', re.DOTALL)
+
+
+def _stable_int(text):
+    return int.from_bytes(hashlib.sha256(text.encode('utf-8')).digest()[:8], 'little')
+
+
+def fake_qa_completion(prompt):
+    """
+    QA 생성 프롬프트에 대해 '[Q]: ... [A]: ...' 형식의 응답을 결정적으로 만듭니다.
+    프롬프트 안의 본문 첫 문장을 답변으로, 그 문장에 대한 질문을 질문으로 사용합니다.
+    """
+    match = _text_pattern.search(prompt)
+    body = match.group(1) if match else prompt
+    sentences = [s.strip() for s in re.split(r'[.\n?!]', body) if len(s.strip()) > 5]
+    answer = sentences[_stable_int(prompt) % len(sentences)] if sentences else body.strip()[:50]
+    return f"[Q]: 다음 내용은 무엇에 관한 것인가요? {answer[:30]}\n[A]: {answer}"
+
+
+def fake_answer(prompt):
+    """
+    답변 생성 프롬프트에 대해 프롬프트 안 단락의 첫 문장을 답변으로 돌려줍니다 (serve.py의 가짜 generator).
+    """
+    match = _text_pattern.search(prompt)
+    body = match.group(1) if match else prompt
+    sentences = [s.strip() for s in re.split(r'[.\n?!]', body) if len(s.strip()) > 5]
+    return sentences[0] if sentences else body.strip()[:50]
+
+
+def fake_chat_completion(body, completion_id):
+    """
+    OpenAI Chat Completions 요청 body에 대해 같은 형식의 응답 body를 만듭니다.
+    """
+    prompt = body['messages'][-1]['content']
+    content = fake_qa_completion(prompt)
+    return {
+        "id": f"chatcmpl-{completion_id}",
+        "object": "chat.completion",
+        "created": 0,
+        "model": body.get('model', 'fake'),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+        "usage": {"prompt_tokens": len(prompt), "completion_tokens": len(content),
+                  "total_tokens": len(prompt) + len(content)},
+    }
+
+
+def fake_embedding(text, dim=64):
+    """
+    텍스트의 문자 bigram을 해시하여 만든 결정적 임베딩입니다 (L2 정규화).
+    같은 글자를 많이 공유하는 텍스트일수록 코사인 유사도가 높습니다.
+    """
+    vector = [0.0] * dim
+    text = text or ''
+    grams = [text[i:i + 2] for i in range(len(text) - 1)] or [text]
+    for gram in grams:
+        h = _stable_int(gram)
+        vector[h % dim] += 1.0 if (h >> 32) & 1 else -1.0
+    norm = sum(v * v for v in vector) ** 0.5 or 1.0
+    return [v / norm for v in vector]
+
+
+def fake_embeddings(texts, dim=64):
+    """fake_embedding의 배치 버전입니다."""
+    return [fake_embedding(text, dim) for text in texts]
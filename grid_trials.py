@@ -0,0 +1,250 @@
+"""
+설정 그리드 병렬 trial 실행
+
+config/tutorial_ko.yaml처럼 노드 안에 여러 값(prompt 2개 × temperature 2개 등)이 있으면
+Evaluator.start_trial은 이 조합들을 한 프로세스에서 차례로 실행합니다.
+이 모듈은 설정을 독립적인 작업 단위(unit)로 펼쳐 프로세스 풀에서 동시에 실행하고,
+각 unit의 노드별 결과를 하나의 리더보드(project_dir/leaderboard.parquet)로 합칩니다.
+
+- retrieval 노드는 hybrid 모듈이 같은 노드의 bm25/vectordb 결과를 사용하므로 펼치지 않습니다.
+- 그 밖의 노드는 모듈과 리스트 값 파라미터의 모든 조합으로 펼쳐 unit마다 조합 하나만 남깁니다.
+- 모든 unit에서 설정이 같은 앞부분 노드(retrieval 등)는 project_dir/grid/shared에서 한 번만 실행하고
+  (corpus 적재도 한 번), unit은 trial_cache 항목으로 그 결과를 가져와 나머지 노드만 실행합니다.
+- unit은 project_dir/grid/<unit id>에서 실행되며, unit id는 설정 해시이므로 다시 실행하면
+  trial_cache로 앞 노드 결과를 재사용합니다.
+- 모든 워커는 하나의 RateLimiter를 공유하여 전체 API 요청 속도를 제한합니다.
+"""
+
+import copy
+import hashlib
+import itertools
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import yaml
+
+from lazy_import import lazy_module
+from openai_hooks import RateLimiter, install_openai_hooks
+
+pd = lazy_module('pandas')
+
+# 펼치지 않고 그대로 두는 노드 타입
+UNSPLIT_NODE_TYPES = {'retrieval'}
+SHARED_UNIT = 'shared'
+SUMMARY_COLUMNS = {'filename', 'module_name', 'module_params', 'execution_time', 'is_best'}
+
+
+def explode_module(module):
+    """모듈 설정의 리스트 값 파라미터를 모든 조합의 단일 값 모듈 설정으로 펼칩니다."""
+    keys = [key for key, value in module.items() if key != 'module_type' and isinstance(value, list)]
+    if not keys:
+        return [module]
+    return [{**module, **dict(zip(keys, values))} for values in itertools.product(*(module[key] for key in keys))]
+
+
+def expand_grid(config):
+    """
+    설정을 작업 단위로 펼칩니다.
+
+    반환값:
+    - list: (unit id, unit 설정 딕셔너리) 튜플 리스트
+    """
+    choices = []
+    for line_index, node_line in enumerate(config['node_lines']):
+        for node_index, node in enumerate(node_line['nodes']):
+            if node['node_type'] in UNSPLIT_NODE_TYPES:
+                continue
+            modules = [single for module in node['modules'] for single in explode_module(module)]
+            choices.append([(line_index, node_index, module) for module in modules])
+    units = []
+    for combination in itertools.product(*choices):
+        unit_config = copy.deepcopy(config)
+        for line_index, node_index, module in combination:
+            unit_config['node_lines'][line_index]['nodes'][node_index]['modules'] = [copy.deepcopy(module)]
+        unit_id = hashlib.sha256(json.dumps(unit_config, sort_keys=True, ensure_ascii=False,
+                                            default=str).encode('utf-8')).hexdigest()[:12]
+        units.append((unit_id, unit_config))
+    return units
+
+
+def _nodes(config):
+    return [(node_line['node_line_name'], node) for node_line in config['node_lines'] for node in node_line['nodes']]
+
+
+def shared_prefix_length(units):
+    """
+    모든 unit에서 함께 실행할 수 있는 앞부분 노드 개수를 구합니다.
+    설정이 같은 앞부분 노드만 세며, corpus 적재가 필요한 노드가 그 뒤에 남으면 unit마다 적재해야 하므로 0을 돌려줍니다.
+    """
+    from trial_cache import INGEST_NODE_TYPES
+
+    node_lists = [_nodes(unit_config) for _, unit_config in units]
+    count = 0
+    for nodes in zip(*node_lists):
+        if any(node != nodes[0] for node in nodes[1:]):
+            break
+        count += 1
+    if any(node['node_type'] in INGEST_NODE_TYPES for _, node in node_lists[0][count:]):
+        return 0
+    return count
+
+
+def prefix_config(config, count):
+    """설정에서 앞의 count개 노드만 남긴 설정을 만듭니다."""
+    prefix = copy.deepcopy(config)
+    node_lines = []
+    for node_line in prefix['node_lines']:
+        if count <= 0:
+            break
+        node_line['nodes'] = node_line['nodes'][:count]
+        count -= len(node_line['nodes'])
+        node_lines.append(node_line)
+    prefix['node_lines'] = node_lines
+    return prefix
+
+
+def _init_worker(rate_limiter, embedding_cache_dir, response_cache=None):
+    """워커 프로세스마다 한 번 실행되어 API 훅(속도 제한, 응답 캐시)과 임베딩 캐시를 설치합니다."""
+    install_openai_hooks(rate_limiter=rate_limiter, response_cache=response_cache)
+    if embedding_cache_dir:
+        from cached_embedding import install_embedding_cache
+        install_embedding_cache(embedding_cache_dir)
+
+
+def run_unit(unit_id, unit_config, qa_path, corpus_path, unit_dir, bm25_index_dir, use_cache, shared_dir=None):
+    """
+    unit 하나를 자신의 project_dir에서 실행합니다 (워커 프로세스).
+
+    매개변수:
+    - shared_dir: 공통 앞부분 노드를 실행한 project_dir. 주어지면 그 결과를 trial_cache 항목으로 가져와
+      나머지 노드만 실행합니다.
+    """
+    from autorag.evaluator import Evaluator
+
+    from bm25_index import BM25Index, write_autorag_bm25
+    from trial_cache import _read_trials, import_cache_entries, node_cache_keys, start_cached_trial
+
+    start = time.perf_counter()
+    os.makedirs(unit_dir, exist_ok=True)
+    config_path = os.path.join(unit_dir, 'config.yaml')
+    with open(config_path, 'w', encoding='utf-8') as f:
+        yaml.safe_dump(unit_config, f, allow_unicode=True, sort_keys=False)
+    try:
+        evaluator = Evaluator(qa_path, corpus_path, project_dir=unit_dir)
+        if bm25_index_dir:
+            write_autorag_bm25(BM25Index(bm25_index_dir), unit_dir)
+        if shared_dir:
+            import_cache_entries(unit_dir, shared_dir, node_cache_keys(unit_config, qa_path, corpus_path))
+        if use_cache:
+            trial_name = start_cached_trial(evaluator, config_path, qa_path, corpus_path, unit_dir)
+        else:
+            evaluator.start_trial(config_path)
+            trial_name = _read_trials(unit_dir)[-1]['trial_name']
+        error = None
+    except Exception as e:
+        trial_name, error = None, f"{type(e).__name__}: {e}"
+    return {'unit': unit_id, 'project_dir': unit_dir, 'trial': trial_name, 'error': error,
+            'seconds': time.perf_counter() - start}
+
+
+def unit_leaderboard_row(result):
+    """unit trial의 노드별 best 결과를 리더보드 한 행으로 만듭니다."""
+    trial_dir = os.path.join(result['project_dir'], result['trial'])
+    row = {'unit': result['unit'], 'trial_dir': trial_dir, 'seconds': result['seconds']}
+    trial_summary = pd.read_csv(os.path.join(trial_dir, 'summary.csv'))
+    for node in trial_summary.itertuples():
+        node_summary = pd.read_csv(os.path.join(trial_dir, node.node_line_name, node.node_type, 'summary.csv'))
+        best = node_summary.loc[node_summary['is_best']].iloc[0]
+        prefix = node.node_type
+        row[f'{prefix}_module'] = best['module_name']
+        row[f'{prefix}_params'] = str(best['module_params'])
+        row[f'{prefix}_execution_time'] = best['execution_time']
+        for column in node_summary.columns:
+            if column not in SUMMARY_COLUMNS:
+                row[f'{prefix}_{column}'] = best[column]
+    return row
+
+
+def build_leaderboard(results, last_node_type=None):
+    """성공한 unit들의 행을 모아 마지막 노드 지표 평균 내림차순으로 정렬합니다."""
+    leaderboard = pd.DataFrame([unit_leaderboard_row(result) for result in results if result['error'] is None])
+    if leaderboard.empty:
+        return leaderboard
+    if last_node_type:
+        metric_columns = [column for column in leaderboard.columns if column.startswith(f'{last_node_type}_')
+                          and column not in {f'{last_node_type}_module', f'{last_node_type}_params',
+                                             f'{last_node_type}_execution_time'}]
+        if metric_columns:
+            leaderboard['score'] = leaderboard[metric_columns].astype(float).mean(axis=1)
+            leaderboard = leaderboard.sort_values('score', ascending=False, ignore_index=True)
+    return leaderboard
+
+
+def run_grid(config_path, qa_path, corpus_path, project_dir, workers=None, requests_per_minute=500,
+             embedding_cache_dir=None, bm25_index_dir=None, use_cache=True, response_cache=None):
+    """
+    설정 그리드를 프로세스 풀에서 실행하고 리더보드를 저장합니다.
+
+    매개변수:
+    - config_path: YAML 설정 파일 경로
+    - qa_path, corpus_path: 평가 데이터 경로
+    - project_dir: 결과 디렉토리 (unit은 project_dir/grid/<unit id>)
+    - workers: 프로세스 수 (기본값: CPU 수)
+    - requests_per_minute: 모든 워커가 공유하는 OpenAI 분당 요청 수 제한
+    - embedding_cache_dir: 워커가 함께 쓸 임베딩 캐시 디렉토리 (None이면 사용하지 않음)
+    - bm25_index_dir: 미리 만든 ko_kiwi BM25 색인 디렉토리 (None이면 사용하지 않음)
+    - use_cache: unit별 trial_cache 사용 여부. False이면 공통 앞부분 노드도 unit마다 다시 실행합니다.
+    - response_cache: 워커들이 함께 쓸 response_cache.ResponseCache (None이면 사용하지 않음)
+
+    반환값:
+    - DataFrame: 리더보드
+    """
+    with open(config_path, 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f)
+    units = expand_grid(config)
+    workers = min(workers or os.cpu_count() or 1, len(units))
+    print(f"작업 단위 {len(units)}개를 프로세스 {workers}개로 실행합니다.")
+    qa_path, corpus_path = os.path.abspath(qa_path), os.path.abspath(corpus_path)
+    shared_count = shared_prefix_length(units) if use_cache and len(units) > 1 else 0
+
+    context = multiprocessing.get_context('spawn')
+    rate_limiter = RateLimiter(requests_per_minute, context)
+    grid_dir = os.path.join(project_dir, 'grid')
+    shared_dir = None
+    results = []
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker,
+                             initargs=(rate_limiter, embedding_cache_dir, response_cache)) as executor:
+        if shared_count:
+            # retrieval 등 공통 앞부분 노드는 한 번만 실행하고 unit들이 결과를 나눠 씁니다.
+            print(f"공통 앞부분 노드 {shared_count}개를 먼저 실행합니다.")
+            shared = executor.submit(run_unit, SHARED_UNIT, prefix_config(units[0][1], shared_count), qa_path,
+                                     corpus_path, os.path.join(grid_dir, SHARED_UNIT), bm25_index_dir,
+                                     use_cache).result()
+            if shared['error']:
+                print(f"공통 노드 실행 실패 ({shared['error']}), unit마다 전체 trial을 실행합니다.")
+            else:
+                shared_dir = shared['project_dir']
+                print(f"공통 노드: trial {shared['trial']}, {shared['seconds']:.1f}초")
+        futures = [executor.submit(run_unit, unit_id, unit_config, qa_path, corpus_path,
+                                   os.path.join(grid_dir, unit_id), None if shared_dir else bm25_index_dir,
+                                   use_cache, shared_dir)
+                   for unit_id, unit_config in units]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            status = f"실패 ({result['error']})" if result['error'] else f"trial {result['trial']}"
+            print(f"[{len(results)}/{len(units)}] {result['unit']}: {status}, {result['seconds']:.1f}초")
+    print(f"전체 {time.perf_counter() - start:.1f}초")
+
+    last_node_type = config['node_lines'][-1]['nodes'][-1]['node_type']
+    leaderboard = build_leaderboard(results, last_node_type)
+    leaderboard_path = os.path.join(project_dir, 'leaderboard.parquet')
+    leaderboard.to_parquet(leaderboard_path, index=False)
+    print(f"리더보드 ({len(leaderboard)}개 unit)를 {leaderboard_path}에 저장했습니다.")
+    if not leaderboard.empty:
+        print(leaderboard.head(10).drop(columns=['trial_dir']).to_string(index=False))
+    return leaderboard
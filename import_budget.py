@@ -0,0 +1,120 @@
+"""
+진입점 import 시간 측정
+
+`python -X importtime -c "import <진입점>"`을 새 프로세스에서 실행해 진입점 모듈의 누적 import 시간을 재고,
+예산(ms)을 넘거나 최상단에서 무거운 의존성(HEAVY_MODULES)을 불러오면 0이 아닌 종료 코드로 끝납니다.
+CI나 커밋 전 확인에 그대로 사용할 수 있습니다.
+
+사용법
+    python import_budget.py
+    python import_budget.py --entry_point main --repeat 5 --budget_ms 200
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+
+import click
+
+root_dir = os.path.dirname(os.path.realpath(__file__))
+
+# 진입점별 import 시간 예산 (ms). click, dotenv, 표준 라이브러리만 불러오는 수준입니다.
+BUDGETS_MS = {
+    'main': 250,
+    'make_corpus': 250,
+    'make_qa': 250,
+    'pdf_section_extractor': 250,
+}
+# 진입점 최상단에서 import하면 안 되는 패키지 (해당 명령 안에서 import합니다)
+HEAVY_MODULES = {
+    'autorag', 'llama_index', 'langchain', 'langchain_core', 'langchain_upstage', 'pdf2image', 'img2pdf', 'PIL',
+    'pandas', 'numpy', 'pyarrow', 'fitz', 'pymupdf', 'pdfplumber', 'kiwipiepy', 'openai', 'bs4', 'sklearn', 'torch',
+}
+
+
+def parse_importtime(stderr):
+    """
+    -X importtime 출력을 파싱합니다.
+
+    반환값:
+    - list: (모듈 이름, self us, cumulative us, 깊이) 튜플 리스트 (출력 순서)
+    """
+    records = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        # 모듈 이름 앞의 공백은 1칸 + 깊이마다 2칸입니다.
+        depth = (len(name) - len(name.lstrip(' ')) - 1) // 2
+        records.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return records
+
+
+def measure_import(module, repeat=3):
+    """
+    새 파이썬 프로세스에서 module을 import하는 시간을 잽니다.
+
+    매개변수:
+    - module: 진입점 모듈 이름
+    - repeat: 반복 횟수 (중앙값 사용)
+
+    반환값:
+    - dict: milliseconds (누적 import 시간 중앙값), heavy (최상단에서 불러온 무거운 패키지), error
+    """
+    timings = []
+    heavy = set()
+    for _ in range(repeat):
+        completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                                   cwd=root_dir, capture_output=True, text=True)
+        if completed.returncode != 0:
+            return {'milliseconds': None, 'heavy': [], 'error': completed.stderr.strip().splitlines()[-1]}
+        records = parse_importtime(completed.stderr)
+        cumulative = [record[2] for record in records if record[0] == module and record[3] == 0]
+        if not cumulative:
+            return {'milliseconds': None, 'heavy': [], 'error': f'{module} import 기록을 찾지 못했습니다.'}
+        timings.append(cumulative[-1] / 1000)
+        heavy |= {record[0].split('.')[0] for record in records} & HEAVY_MODULES
+    return {'milliseconds': statistics.median(timings), 'heavy': sorted(heavy), 'error': None}
+
+
+def check_budgets(budgets=None, repeat=3):
+    """
+    진입점마다 import 시간을 재고 예산과 비교합니다.
+
+    반환값:
+    - list: 진입점별 결과 딕셔너리 (ok가 False이면 예산 초과, 무거운 import 또는 import 실패)
+    """
+    results = []
+    for module, budget in (budgets or BUDGETS_MS).items():
+        result = measure_import(module, repeat)
+        result.update(module=module, budget=budget,
+                      ok=result['error'] is None and not result['heavy'] and result['milliseconds'] <= budget)
+        results.append(result)
+    return results
+
+
+@click.command()
+@click.option('--entry_point', 'entry_points', multiple=True, help='확인할 진입점 (여러 번 지정 가능, 기본값: 전체)')
+@click.option('--repeat', type=int, default=3, help='진입점마다 측정 반복 횟수')
+@click.option('--budget_ms', type=float, default=None, help='모든 진입점에 같은 예산 적용 (ms)')
+def main(entry_points, repeat, budget_ms):
+    budgets = {module: BUDGETS_MS.get(module, 250) for module in (entry_points or BUDGETS_MS)}
+    if budget_ms is not None:
+        budgets = {module: budget_ms for module in budgets}
+    results = check_budgets(budgets, repeat)
+    for result in results:
+        status = '통과' if result['ok'] else '실패'
+        if result['error']:
+            detail = result['error']
+        else:
+            detail = f"{result['milliseconds']:.1f}ms / 예산 {result['budget']:.0f}ms"
+            if result['heavy']:
+                detail += f", 최상단에서 불러온 무거운 패키지: {', '.join(result['heavy'])}"
+        print(f"[{status}] {result['module']}: {detail}")
+    if not all(result['ok'] for result in results):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,428 @@
+"""
+상주(warm) 수집 워커 데몬
+
+classify_documents.py나 pdf_section_extractor.py를 PDF마다 실행하면 매번 파이썬을 새로 띄우고
+langchain/pandas/PyMuPDF를 import하며 분류 키워드와 HTML 변환기를 다시 만듭니다.
+몇 분에 몇 개씩 들어오는 PDF에서는 이 시작 비용이 실제 처리 시간보다 깁니다.
+이 데몬은 워커 프로세스를 미리 띄워 두고 (의존성 import, 키워드 정규식 컴파일, HTMLToTextWithMarkdownTables 생성),
+작업을 받는 즉시 처리해 결과를 출력 싱크(JSONL)에 한 줄씩 이어 씁니다.
+
+작업 입력
+- 파일 시스템 큐: queue_dir/incoming에 작업 JSON(submit 명령) 또는 PDF 파일을 넣으면
+  processing/으로 옮겨 처리하고 끝나면 done/ 또는 failed/로 옮깁니다. (PDF는 settle_seconds 동안 바뀌지 않아야 가져갑니다.)
+- Unix 소켓: 한 줄에 작업 JSON 하나를 보내면 작업이 끝나는 순서대로 결과 JSON을 한 줄씩 돌려받습니다.
+
+작업 형식
+    {"kind": "classify" | "extract", "pdf_path": "...", "options": {"mode": "hybrid", "table_engine": "pdfplumber"}}
+
+- classify: 다운로드 계획이나 파일 이름으로 유형을 정하고 (document_router.py), 정하지 못하면 앞 3페이지 텍스트로,
+  그래도 실패하면 OCR로 분류합니다 (classify_documents.py와 같음).
+- extract: 페이지 텍스트를 추출(mode: layout/hybrid/local)하여 섹션으로 나눕니다. 페이지 텍스트는
+  데몬 프로세스가 PageStore에 저장합니다 (PageStore는 한 프로세스에서만 쓰기 때문에 워커는 결과만 돌려줍니다).
+
+사용법
+    python ingest_daemon.py serve --workers 2 --socket_path ingest.sock
+    python ingest_daemon.py submit raw_docs/약관.pdf --kind extract --mode hybrid --socket_path ingest.sock
+    python ingest_daemon.py submit raw_docs/약관.pdf                 # 소켓 없이 파일 시스템 큐에 넣기
+"""
+
+import json
+import multiprocessing
+import os
+import shutil
+import signal
+import socket
+import socketserver
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+import click
+
+root_dir = os.path.dirname(os.path.realpath(__file__))
+DEFAULT_QUEUE_DIR = os.path.join(root_dir, 'ingest_queue')
+DEFAULT_OUTPUT_PATH = os.path.join(root_dir, 'ingest_results.jsonl')
+JOB_KINDS = ('classify', 'extract')
+QUEUE_STATES = ('incoming', 'processing', 'done', 'failed')
+
+# 워커 프로세스마다 한 번 만들어 재사용하는 상태
+_worker_state = {}
+
+
+def _init_worker(document_class_path):
+    """워커 프로세스 시작 시 의존성을 import하고 분류 키워드와 HTML 변환기를 준비합니다."""
+    # Ctrl-C(프로세스 그룹 SIGINT)는 부모만 처리합니다. 워커는 진행 중인 작업을 마친 뒤 부모의 종료 요청으로 끝납니다.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # classify_documents가 fitz, pdf2image, pandas, langchain_upstage를 import합니다.
+    from classify_documents import compile_document_classes, load_document_classes
+    from rainbow_html_transformer import HTMLToTextWithMarkdownTables
+    import pdf_section_extractor
+
+    _worker_state['document_classes'] = load_document_classes(document_class_path)
+    _worker_state['compiled_document_classes'] = compile_document_classes(_worker_state['document_classes'])
+    _worker_state['html_transformer'] = HTMLToTextWithMarkdownTables()
+    _worker_state['pdf_section_extractor'] = pdf_section_extractor
+
+
+def _classify(pdf_path):
+    from classify_documents import classify_document, extract_text_from_pdf, extract_text_with_ocr
+    from document_router import route_document
+
+    doc_type, routed_by = route_document(pdf_path, _worker_state['document_classes'])
+    if doc_type is not None:
+        return {'document_type': doc_type, 'classified_by': routed_by, 'ocr_fallback': False}
+    document_classes = _worker_state['compiled_document_classes']
+    doc_type = classify_document(extract_text_from_pdf(pdf_path), document_classes)
+    ocr_fallback = doc_type == 'Unknown'
+    if ocr_fallback:
+        ocr_text = extract_text_with_ocr(pdf_path, html_transformer=_worker_state['html_transformer'])
+        doc_type = classify_document(ocr_text, document_classes)
+    return {'document_type': doc_type, 'classified_by': 'ocr' if ocr_fallback else 'content', 'ocr_fallback': ocr_fallback}
+
+
+def _extract(pdf_path, mode='hybrid', table_engine='pdfplumber'):
+    from page_store import pdf_hash
+    from pdf_table_extractor import extract_text_with_local_tables
+
+    extractor = _worker_state['pdf_section_extractor']
+    html_transformer = _worker_state['html_transformer']
+    pdf_name = os.path.splitext(os.path.basename(pdf_path))[0]
+    if mode == 'hybrid':
+        pages = extractor.extract_text_hybrid(pdf_path, workers=1, save=False, html_transformer=html_transformer)
+    elif mode == 'local':
+        pages = extract_text_with_local_tables(pdf_path, engine=table_engine, workers=1)
+    elif mode == 'layout':
+        pages = extractor.transform_layout_documents(extractor.load_layout_documents(pdf_path), pdf_name,
+                                                     html_transformer=html_transformer)
+    else:
+        raise ValueError(f"지원하지 않는 추출 모드입니다: {mode}")
+    sections = extractor.split_text_into_sections_with_metadata(pages)
+    section_df = extractor.sections_to_dataframe_with_metadata(sections, os.path.basename(pdf_path))
+    return {'pdf_hash': pdf_hash(pdf_path), 'name': pdf_name, 'pages': pages,
+            'sections': section_df.to_dict(orient='records')}
+
+
+def _worker_pid(hold_seconds):
+    time.sleep(hold_seconds)
+    return os.getpid()
+
+
+def run_job(job):
+    """워커에서 작업 하나를 실행하고 결과 딕셔너리를 돌려줍니다. 예외는 결과의 error로 담습니다."""
+    start = time.time()
+    result = {'id': job['id'], 'kind': job['kind'], 'pdf_path': job['pdf_path'], 'worker': os.getpid(),
+              'queue_seconds': start - job.get('submitted', start)}
+    try:
+        if job['kind'] == 'classify':
+            result.update(_classify(job['pdf_path']))
+        else:
+            result.update(_extract(job['pdf_path'], **job.get('options', {})))
+        result['status'] = 'ok'
+    except Exception as e:
+        result.update(status='error', error=f"{type(e).__name__}: {e}")
+    result['seconds'] = time.time() - start
+    return result
+
+
+def make_job(pdf_path, kind='classify', **options):
+    if kind not in JOB_KINDS:
+        raise ValueError(f"작업 종류는 {JOB_KINDS} 중 하나여야 합니다: {kind}")
+    return {'id': uuid.uuid4().hex[:12], 'kind': kind, 'pdf_path': os.path.abspath(pdf_path),
+            'options': {key: value for key, value in options.items() if value is not None}, 'submitted': time.time()}
+
+
+class ResultSink:
+    """
+    완료된 작업 결과를 JSONL 파일에 한 줄씩 이어 쓰고, extract 결과의 페이지 텍스트는 PageStore에 저장합니다.
+    여러 스레드(소켓 연결, 파일 큐)에서 호출되므로 잠금으로 순서를 지킵니다.
+    """
+
+    def __init__(self, output_path, page_store_dir=None):
+        from page_store import PageStore
+
+        os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+        self._file = open(output_path, 'a', encoding='utf-8')
+        self.page_store = PageStore(page_store_dir) if page_store_dir else PageStore()
+        self._lock = threading.Lock()
+
+    def write(self, result):
+        """결과를 저장하고, 페이지 텍스트를 뺀 결과(소켓 응답용)를 돌려줍니다."""
+        pages = result.pop('pages', None)
+        with self._lock:
+            if pages is not None:
+                self.page_store.put_pages(result['pdf_hash'], pages, name=result['name'])
+                result['page_count'] = len(pages)
+            self._file.write(json.dumps(result, ensure_ascii=False, default=str) + '\n')
+            self._file.flush()
+        status = result['status'] if result['status'] == 'ok' else f"실패 ({result['error']})"
+        print(f"[{result['kind']}] {os.path.basename(result['pdf_path'])}: {status}, "
+              f"대기 {result['queue_seconds']:.2f}초, 처리 {result['seconds']:.2f}초")
+        return result
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+            self.page_store.close()
+
+
+class FileQueue:
+    """queue_dir/{incoming,processing,done,failed} 디렉토리로 만든 작업 큐입니다."""
+
+    def __init__(self, queue_dir=DEFAULT_QUEUE_DIR, settle_seconds=1.0):
+        self.queue_dir = queue_dir
+        self.settle_seconds = settle_seconds
+        for state in QUEUE_STATES:
+            os.makedirs(self.path(state), exist_ok=True)
+
+    def path(self, state, name=''):
+        return os.path.join(self.queue_dir, state, name)
+
+    def submit(self, job):
+        """작업 JSON을 임시 파일에 쓴 뒤 이름을 바꿔 원자적으로 넣습니다."""
+        name = f"{int(job['submitted'] * 1000)}-{job['id']}.json"
+        temp_path = self.path('incoming', f'.{name}.tmp')
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(job, f, ensure_ascii=False)
+        os.replace(temp_path, self.path('incoming', name))
+        return name
+
+    def recover(self):
+        """이전 실행이 중간에 끝나 processing/에 남은 작업을 incoming/으로 되돌립니다."""
+        for name in os.listdir(self.path('processing')):
+            os.replace(self.path('processing', name), self.path('incoming', name))
+
+    def claim(self, default_kind='classify', default_options=None):
+        """
+        처리할 수 있는 작업을 processing/으로 옮기고 돌려줍니다.
+
+        반환값:
+        - list: (파일 이름, 작업) 튜플 리스트
+        """
+        claimed = []
+        now = time.time()
+        for name in sorted(os.listdir(self.path('incoming'))):
+            source = self.path('incoming', name)
+            lower = name.lower()
+            if name.startswith('.') or not (lower.endswith('.json') or lower.endswith('.pdf')):
+                continue
+            if lower.endswith('.pdf') and now - os.path.getmtime(source) < self.settle_seconds:
+                continue  # 아직 복사 중일 수 있습니다.
+            try:
+                os.rename(source, self.path('processing', name))
+            except FileNotFoundError:
+                continue  # 다른 데몬이 먼저 가져갔습니다.
+            if lower.endswith('.pdf'):
+                job = make_job(self.path('processing', name), default_kind, **(default_options or {}))
+            else:
+                with open(self.path('processing', name), 'r', encoding='utf-8') as f:
+                    job = json.load(f)
+            claimed.append((name, job))
+        return claimed
+
+    def finish(self, name, ok):
+        shutil.move(self.path('processing', name), self.path('done' if ok else 'failed', name))
+
+
+class _JobHandler(socketserver.StreamRequestHandler):
+    """한 연결에서 작업 JSON을 한 줄씩 받아 제출하고, 끝나는 순서대로 결과를 한 줄씩 돌려줍니다."""
+
+    def handle(self):
+        daemon = self.server.daemon
+        write_lock = threading.Lock()
+        pending = []
+
+        def reply(result):
+            with write_lock:
+                try:
+                    self.wfile.write((json.dumps(result, ensure_ascii=False, default=str) + '\n').encode('utf-8'))
+                    self.wfile.flush()
+                except OSError:
+                    pass  # 클라이언트가 먼저 연결을 끊었어도 결과는 싱크에 남습니다.
+
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+                job = make_job(request['pdf_path'], request.get('kind', 'classify'), **request.get('options', {}))
+            except (ValueError, KeyError) as e:
+                reply({'status': 'error', 'error': f"잘못된 작업입니다: {e}"})
+                continue
+            pending.append(daemon.submit(job, reply))
+        for event in pending:
+            event.wait()
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class IngestDaemon:
+    """
+    워커 풀, 결과 싱크, 작업 입력(파일 큐와 Unix 소켓)을 묶은 데몬입니다.
+
+    매개변수:
+    - workers: 상주 워커 프로세스 수
+    - output_path: 결과 JSONL 경로
+    - queue_dir: 파일 시스템 큐 디렉토리 (None이면 사용하지 않음)
+    - socket_path: Unix 소켓 경로 (None이면 사용하지 않음)
+    - document_class_path: 분류 키워드 JSON 경로
+    - page_store_dir: extract 결과를 저장할 PageStore 디렉토리
+    - default_kind, default_options: 파일 큐에 PDF를 직접 넣었을 때의 작업 종류와 옵션
+    - poll_interval: 파일 큐 확인 간격 (초)
+    """
+
+    def __init__(self, workers=1, output_path=DEFAULT_OUTPUT_PATH, queue_dir=DEFAULT_QUEUE_DIR, socket_path=None,
+                 document_class_path=os.path.join(root_dir, 'document_class.json'), page_store_dir=None,
+                 default_kind='classify', default_options=None, poll_interval=0.5):
+        self.sink = ResultSink(output_path, page_store_dir)
+        self.queue = FileQueue(queue_dir) if queue_dir else None
+        self.socket_path = socket_path
+        self.default_kind = default_kind
+        self.default_options = default_options or {}
+        self.poll_interval = poll_interval
+        self.workers = workers
+        self.executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                            initializer=_init_worker, initargs=(document_class_path,))
+        self._stop = threading.Event()
+        self._server = None
+
+    def submit(self, job, callback=None):
+        """
+        작업을 워커 풀에 제출합니다.
+
+        반환값:
+        - threading.Event: 결과가 싱크에 기록되고 callback이 호출되면 설정됩니다.
+        """
+        done = threading.Event()
+
+        def on_done(future):
+            try:
+                result = future.result()
+            except Exception as e:  # 워커 프로세스가 비정상 종료된 경우
+                result = {'id': job['id'], 'kind': job['kind'], 'pdf_path': job['pdf_path'], 'status': 'error',
+                          'error': f"{type(e).__name__}: {e}", 'queue_seconds': 0.0, 'seconds': 0.0}
+            result = self.sink.write(result)
+            try:
+                if callback is not None:
+                    callback(result)
+            finally:
+                done.set()
+
+        self.executor.submit(run_job, job).add_done_callback(on_done)
+        return done
+
+    def warm_up(self, workers):
+        """워커 프로세스를 모두 띄워 initializer가 끝날 때까지 기다립니다."""
+        start = time.perf_counter()
+        # 풀은 쉬는 워커가 없을 때만 새 프로세스를 띄우므로, 잠시 붙잡아 두는 작업으로 워커를 모두 띄웁니다.
+        futures = [self.executor.submit(_worker_pid, 0.5) for _ in range(workers)]
+        pids = {future.result() for future in futures}
+        print(f"워커 {len(pids)}개 준비 완료 ({time.perf_counter() - start:.1f}초)")
+
+    def _serve_socket(self):
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self._server = _UnixServer(self.socket_path, _JobHandler)
+        self._server.daemon = self
+        print(f"소켓 {self.socket_path}에서 작업을 받습니다.")
+        self._server.serve_forever()
+
+    def _poll_queue(self):
+        for name, job in self.queue.claim(self.default_kind, self.default_options):
+            self.submit(job, lambda result, name=name: self.queue.finish(name, result['status'] == 'ok'))
+
+    def stop(self, *_):
+        self._stop.set()
+
+    def run(self):
+        """SIGINT/SIGTERM을 받을 때까지 작업을 받고, 종료 시 진행 중인 작업을 마칩니다."""
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+        self.warm_up(self.workers)
+        socket_thread = None
+        if self.socket_path:
+            socket_thread = threading.Thread(target=self._serve_socket, daemon=True)
+            socket_thread.start()
+        if self.queue is not None:
+            self.queue.recover()
+            print(f"파일 큐 {self.queue.path('incoming')}를 {self.poll_interval}초마다 확인합니다.")
+        try:
+            while not self._stop.is_set():
+                if self.queue is not None:
+                    self._poll_queue()
+                self._stop.wait(self.poll_interval)
+        finally:
+            print("종료 중: 진행 중인 작업을 마칩니다.")
+            if self._server is not None:
+                self._server.shutdown()
+                self._server.server_close()
+                os.unlink(self.socket_path)
+            self.executor.shutdown(wait=True)
+            self.sink.close()
+
+
+def submit_to_socket(socket_path, jobs):
+    """작업들을 소켓으로 보내고 결과를 끝나는 순서대로 돌려줍니다 (제너레이터)."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.connect(socket_path)
+        for job in jobs:
+            client.sendall((json.dumps(job, ensure_ascii=False) + '\n').encode('utf-8'))
+        client.shutdown(socket.SHUT_WR)
+        with client.makefile('r', encoding='utf-8') as responses:
+            for line in responses:
+                yield json.loads(line)
+
+
+@click.group()
+def cli():
+    pass
+
+
+@cli.command()
+@click.option('--workers', type=int, default=1, help='상주 워커 프로세스 수')
+@click.option('--output_path', type=click.Path(dir_okay=False), default=DEFAULT_OUTPUT_PATH, help='결과 JSONL 경로')
+@click.option('--queue_dir', type=click.Path(file_okay=False), default=DEFAULT_QUEUE_DIR, help='파일 시스템 큐 디렉토리')
+@click.option('--no_queue', is_flag=True, default=False, help='파일 시스템 큐를 사용하지 않습니다.')
+@click.option('--socket_path', type=click.Path(dir_okay=False), default=None, help='작업을 받을 Unix 소켓 경로')
+@click.option('--document_class_path', type=click.Path(exists=True, dir_okay=False),
+              default=os.path.join(root_dir, 'document_class.json'))
+@click.option('--page_store_dir', type=click.Path(file_okay=False), default=None,
+              help='extract 결과 페이지 저장소 (기본값: page_store/)')
+@click.option('--kind', type=click.Choice(JOB_KINDS), default='classify', help='큐에 PDF를 직접 넣었을 때의 작업 종류')
+@click.option('--mode', type=click.Choice(['layout', 'hybrid', 'local']), default='hybrid', help='extract 추출 모드')
+@click.option('--poll_interval', type=float, default=0.5, help='파일 큐 확인 간격 (초)')
+def serve(workers, output_path, queue_dir, no_queue, socket_path, document_class_path, page_store_dir, kind, mode,
+          poll_interval):
+    """워커를 띄워 두고 작업을 기다립니다."""
+    daemon = IngestDaemon(workers, output_path, None if no_queue else queue_dir, socket_path, document_class_path,
+                          page_store_dir, default_kind=kind,
+                          default_options={'mode': mode} if kind == 'extract' else None, poll_interval=poll_interval)
+    daemon.run()
+
+
+@cli.command()
+@click.argument('pdf_paths', nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+@click.option('--kind', type=click.Choice(JOB_KINDS), default='classify')
+@click.option('--mode', type=click.Choice(['layout', 'hybrid', 'local']), default=None, help='extract 추출 모드')
+@click.option('--table_engine', type=click.Choice(['pdfplumber', 'pymupdf']), default=None)
+@click.option('--socket_path', type=click.Path(dir_okay=False), default=None,
+              help='주면 소켓으로 보내고 결과를 기다립니다. 없으면 파일 시스템 큐에 넣습니다.')
+@click.option('--queue_dir', type=click.Path(file_okay=False), default=DEFAULT_QUEUE_DIR)
+def submit(pdf_paths, kind, mode, table_engine, socket_path, queue_dir):
+    """작업을 데몬에 넣습니다."""
+    jobs = [make_job(pdf_path, kind, mode=mode if kind == 'extract' else None,
+                     table_engine=table_engine if kind == 'extract' else None) for pdf_path in pdf_paths]
+    if socket_path:
+        for result in submit_to_socket(socket_path, jobs):
+            result.pop('sections', None)
+            print(json.dumps(result, ensure_ascii=False))
+        return
+    queue = FileQueue(queue_dir)
+    for job in jobs:
+        print(f"{job['pdf_path']} → {queue.path('incoming', queue.submit(job))}")
+
+
+if __name__ == '__main__':
+    cli()
@@ -0,0 +1,313 @@
+"""
+다운로드 → 검증 → 분류 스트리밍 파이프라인
+
+download_pdf.py가 모두 끝나야 classify_documents.py를 시작할 수 있고, 둘 다 저장된 파일이 올바른 PDF인지
+확인하지 않아 잘린 다운로드는 나중에 fitz나 레이아웃 분석 단계에서야 실패합니다.
+이 파이프라인은 세 단계를 겹쳐 실행합니다.
+
+1. 다운로드 (스레드): 다운로드 계획(download_plan.py)의 파일을 스트리밍으로 받으면서 sha256을 계산하고
+   첫 바이트(헤더)와 마지막 바이트(트레일러)를 보관합니다.
+2. 검증: '%PDF-' 헤더, 끝부분의 startxref와 %%EOF, Content-Length와 받은 크기, PyMuPDF 페이지 수를 확인합니다.
+   실패하면 그 자리에서 바로 다시 받습니다 (max_retries회). 통과한 파일만 .part에서 최종 이름으로 바꿉니다.
+3. 분류: 통과한 파일은 크기가 제한된 큐로 넘어가 다운로드와 동시에 분류됩니다.
+   다운로드 계획/파일 이름으로 정해지는 파일(document_router.py)은 바로, 나머지는 상주 워커 프로세스
+   (ingest_daemon.py와 같은 워커)에서 내용으로 분류합니다. 분류가 밀리면 큐가 차서 다운로드가 기다립니다.
+
+결과는 output_dir/pipeline_result.parquet에 저장합니다.
+
+사용법
+    python ingest_pipeline.py shinhan_life_products_combined.xlsx --output_dir data/pdf_docs --download_workers 4
+"""
+
+import hashlib
+import json
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import click
+
+from download_plan import DEFAULT_URL_COLUMNS, plan_from_catalog, save_plan
+from instrumentation import span, tracer
+from lazy_import import lazy_module
+
+pd = lazy_module('pandas')
+
+PDF_HEADER = b'%PDF-'
+# 트레일러(startxref, %%EOF)는 파일 끝 1024바이트 안에 있어야 하지만 뒤에 붙는 공백을 감안해 넉넉히 봅니다.
+TAIL_BYTES = 2048
+CHUNK_BYTES = 1 << 16
+_DONE = object()
+RESULT_COLUMNS = ['url_id', 'url', 'file_name', 'download_status', 'download_seconds', 'download_error', 'sha256',
+                  'bytes', 'pages', 'attempts', 'document_type', 'classified_by', 'classify_seconds', 'classify_error']
+
+
+def validate_pdf(path, head, tail, received_bytes, expected_bytes=None):
+    """
+    받은 PDF가 올바른지 확인합니다.
+
+    매개변수:
+    - path: 저장한 파일 경로
+    - head, tail: 파일의 처음/마지막 바이트
+    - received_bytes: 받은 바이트 수
+    - expected_bytes: 응답의 Content-Length (없으면 None)
+
+    반환값:
+    - (페이지 수, 오류 메시지) 튜플. 올바르면 오류 메시지가 None
+    """
+    if expected_bytes is not None and received_bytes != expected_bytes:
+        return 0, f"크기 불일치 ({received_bytes} / {expected_bytes}바이트)"
+    if not head.startswith(PDF_HEADER):
+        return 0, f"PDF 헤더 없음 ({head[:16]!r})"
+    if b'%%EOF' not in tail or b'startxref' not in tail:
+        return 0, "트레일러(startxref/%%EOF) 없음 - 잘린 파일"
+    import fitz
+    try:
+        with fitz.open(path) as doc:
+            page_count = doc.page_count
+    except Exception as e:
+        return 0, f"PDF 열기 실패: {type(e).__name__}: {e}"
+    if page_count == 0:
+        return 0, "페이지 없음"
+    return page_count, None
+
+
+def _read_existing(path):
+    """이미 받은 파일의 (sha256, head, tail, 크기)"""
+    digest = hashlib.sha256()
+    head = b''
+    tail = b''
+    size = 0
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_BYTES), b''):
+            if not head:
+                head = chunk[:len(PDF_HEADER) + 16]
+            digest.update(chunk)
+            tail = (tail + chunk)[-TAIL_BYTES:]
+            size += len(chunk)
+    return digest.hexdigest(), head, tail, size
+
+
+def download_and_validate(session, url, path, max_retries=3, backoff=1.0, timeout=60):
+    """
+    URL을 스트리밍으로 받아 해시와 검증을 함께 수행하고, 통과하면 path에 저장합니다.
+    이미 올바른 파일이 있으면 받지 않습니다.
+
+    반환값:
+    - dict: status('ok', 'existing', 'invalid', 'failed'), sha256, bytes, pages, attempts, error, seconds
+    """
+    start = time.perf_counter()
+    if os.path.exists(path):
+        sha256, head, tail, size = _read_existing(path)
+        pages, error = validate_pdf(path, head, tail, size)
+        if error is None:
+            return {'status': 'existing', 'sha256': sha256, 'bytes': size, 'pages': pages, 'attempts': 0,
+                    'error': None, 'seconds': time.perf_counter() - start}
+    temp_path = path + '.part'
+    result = {'status': 'failed', 'sha256': None, 'bytes': 0, 'pages': 0, 'attempts': 0, 'error': None}
+    for attempt in range(1, max_retries + 1):
+        result['attempts'] = attempt
+        try:
+            with span('download', document=url) as download_span:
+                with session.get(url, stream=True, verify=False, timeout=timeout) as response:
+                    download_span.set(status_code=response.status_code)
+                    if response.status_code != 200:
+                        raise IOError(f"상태 코드 {response.status_code}")
+                    expected = response.headers.get('Content-Length')
+                    expected = int(expected) if expected and 'Content-Encoding' not in response.headers else None
+                    digest = hashlib.sha256()
+                    head = b''
+                    tail = b''
+                    size = 0
+                    with open(temp_path, 'wb') as f:
+                        for chunk in response.iter_content(CHUNK_BYTES):
+                            if len(head) < len(PDF_HEADER) + 16:
+                                head += chunk[:len(PDF_HEADER) + 16 - len(head)]
+                            digest.update(chunk)
+                            tail = (tail + chunk)[-TAIL_BYTES:]
+                            size += len(chunk)
+                            f.write(chunk)
+                    download_span.count('bytes', size)
+            with span('validate', document=url):
+                pages, error = validate_pdf(temp_path, head, tail, size, expected)
+            if error is None:
+                os.replace(temp_path, path)
+                result.update(status='ok', sha256=digest.hexdigest(), bytes=size, pages=pages, error=None)
+                break
+            result.update(status='invalid', bytes=size, error=error)
+        except Exception as e:
+            result.update(status='failed', error=f"{type(e).__name__}: {e}")
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        if attempt < max_retries:
+            time.sleep(backoff * 2 ** (attempt - 1))
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+class StreamingIngestPipeline:
+    """
+    다운로드 스레드와 분류 워커를 크기가 제한된 큐로 잇는 파이프라인입니다.
+
+    매개변수:
+    - output_dir: PDF 저장 디렉토리
+    - download_workers: 동시 다운로드 수
+    - classify_workers: 내용 분류 워커 프로세스 수 (0이면 분류하지 않음)
+    - queue_size: 다운로드와 분류 사이 큐의 최대 길이
+    - max_retries: 다운로드/검증 실패 시 시도 횟수
+    - delay: 다운로드 스레드마다 요청 사이 대기 시간 (초)
+    - document_class_path: 분류 키워드 JSON 경로
+    """
+
+    def __init__(self, output_dir, download_workers=4, classify_workers=1, queue_size=8, max_retries=3, delay=0.0,
+                 document_class_path='document_class.json'):
+        self.output_dir = output_dir
+        self.download_workers = download_workers
+        self.classify_workers = classify_workers
+        self.queue_size = queue_size
+        self.max_retries = max_retries
+        self.delay = delay
+        self.document_class_path = document_class_path
+        self._results = {}
+        self._lock = threading.Lock()
+
+    def _record(self, url_id, **values):
+        with self._lock:
+            self._results.setdefault(url_id, {}).update(values)
+
+    def _download(self, session, handoff, url_id, url, file_name):
+        path = os.path.join(self.output_dir, file_name)
+        result = download_and_validate(session, url, path, self.max_retries)
+        status = result.pop('status')
+        self._record(url_id, url=url, file_name=file_name, download_status=status,
+                     download_seconds=result.pop('seconds'), download_error=result.pop('error'), **result)
+        if status in ('ok', 'existing'):
+            handoff.put((url_id, path))  # 큐가 가득 차 있으면 분류가 따라올 때까지 기다립니다.
+        if self.delay:
+            time.sleep(self.delay)
+
+    def _classify(self, handoff):
+        """큐에서 검증된 파일을 꺼내 라우팅하거나 분류 워커에 보냅니다 (분류 스레드)."""
+        from document_router import route_document
+        from ingest_daemon import _init_worker, make_job, run_job
+
+        # 라우팅 유형은 분류 워커와 같은 json에서 읽습니다.
+        with open(self.document_class_path, 'r', encoding='utf-8') as f:
+            document_classes = json.load(f)
+        executor = None
+        in_flight = threading.Semaphore(max(self.classify_workers, 1) * 2)
+        try:
+            while True:
+                item = handoff.get()
+                if item is _DONE:
+                    break
+                url_id, path = item
+                try:
+                    doc_type, routed_by = route_document(path, document_classes)
+                    if doc_type is not None or self.classify_workers == 0:
+                        self._record(url_id, document_type=doc_type, classified_by=routed_by, classify_seconds=0.0)
+                        continue
+                    if executor is None:
+                        executor = ProcessPoolExecutor(max_workers=self.classify_workers,
+                                                       mp_context=multiprocessing.get_context('spawn'),
+                                                       initializer=_init_worker, initargs=(self.document_class_path,))
+                    in_flight.acquire()
+                    future = executor.submit(run_job, make_job(path, 'classify'))
+                except Exception as e:
+                    # 분류 스레드가 멈추면 큐가 차서 다운로드도 멈추므로, 오류는 기록하고 다음 파일로 넘어갑니다.
+                    self._record(url_id, classify_error=f"{type(e).__name__}: {e}")
+                    continue
+
+                def on_done(future, url_id=url_id):
+                    try:
+                        result = future.result()
+                        self._record(url_id, document_type=result.get('document_type'),
+                                     classified_by=result.get('classified_by'), classify_seconds=result['seconds'],
+                                     classify_error=result.get('error'))
+                    except Exception as e:
+                        self._record(url_id, classify_error=f"{type(e).__name__}: {e}")
+                    finally:
+                        in_flight.release()
+                future.add_done_callback(on_done)
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=True)
+
+    def run(self, files):
+        """
+        다운로드 계획의 files(url_id, url, file_name)를 실행합니다.
+
+        반환값:
+        - DataFrame: 파일별 다운로드/검증/분류 결과
+        """
+        import requests
+        import urllib3
+        urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        start = time.perf_counter()
+        handoff = queue.Queue(maxsize=self.queue_size)
+        classifier = threading.Thread(target=self._classify, args=(handoff,), daemon=True)
+        classifier.start()
+        session = requests.Session()
+        session.mount('https://', requests.adapters.HTTPAdapter(pool_maxsize=self.download_workers))
+        session.mount('http://', requests.adapters.HTTPAdapter(pool_maxsize=self.download_workers))
+        try:
+            with ThreadPoolExecutor(max_workers=self.download_workers) as executor:
+                futures = [executor.submit(self._download, session, handoff, url_id, url, file_name)
+                           for url_id, url, file_name in zip(files['url_id'], files['url'], files['file_name'])]
+                for future in futures:
+                    future.result()
+        finally:
+            # 다운로드 스레드에서 예외가 나도 분류 스레드가 큐에서 영원히 기다리지 않도록 종료 표시를 보냅니다.
+            handoff.put(_DONE)
+            classifier.join()
+        wall_seconds = time.perf_counter() - start
+
+        # 받을 파일이 없어도(카탈로그가 모두 X나 빈칸) 같은 열의 빈 결과를 돌려줍니다.
+        results = pd.DataFrame([{'url_id': url_id, **values} for url_id, values in self._results.items()],
+                               columns=RESULT_COLUMNS)
+        serial_seconds = results['download_seconds'].sum() + results['classify_seconds'].sum()
+        counts = results['download_status'].value_counts()
+        print(f"파일 {len(results)}개: 받음 {counts.get('ok', 0)}, 기존 {counts.get('existing', 0)}, "
+              f"검증 실패 {counts.get('invalid', 0)}, 다운로드 실패 {counts.get('failed', 0)}, "
+              f"재시도 {int((results['attempts'] - 1).clip(lower=0).sum())}회")
+        print(f"전체 {wall_seconds:.1f}초 (단계별 소요 시간 합 {serial_seconds:.1f}초)")
+        return results
+
+
+@click.command()
+@click.argument('catalog_path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--url_columns', default=','.join(DEFAULT_URL_COLUMNS), help='URL 열 (쉼표로 구분)')
+@click.option('--output_dir', type=click.Path(file_okay=False), default=os.path.join('data', 'pdf_docs'))
+@click.option('--download_workers', type=int, default=4, help='동시 다운로드 수')
+@click.option('--classify_workers', type=int, default=1, help='내용 분류 워커 프로세스 수 (0이면 라우팅만)')
+@click.option('--queue_size', type=int, default=8, help='다운로드와 분류 사이 큐의 최대 길이')
+@click.option('--max_retries', type=int, default=3, help='다운로드/검증 실패 시 시도 횟수')
+@click.option('--delay', type=float, default=0.0, help='다운로드 스레드마다 요청 사이 대기 시간 (초)')
+@click.option('--document_class_path', type=click.Path(exists=True, dir_okay=False), default='document_class.json')
+def main(catalog_path, url_columns, output_dir, download_workers, classify_workers, queue_size, max_retries, delay,
+         document_class_path):
+    from corpus_io import write_table
+
+    files, mapping, skipped = plan_from_catalog(catalog_path, url_columns.split(','))
+    # 다운로드 계획을 먼저 저장해 두면 분류 단계의 document_router가 URL 열로 유형을 정할 수 있습니다.
+    save_plan(files, mapping, os.path.join(output_dir, 'download_plan.parquet'))
+    print(f"URL 참조 {len(mapping)}개 → 파일 {len(files)}개, URL 형식이 아닌 값 {len(skipped)}개")
+    pipeline = StreamingIngestPipeline(output_dir, download_workers, classify_workers, queue_size, max_retries, delay,
+                                       document_class_path)
+    results = pipeline.run(files)
+    result_path = os.path.join(output_dir, 'pipeline_result.parquet')
+    write_table(results, result_path)
+    print(f"결과: {result_path}")
+    if len(results):
+        print(results['document_type'].fillna('미분류').value_counts().to_string())
+    if tracer.enabled:
+        tracer.print_summary()
+
+
+if __name__ == '__main__':
+    main()
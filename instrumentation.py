@@ -0,0 +1,227 @@
+"""
+수집 스크립트 공통 계측(instrumentation)
+
+download_pdf, classify_documents, pdf_section_extractor 등의 각 단계(download, rasterize,
+layout_analysis, html_transform, split, chunk, write ...)를 span으로 감싸 소요 시간과
+문서별 카운터(pages, bytes, retries, cache_hits ...)를 기록합니다.
+
+사용 방법:
+    from instrumentation import span, traced
+
+    with span('download', document=url) as s:
+        ...
+        s.count('bytes', len(content))
+
+    @traced('chunk')
+    def process(...):
+        ...
+
+활성화는 환경 변수로 합니다. 설정하지 않으면 span은 아무 일도 하지 않는 공용 객체를 돌려주므로
+계측 코드가 있어도 오버헤드가 거의 없습니다.
+- PIPELINE_TRACE_JSONL: span 기록을 한 줄씩 추가할 JSONL 파일 경로
+- PIPELINE_TRACE_PROM: 프로세스 종료 시 단계별 누적값을 기록할 Prometheus 텍스트 파일 경로.
+  워커 프로세스(ingest_daemon, ingest_pipeline의 프로세스 풀 등)는 서로와 메인 프로세스의 파일을 덮어쓰지 않도록
+  파일 이름에 pid를 붙여 따로 기록합니다 (예: trace.prom → trace.12345.prom). 모든 값에는 pid 레이블이 붙습니다.
+  fork로 만든 워커는 종료할 때 atexit을 실행하지 않고 terminate()로 끝나기도 하므로, 워커는 최상위 span이 끝날 때마다 씁니다.
+"""
+
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+
+
+class _NoopSpan:
+    """계측이 꺼져 있을 때 사용하는 span입니다."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def count(self, name, value=1):
+        pass
+
+    def set(self, **attributes):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    """단계 하나의 실행 구간입니다. 끝날 때 Tracer에 기록됩니다."""
+
+    def __init__(self, tracer, stage, attributes):
+        self.tracer = tracer
+        self.stage = stage
+        self.attributes = attributes
+        self.counters = defaultdict(float)
+        self.parent = None
+
+    def __enter__(self):
+        stack = self.tracer._stack()
+        self.parent = stack[-1].stage if stack else None
+        stack.append(self)
+        self.started_at = datetime.now().isoformat(timespec='milliseconds')
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.start
+        self.tracer._stack().pop()
+        self.tracer._record(self, seconds, error=exc_type.__name__ if exc_type else None)
+        return False
+
+    def count(self, name, value=1):
+        """카운터 값을 더합니다 (예: pages, bytes, retries, cache_hits)."""
+        self.counters[name] += value
+
+    def set(self, **attributes):
+        """span 속성을 추가합니다 (예: document=파일명)."""
+        self.attributes.update(attributes)
+
+
+class Tracer:
+    """span 기록을 모아 JSONL과 Prometheus 텍스트 형식으로 내보냅니다."""
+
+    def __init__(self):
+        self.enabled = False
+        self.jsonl_path = None
+        self.prometheus_path = None
+        self._reset()
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._stage_totals = defaultdict(lambda: {'calls': 0, 'errors': 0, 'seconds': 0.0,
+                                                  'counters': defaultdict(float)})
+        self._child_pid = None
+
+    def _in_child(self):
+        """multiprocessing 워커 프로세스인지 여부"""
+        if self._child_pid is None:
+            import multiprocessing
+            self._child_pid = os.getpid() if multiprocessing.parent_process() is not None else 0
+        return self._child_pid == os.getpid()
+
+    def configure(self, jsonl_path=None, prometheus_path=None, enabled=None):
+        """계측을 설정합니다. 경로가 하나라도 있으면 기본적으로 활성화됩니다."""
+        self.jsonl_path = jsonl_path
+        self.prometheus_path = prometheus_path
+        self.enabled = bool(jsonl_path or prometheus_path) if enabled is None else enabled
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def span(self, stage, **attributes):
+        if not self.enabled:
+            return _NOOP_SPAN
+        return Span(self, stage, attributes)
+
+    def _record(self, span, seconds, error=None):
+        record = {
+            'stage': span.stage,
+            'parent': span.parent,
+            'started_at': span.started_at,
+            'seconds': round(seconds, 6),
+            'error': error,
+            'attributes': span.attributes,
+            'counters': dict(span.counters),
+            'pid': os.getpid(),
+        }
+        with self._lock:
+            totals = self._stage_totals[span.stage]
+            totals['calls'] += 1
+            totals['errors'] += error is not None
+            totals['seconds'] += seconds
+            for name, value in span.counters.items():
+                totals['counters'][name] += value
+            if self.jsonl_path:
+                with open(self.jsonl_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+        if self.prometheus_path and not self._stack() and self._in_child():
+            self.export_prometheus()
+
+    def summary(self):
+        """단계별 누적값 {stage: {'calls', 'errors', 'seconds', 'counters'}}"""
+        with self._lock:
+            return {stage: {**totals, 'counters': dict(totals['counters'])}
+                    for stage, totals in self._stage_totals.items()}
+
+    def prometheus_text(self):
+        """단계별 누적값을 Prometheus 텍스트 노출 형식으로 만듭니다."""
+        summary = self.summary()
+        pid = os.getpid()
+        lines = [
+            '# HELP pipeline_stage_seconds_total Total time spent in each pipeline stage.',
+            '# TYPE pipeline_stage_seconds_total counter',
+        ]
+        lines += [f'pipeline_stage_seconds_total{{stage="{stage}",pid="{pid}"}} {totals["seconds"]:.6f}'
+                  for stage, totals in summary.items()]
+        lines += ['# HELP pipeline_stage_calls_total Number of completed spans per stage.',
+                  '# TYPE pipeline_stage_calls_total counter']
+        lines += [f'pipeline_stage_calls_total{{stage="{stage}",pid="{pid}"}} {totals["calls"]}'
+                  for stage, totals in summary.items()]
+        lines += ['# HELP pipeline_stage_errors_total Number of spans that raised an exception per stage.',
+                  '# TYPE pipeline_stage_errors_total counter']
+        lines += [f'pipeline_stage_errors_total{{stage="{stage}",pid="{pid}"}} {totals["errors"]}'
+                  for stage, totals in summary.items()]
+        lines += ['# HELP pipeline_stage_counter_total Per-stage counters such as pages, bytes, retries and cache hits.',
+                  '# TYPE pipeline_stage_counter_total counter']
+        lines += [f'pipeline_stage_counter_total{{stage="{stage}",counter="{name}",pid="{pid}"}} {value:g}'
+                  for stage, totals in summary.items() for name, value in totals['counters'].items()]
+        return '\n'.join(lines) + '\n'
+
+    def export_prometheus(self, path=None):
+        """단계별 누적값을 Prometheus 텍스트 파일로 씁니다. 자식 프로세스는 pid를 붙인 파일에 씁니다."""
+        path = path or self.prometheus_path
+        if path and self._in_child():
+            root, ext = os.path.splitext(path)
+            path = f"{root}.{os.getpid()}{ext}"
+        if path and self._stage_totals:
+            # 수집기가 쓰는 도중의 파일을 읽지 않도록 임시 파일에 쓴 뒤 바꿉니다.
+            temp_path = f"{path}.tmp{os.getpid()}"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                f.write(self.prometheus_text())
+            os.replace(temp_path, path)
+
+    def print_summary(self):
+        """단계별 소요 시간을 큰 순서대로 출력합니다."""
+        summary = self.summary()
+        for stage, totals in sorted(summary.items(), key=lambda item: -item[1]['seconds']):
+            counters = ', '.join(f"{name}={value:g}" for name, value in totals['counters'].items())
+            print(f"{stage:20s} {totals['seconds']:9.2f}s  {totals['calls']:5d}회  {counters}")
+
+
+tracer = Tracer()
+tracer.configure(jsonl_path=os.getenv('PIPELINE_TRACE_JSONL'), prometheus_path=os.getenv('PIPELINE_TRACE_PROM'))
+atexit.register(tracer.export_prometheus)
+# fork로 만든 자식은 부모의 누적값과 잠금을 물려받으므로 새로 시작합니다.
+os.register_at_fork(after_in_child=tracer._reset)
+
+
+def span(stage, **attributes):
+    """전역 tracer의 span을 만듭니다. 계측이 꺼져 있으면 no-op span을 돌려줍니다."""
+    return tracer.span(stage, **attributes)
+
+
+def traced(stage):
+    """함수 호출 전체를 span으로 감싸는 데코레이터입니다."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return func(*args, **kwargs)
+            with tracer.span(stage, function=func.__qualname__):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
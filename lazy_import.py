@@ -0,0 +1,57 @@
+"""
+지연 import
+
+main.py, make_corpus.py, make_qa.py, pdf_section_extractor.py 같은 진입점이 autorag, llama_index,
+langchain_upstage, pdf2image, pandas 등을 모듈 최상단에서 import하면 --help나 인자 검사만 해도,
+그리고 spawn으로 띄운 워커 프로세스마다 import 시간이 몇 초씩 듭니다.
+
+- 진입점은 click, os 같은 가벼운 모듈만 최상단에서 import하고, 무거운 의존성은 그것을 쓰는 명령(함수) 안에서 import합니다.
+- 여러 함수에서 쓰는 모듈은 lazy_module로 최상단에 두면 첫 속성 접근 때 실제로 import됩니다.
+      pd = lazy_module('pandas')
+      df = pd.DataFrame(...)   # 여기서 pandas를 import합니다.
+- import_budget.py가 진입점의 import 시간과 최상단에서 불러오는 무거운 모듈을 확인합니다.
+"""
+
+import importlib
+import types
+
+
+class LazyModule(types.ModuleType):
+    """첫 속성 접근 때 실제 모듈을 import하고, 그 뒤로는 실제 모듈의 속성을 그대로 돌려주는 대리 모듈입니다."""
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.__dict__['_lazy_module'] = None
+
+    def _load(self):
+        module = self.__dict__['_lazy_module']
+        if module is None:
+            module = importlib.import_module(self.__name__)
+            self.__dict__['_lazy_module'] = module
+            # 이후 속성 접근이 __getattr__을 거치지 않도록 실제 모듈의 속성을 복사해 둡니다.
+            self.__dict__.update({key: value for key, value in module.__dict__.items()
+                                  if key not in {'__name__', '__spec__', '__loader__'}})
+        return module
+
+    def __getattr__(self, name):
+        return getattr(self._load(), name)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = 'loaded' if self.__dict__['_lazy_module'] is not None else 'not loaded'
+        return f"<lazy module '{self.__name__}' ({state})>"
+
+
+def lazy_module(name):
+    """
+    처음 사용할 때 import되는 모듈을 돌려줍니다.
+
+    매개변수:
+    - name: 모듈 이름 (예: 'pandas', 'pyarrow.parquet')
+
+    반환값:
+    - LazyModule
+    """
+    return LazyModule(name)
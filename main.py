@@ -1,9 +1,11 @@
 import os
 
 import click
-from autorag.evaluator import Evaluator
+import yaml
 from dotenv import load_dotenv
 
+from response_cache import TEMPERATURE_POLICIES, ResponseCache, print_cache_stats
+
 root_path = os.path.dirname(os.path.realpath(__file__))
 data_path = os.path.join(root_path, 'data')
 
@@ -13,14 +15,76 @@ data_path = os.path.join(root_path, 'data')
 @click.option('--qa_data_path', type=click.Path(exists=True), default=os.path.join(data_path, 'qa.parquet'))
 @click.option('--corpus_data_path', type=click.Path(exists=True), default=os.path.join(data_path, 'corpus.parquet'))
 @click.option('--project_dir', type=click.Path(exists=False), default=os.path.join(root_path, 'benchmark'))
-def main(config, qa_data_path, corpus_data_path, project_dir):
+@click.option('--no_cache', is_flag=True, default=False, help='이전 trial의 노드 결과를 재사용하지 않습니다.')
+@click.option('--embedding_cache_dir', type=click.Path(file_okay=False), default=os.path.join(root_path, 'embedding_cache'))
+@click.option('--no_embedding_cache', is_flag=True, default=False, help='임베딩 캐시를 사용하지 않습니다.')
+@click.option('--bm25_index_root', type=click.Path(file_okay=False), default=os.path.join(root_path, 'bm25_index'),
+              help='ko_kiwi BM25 색인 저장 디렉토리')
+@click.option('--grid', is_flag=True, default=False,
+              help='설정의 조합을 독립적인 작업 단위로 펼쳐 프로세스 풀에서 실행하고 리더보드를 만듭니다.')
+@click.option('--workers', type=int, default=None, help='--grid 실행 프로세스 수 (기본값: CPU 수)')
+@click.option('--requests_per_minute', type=int, default=500, help='--grid 워커 전체가 공유하는 OpenAI 분당 요청 수')
+@click.option('--response_cache_path', type=click.Path(dir_okay=False),
+              default=os.path.join(root_path, 'response_cache.sqlite'), help='generator 응답 캐시 파일')
+@click.option('--no_response_cache', is_flag=True, default=False, help='generator 응답 캐시를 사용하지 않습니다.')
+@click.option('--response_cache_ttl_days', type=float, default=30.0, help='캐시된 응답의 유효 기간 (일)')
+@click.option('--response_cache_max_mb', type=float, default=1024.0, help='응답 캐시 최대 크기 (MB)')
+@click.option('--temperature_policy', type=click.Choice(TEMPERATURE_POLICIES), default='bypass',
+              help='temperature가 0.2보다 높은 요청의 캐시 정책')
+def main(config, qa_data_path, corpus_data_path, project_dir, no_cache, embedding_cache_dir, no_embedding_cache,
+         bm25_index_root, grid, workers, requests_per_minute, response_cache_path, no_response_cache,
+         response_cache_ttl_days, response_cache_max_mb, temperature_policy):
+    # autorag, pandas 등 무거운 의존성은 --help와 인자 검사가 끝난 뒤에 import합니다.
+    from bm25_index import BM25Index, build_index, config_uses_ko_kiwi, write_autorag_bm25
+    from corpus_io import read_corpus
+
     load_dotenv()
     if os.getenv('OPENAI_API_KEY') is None:
         raise ValueError('OPENAI_API_KEY environment variable is not set')
     if not os.path.exists(project_dir):
         os.makedirs(project_dir)
+    response_cache = None if no_response_cache else ResponseCache(
+        response_cache_path, ttl_days=response_cache_ttl_days, max_mb=response_cache_max_mb,
+        temperature_policy=temperature_policy)
+    if grid:
+        with open(config, 'r', encoding='utf-8') as f:
+            uses_ko_kiwi = config_uses_ko_kiwi(yaml.safe_load(f))
+        bm25_index_dir = None
+        if uses_ko_kiwi:
+            corpus_df = read_corpus(corpus_data_path, columns=['doc_id', 'contents'])
+            bm25_index_dir = build_index(corpus_df, bm25_index_root)
+        from grid_trials import run_grid
+        run_grid(config, qa_data_path, corpus_data_path, project_dir, workers, requests_per_minute,
+                 embedding_cache_dir=None if no_embedding_cache else embedding_cache_dir,
+                 bm25_index_dir=bm25_index_dir, use_cache=not no_cache, response_cache=response_cache)
+        if response_cache is not None:
+            print_cache_stats(response_cache)
+        return
+
+    from autorag.evaluator import Evaluator
+
+    from cached_embedding import install_embedding_cache
+    from embedding_store import print_store_stats
+    from openai_hooks import install_openai_hooks
+    from trial_cache import start_cached_trial
+
+    if response_cache is not None:
+        install_openai_hooks(response_cache=response_cache)
+    embedding_store = None if no_embedding_cache else install_embedding_cache(embedding_cache_dir)
     evaluator = Evaluator(qa_data_path, corpus_data_path, project_dir=project_dir)
-    evaluator.start_trial(config)
+    with open(config, 'r', encoding='utf-8') as f:
+        if config_uses_ko_kiwi(yaml.safe_load(f)):
+            # 미리 만든 ko_kiwi 색인으로 AutoRAG bm25 pickle을 채워 corpus 재토큰화를 건너뜁니다.
+            corpus_df = read_corpus(corpus_data_path, columns=['doc_id', 'contents'])
+            write_autorag_bm25(BM25Index(build_index(corpus_df, bm25_index_root)), project_dir)
+    if no_cache:
+        evaluator.start_trial(config)
+    else:
+        start_cached_trial(evaluator, config, qa_data_path, corpus_data_path, project_dir)
+    if embedding_store is not None:
+        print_store_stats(embedding_store)
+    if response_cache is not None:
+        print_cache_stats(response_cache)
 
 
 if __name__ == '__main__':
@@ -1,27 +1,60 @@
 import os
 
 import click
-from autorag.utils import cast_corpus_dataset
-from llama_index.core import SimpleDirectoryReader
-from llama_index.core.node_parser import TokenTextSplitter
-from autorag.data.corpus import llama_text_node_to_parquet
+
+from corpus_io import write_corpus, write_table
 
 root_dir = os.path.dirname(os.path.realpath(__file__))
 
 
+def save_parent_corpus(dir_path, save_path, child_size, page_store_dir=None):
+    from autorag.utils import cast_corpus_dataset
+
+    from parent_corpus import build_parent_corpus, parents_path, read_page_store_documents, read_text_documents
+
+    if page_store_dir:
+        from page_store import PageStore
+        documents = read_page_store_documents(PageStore(page_store_dir))
+    else:
+        documents = read_text_documents(dir_path)
+    corpus_df, parents_df = build_parent_corpus(documents, child_size=child_size)
+    corpus_df = cast_corpus_dataset(corpus_df)
+    write_corpus(corpus_df, save_path)
+    write_table(parents_df, parents_path(save_path), dictionary_columns=['source', '분류', '세분류'], sort_by='source')
+    print(f"자식 청크 {len(corpus_df)}개, 부모(조) {len(parents_df)}개 → {save_path}")
+
+
 @click.command()
 @click.option('--dir_path', type=click.Path(exists=True, dir_okay=True, file_okay=False),
               default=os.path.join(root_dir, 'raw_docs'))
 @click.option('--save_path', type=click.Path(exists=False, dir_okay=False, file_okay=True),
               default=os.path.join(root_dir, 'data', 'corpus_new.parquet'))
-def main(dir_path: str, save_path: str):
+@click.option('--layout', type=click.Choice(['flat', 'parent']), default='flat',
+              help='flat: 256토큰 분할, parent: 조 단위 부모 + 작은 자식 청크 (부모는 .parents.parquet에 저장)')
+@click.option('--child_size', type=int, default=256, help='parent 레이아웃의 자식 청크 최대 문자 수')
+@click.option('--page_store_dir', type=click.Path(exists=True, file_okay=False), default=None,
+              help='parent 레이아웃에서 dir_path의 .txt 대신 페이지 저장소의 문서를 사용합니다.')
+def main(dir_path: str, save_path: str, layout: str, child_size: int, page_store_dir: str):
     if not save_path.endswith('.parquet'):
         raise ValueError('The input save_path did not end with .parquet.')
+    if layout == 'parent':
+        save_parent_corpus(dir_path, save_path, child_size, page_store_dir)
+        return
+
+    # autorag, llama_index는 --help와 인자 검사가 끝난 뒤에 import합니다.
+    from autorag.data.corpus import llama_text_node_to_parquet
+    from autorag.utils import cast_corpus_dataset
+    from llama_index.core import SimpleDirectoryReader
+    from llama_index.core.node_parser import TokenTextSplitter
+
     documents = SimpleDirectoryReader(dir_path, recursive=True).load_data()
     nodes = TokenTextSplitter().get_nodes_from_documents(documents=documents, chunk_size=256, chunk_overlap=64)
+    # 재청킹 후 qa_remap.py가 원문 위치로 retrieval_gt를 옮길 수 있도록 청크 위치를 metadata에 남깁니다.
+    for node in nodes:
+        node.metadata = {**node.metadata, 'start_char_idx': node.start_char_idx, 'end_char_idx': node.end_char_idx}
     corpus_df = llama_text_node_to_parquet(nodes)
     corpus_df = cast_corpus_dataset(corpus_df)
-    corpus_df.to_parquet(save_path)
+    write_corpus(corpus_df, save_path)
 
 
 if __name__ == '__main__':
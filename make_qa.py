@@ -1,11 +1,11 @@
 import os
 
 import click
-import pandas as pd
 from dotenv import load_dotenv
 
-from llama_index.llms.openai import OpenAI
-from autorag.data.qacreation import generate_qa_llama_index, make_single_content_qa
+from corpus_io import read_corpus, write_qa
+from qa_batch import LocalBatchClient, OpenAIBatchClient, make_batch_qa
+from qa_prefilter import DEFAULT_TOPIC, prefilter_corpus, print_filter_stats
 
 root_path = os.path.dirname(os.path.realpath(__file__))
 prompt = """다음은 걸그룹 뉴진스에 관한 기사입니다. 
@@ -37,17 +37,48 @@ prompt = """다음은 걸그룹 뉴진스에 관한 기사입니다.
 @click.option('--save_path', type=click.Path(exists=False, dir_okay=False, file_okay=True),
               default=os.path.join('data', 'qa_new.parquet'))
 @click.option('--qa_size', type=int, default=5)
-def main(corpus_path, save_path, qa_size):
+@click.option('--topic', type=str, default=DEFAULT_TOPIC, help='사전 필터에 사용할 주제 설명')
+@click.option('--min_score', type=float, default=2.0, help='사전 필터 최소 BM25 점수 (0 이하이면 필터 사용 안 함)')
+@click.option('--batch', is_flag=True, default=False, help='OpenAI Batch API로 QA를 생성합니다.')
+@click.option('--batch_dir', type=click.Path(file_okay=False), default=os.path.join('data', 'qa_batch'))
+@click.option('--local_batch', is_flag=True, default=False, help='Batch API 대신 오프라인 대체 구현을 사용합니다.')
+@click.option('--poll_interval', type=float, default=30.0, help='배치 상태 확인 간격(초)')
+def main(corpus_path, save_path, qa_size, topic, min_score, batch, batch_dir, local_batch, poll_interval):
     load_dotenv()
 
-    corpus_df = pd.read_parquet(corpus_path, engine='pyarrow')
-    llm = OpenAI(model='gpt-4o', temperature=0.5)
-    qa_df = make_single_content_qa(corpus_df, content_size=qa_size, qa_creation_func=generate_qa_llama_index,
-                                   llm=llm, prompt=prompt, question_num_per_content=1)
+    # QA 생성에는 doc_id, contents, metadata만 필요합니다.
+    corpus_df = read_corpus(corpus_path, columns=['doc_id', 'contents', 'metadata'])
+    if min_score > 0:
+        # LLM 호출 전에 주제와 관련된 후보 청크만 남깁니다.
+        corpus_df, filter_stats = prefilter_corpus(corpus_df, topic, min_score)
+        print_filter_stats(filter_stats)
+        if corpus_df.empty:
+            raise ValueError('사전 필터를 통과한 청크가 없습니다. --topic 또는 --min_score를 조정하세요.')
+        corpus_df = corpus_df.drop(columns=['relevance_score'])
+        qa_size = min(qa_size, len(corpus_df))
+    if batch or local_batch:
+        if local_batch:
+            client = LocalBatchClient(os.path.join(batch_dir, 'local'))
+            poll_interval = 0.0
+        else:
+            client = OpenAIBatchClient()
+        qa_df = make_batch_qa(corpus_df, prompt, batch_dir, client, content_size=qa_size, model='gpt-4o',
+                              temperature=0.5, question_num_per_content=1, poll_interval=poll_interval)
+    else:
+        # llama_index, autorag는 Batch API를 쓰지 않을 때만 필요하므로 여기서 import합니다.
+        from autorag.data.qacreation import generate_qa_llama_index, make_single_content_qa
+        from llama_index.llms.openai import OpenAI
+
+        llm = OpenAI(model='gpt-4o', temperature=0.5)
+        qa_df = make_single_content_qa(corpus_df, content_size=qa_size, qa_creation_func=generate_qa_llama_index,
+                                       llm=llm, prompt=prompt, question_num_per_content=1)
+    generated_size = len(qa_df)
     # delete if the output question is '뉴진스와 관련 없습니다'
     qa_df = qa_df.loc[~qa_df['query'].str.contains('뉴진스와 관련 없습니다')]
+    if generated_size:
+        print(f"생성된 질문 {generated_size}개 중 {len(qa_df)}개 유지 ({len(qa_df) / generated_size:.1%})")
     qa_df.reset_index(drop=True, inplace=True)
-    qa_df.to_parquet(save_path)
+    write_qa(qa_df, save_path)
 
 
 if __name__ == '__main__':
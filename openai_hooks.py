@@ -0,0 +1,103 @@
+"""
+OpenAI 호출 공통 훅
+
+AutoRAG의 openai_llm 모듈과 OpenAI 임베딩은 openai 패키지의 Completions/Embeddings.create를 직접 호출하므로,
+이 메서드들을 감싸서 모든 API 호출에 공통 정책을 적용합니다.
+- RateLimiter: 여러 프로세스(main.py --grid 워커)가 공유하는 분당 요청 수 제한
+- ResponseCache (response_cache.py): chat completion 응답 캐시. 캐시에 없는 요청만 rate limiter를 거쳐 API로 보냅니다.
+
+사용법
+    limiter = RateLimiter(requests_per_minute=500)
+    install_openai_hooks(rate_limiter=limiter, response_cache=ResponseCache('response_cache.sqlite'))
+"""
+
+import asyncio
+import functools
+import multiprocessing
+import time
+
+
+class RateLimiter:
+    """
+    프로세스 간 공유되는 요청 간격 제한기입니다.
+    다음 요청이 허용되는 시각을 공유 메모리(multiprocessing.Value)에 두고, 요청마다 그 시각을
+    1 / (분당 요청 수)만큼 뒤로 미룹니다. 프로세스 풀의 initializer 인자로 넘겨 공유합니다.
+    """
+
+    def __init__(self, requests_per_minute, context=None):
+        context = context or multiprocessing.get_context('spawn')
+        self.interval = 60.0 / requests_per_minute
+        self._next_time = context.Value('d', 0.0, lock=False)
+        self._lock = context.Lock()
+
+    def reserve(self):
+        """요청 슬롯 하나를 예약하고 기다려야 하는 초를 돌려줍니다."""
+        with self._lock:
+            now = time.time()
+            start = max(now, self._next_time.value)
+            self._next_time.value = start + self.interval
+        return start - now
+
+    def acquire(self):
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+_originals = {}
+
+
+def _wrap_sync(original, rate_limiter, response_cache=None, response_type=None):
+    @functools.wraps(original)
+    def create(self, *args, **kwargs):
+        def fetch():
+            if rate_limiter is not None:
+                rate_limiter.acquire()
+            return original(self, *args, **kwargs)
+
+        if response_cache is None or args:
+            return fetch()
+        return response_cache.call(kwargs, fetch, lambda response: response.model_dump_json(),
+                                   response_type.model_validate_json)
+    return create
+
+
+def _wrap_async(original, rate_limiter, response_cache=None, response_type=None):
+    @functools.wraps(original)
+    async def create(self, *args, **kwargs):
+        async def fetch():
+            if rate_limiter is not None:
+                await rate_limiter.acquire_async()
+            return await original(self, *args, **kwargs)
+
+        if response_cache is None or args:
+            return await fetch()
+        return await response_cache.acall(kwargs, fetch, lambda response: response.model_dump_json(),
+                                          response_type.model_validate_json)
+    return create
+
+
+def install_openai_hooks(rate_limiter=None, response_cache=None):
+    """
+    openai 패키지의 chat completions / embeddings create 메서드를 감쌉니다.
+    여러 번 호출하면 마지막 설정으로 다시 감쌉니다.
+
+    매개변수:
+    - rate_limiter: RateLimiter (None이면 제한하지 않습니다)
+    - response_cache: chat completions에 사용할 response_cache.ResponseCache (None이면 캐시하지 않습니다)
+    """
+    from openai.resources.chat.completions import AsyncCompletions, Completions
+    from openai.resources.embeddings import AsyncEmbeddings, Embeddings
+    from openai.types.chat import ChatCompletion
+
+    for cls, wrap in ((Embeddings, _wrap_sync), (AsyncEmbeddings, _wrap_async)):
+        original = _originals.setdefault(cls, cls.create)
+        cls.create = wrap(original, rate_limiter)
+    for cls, wrap in ((Completions, _wrap_sync), (AsyncCompletions, _wrap_async)):
+        original = _originals.setdefault(cls, cls.create)
+        cls.create = wrap(original, rate_limiter, response_cache, ChatCompletion)
@@ -0,0 +1,201 @@
+"""
+페이지 텍스트 저장소
+
+processed_txt 디렉토리에 페이지마다 작은 .txt 파일을 쓰는 대신, 모든 페이지 텍스트를
+하나의 추가 전용(append-only) 데이터 파일에 UTF-8로 이어 붙이고 (PDF 해시, 페이지) → (오프셋, 길이)
+색인을 따로 둡니다. 페이지 하나를 읽을 때는 mmap으로 해당 구간만 잘라 디코딩하므로
+디렉토리를 훑지 않고 O(1)에 임의의 페이지를 가져올 수 있습니다.
+
+저장소 구조 (store_dir):
+- pages.dat: 페이지 텍스트 UTF-8 바이트를 이어 붙인 파일
+- pages.idx: 고정 길이 레코드 (PDF 해시 16바이트, 페이지, 오프셋, 길이)
+- documents.jsonl: PDF 해시와 파일 이름의 대응 (디버깅/내보내기용)
+
+같은 (PDF 해시, 페이지)를 다시 쓰면 마지막 기록이 사용됩니다. 쓰기는 한 프로세스에서만 한다고 가정합니다.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+
+import click
+import numpy as np
+
+INDEX_DTYPE = np.dtype([('doc', 'V16'), ('page', '<u4'), ('offset', '<u8'), ('length', '<u4')])
+DEFAULT_STORE_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'page_store')
+
+
+def pdf_hash(pdf_path, chunk_size=1 << 20):
+    """PDF 파일 내용의 sha256 앞 16바이트(hex)를 돌려줍니다."""
+    digest = hashlib.sha256()
+    with open(pdf_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:32]
+
+
+class PageStore:
+    """(PDF 해시, 페이지) 단위로 페이지 텍스트를 저장하고 mmap으로 읽는 저장소입니다."""
+
+    def __init__(self, store_dir=DEFAULT_STORE_DIR):
+        self.store_dir = store_dir
+        os.makedirs(store_dir, exist_ok=True)
+        self.data_path = os.path.join(store_dir, 'pages.dat')
+        self.index_path = os.path.join(store_dir, 'pages.idx')
+        self.documents_path = os.path.join(store_dir, 'documents.jsonl')
+        self._mmap = None
+        self._load()
+
+    def _load(self):
+        data_size = os.path.getsize(self.data_path) if os.path.exists(self.data_path) else 0
+        if os.path.exists(self.index_path):
+            # 쓰기 도중 중단되어 끝에 남은 불완전한 레코드를 잘라내야 다음 레코드가 올바른 위치에 붙습니다.
+            index_size = os.path.getsize(self.index_path)
+            if index_size % INDEX_DTYPE.itemsize:
+                os.truncate(self.index_path, index_size // INDEX_DTYPE.itemsize * INDEX_DTYPE.itemsize)
+        records = np.fromfile(self.index_path, dtype=INDEX_DTYPE) if os.path.exists(self.index_path) else \
+            np.empty(0, dtype=INDEX_DTYPE)
+        # 쓰기 도중 중단되어 데이터보다 앞서간 색인 레코드는 버립니다.
+        valid = records['offset'] + records['length'] <= data_size
+        if not valid.all():
+            records = records[:int(np.argmin(valid))]
+            records.tofile(self.index_path)
+        self._index = {(bytes(record['doc']).hex(), int(record['page'])): (int(record['offset']), int(record['length']))
+                       for record in records}
+        self._data_size = data_size
+        self._documents = {}
+        if os.path.exists(self.documents_path):
+            with open(self.documents_path, encoding='utf-8') as f:
+                for line in f:
+                    entry = json.loads(line)
+                    self._documents[entry['doc']] = entry['name']
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def put_pages(self, doc, pages, name=None):
+        """
+        한 문서의 페이지 텍스트들을 추가합니다.
+
+        매개변수:
+        - doc: PDF 해시 (pdf_hash의 반환값)
+        - pages: (페이지 번호, 텍스트) 튜플 리스트
+        - name: 문서 이름 (내보내기 시 파일 이름에 사용)
+        """
+        blobs = [text.encode('utf-8') for _, text in pages]
+        records = np.empty(len(blobs), dtype=INDEX_DTYPE)
+        offset = self._data_size
+        with open(self.data_path, 'ab') as f:
+            for i, ((page, _), blob) in enumerate(zip(pages, blobs)):
+                records[i] = (bytes.fromhex(doc), page, offset, len(blob))
+                f.write(blob)
+                offset += len(blob)
+        # 데이터를 먼저 쓰고 색인을 나중에 써서, 중단되어도 색인이 없는 데이터만 남게 합니다.
+        with open(self.index_path, 'ab') as f:
+            records.tofile(f)
+        for (page, _), record in zip(pages, records):
+            self._index[(doc, int(page))] = (int(record['offset']), int(record['length']))
+        self._data_size = offset
+        if name and self._documents.get(doc) != name:
+            self._documents[doc] = name
+            with open(self.documents_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({'doc': doc, 'name': name}, ensure_ascii=False) + '\n')
+
+    def put(self, doc, page, text, name=None):
+        """페이지 하나를 추가합니다."""
+        self.put_pages(doc, [(page, text)], name=name)
+
+    def _view(self, end):
+        if self._mmap is None or len(self._mmap) < end:
+            if self._mmap is not None:
+                self._mmap.close()
+            with open(self.data_path, 'rb') as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._mmap
+
+    def get(self, doc, page):
+        """(PDF 해시, 페이지)의 텍스트를 돌려줍니다. 없으면 KeyError를 발생시킵니다."""
+        offset, length = self._index[(doc, page)]
+        if length == 0:
+            return ''
+        return self._view(offset + length)[offset:offset + length].decode('utf-8')
+
+    def pages(self, doc):
+        """문서의 (페이지 번호, 텍스트) 리스트를 페이지 순서로 돌려줍니다."""
+        page_numbers = sorted(page for key_doc, page in self._index if key_doc == doc)
+        return [(page, self.get(doc, page)) for page in page_numbers]
+
+    def documents(self):
+        """{PDF 해시: 문서 이름}"""
+        docs = {doc: None for doc, _ in self._index}
+        docs.update({doc: name for doc, name in self._documents.items() if doc in docs})
+        return docs
+
+    def find(self, name):
+        """문서 이름(확장자 제외) 또는 해시 접두어로 PDF 해시를 찾습니다."""
+        return [doc for doc, doc_name in self.documents().items() if doc_name == name or doc.startswith(name)]
+
+    def export(self, output_dir='./processed_txt'):
+        """기존 processed_txt와 같은 '{문서}_Page_{n}.txt' 파일들로 내보냅니다."""
+        os.makedirs(output_dir, exist_ok=True)
+        count = 0
+        for doc, name in self.documents().items():
+            for page, text in self.pages(doc):
+                with open(os.path.join(output_dir, f"{name or doc}_Page_{page}.txt"), 'w', encoding='utf-8') as f:
+                    f.write(text)
+                count += 1
+        return count
+
+    def stats(self):
+        return {'documents': len(self.documents()), 'pages': len(self._index),
+                'data_mb': self._data_size / 1e6}
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+
+@click.group()
+@click.option('--store_dir', type=click.Path(file_okay=False), default=DEFAULT_STORE_DIR)
+@click.pass_context
+def cli(ctx, store_dir):
+    ctx.obj = PageStore(store_dir)
+
+
+@cli.command()
+@click.pass_obj
+def stats(store):
+    """저장소의 문서/페이지 수를 출력합니다."""
+    info = store.stats()
+    print(f"문서 {info['documents']}개, 페이지 {info['pages']}개, {info['data_mb']:.1f}MB")
+    for doc, name in store.documents().items():
+        print(f"{doc}  {name}")
+
+
+@cli.command()
+@click.argument('document')
+@click.argument('page', type=int)
+@click.pass_obj
+def show(store, document, page):
+    """문서 이름(또는 해시 접두어)과 페이지 번호로 텍스트를 출력합니다."""
+    docs = store.find(document)
+    if not docs:
+        raise click.ClickException(f"문서를 찾을 수 없습니다: {document}")
+    print(store.get(docs[0], page))
+
+
+@cli.command()
+@click.option('--output_dir', type=click.Path(file_okay=False), default='./processed_txt')
+@click.pass_obj
+def export(store, output_dir):
+    """processed_txt 형식의 페이지별 .txt 파일로 내보냅니다."""
+    print(f"{store.export(output_dir)}개 페이지를 {output_dir}에 저장했습니다.")
+
+
+if __name__ == '__main__':
+    cli()
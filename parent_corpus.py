@@ -0,0 +1,198 @@
+"""
+부모 문서(small-to-big) 코퍼스
+
+TermsAndConditionsDocumentProcessor로 약관을 관/조 단위로 나눈 뒤,
+- 부모: 조(세분류) 하나의 전체 텍스트 → 별도 테이블 '<코퍼스 이름>.parents.parquet'
+- 자식: 부모 텍스트를 줄 단위로 잘게 나눈 청크 → AutoRAG 코퍼스 (doc_id, contents, metadata, parent_id)
+로 저장합니다. 검색 색인에는 작은 자식 청크만 들어가므로 검색 정밀도가 높고 색인이 작으며,
+프롬프트를 만들 때 ParentLookup으로 검색된 자식을 부모 조 전체로 확장합니다 (벡터화된 조인, serve.py에서 사용).
+"""
+
+import os
+import uuid
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from TermsAndConditionsDocumentProcessor import TermsAndConditionsDocumentProcessor
+
+PARENT_NAMESPACE = uuid.UUID('6c1f3f0e-5d0b-4a57-9a36-6a8c0e1f2b7d')
+
+
+def parents_path(corpus_path):
+    """코퍼스 경로 옆의 부모 테이블 경로를 돌려줍니다."""
+    return os.path.splitext(corpus_path)[0] + '.parents.parquet'
+
+
+def split_child_chunks(text, child_size=256, overlap_lines=1):
+    """
+    부모 텍스트를 child_size자 이하의 자식 청크로 나눕니다. 줄 중간에서는 자르지 않으며,
+    이전 청크의 마지막 overlap_lines줄을 다음 청크 앞에 이어 붙입니다.
+
+    반환값:
+    - list: 자식 청크 문자열 리스트
+    """
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    chunks, current, size = [], [], 0
+    for line in lines:
+        if current and size + len(line) + 1 > child_size:
+            chunks.append('\n'.join(current))
+            current = current[-overlap_lines:] if overlap_lines else []
+            size = sum(len(l) + 1 for l in current)
+        current.append(line)
+        size += len(line) + 1
+    if current and (not chunks or len(current) > overlap_lines):
+        chunks.append('\n'.join(current))
+    return chunks
+
+
+def locate_children(text, children, cursor=0):
+    """
+    자식 청크들의 원문 문자 위치를 찾습니다. 자식 청크는 줄 앞뒤 공백을 지운 줄들이므로
+    각 줄을 원문에서 차례로 찾습니다 (qa_remap.py의 offsets 방식에서 사용).
+
+    반환값:
+    - (자식별 (시작, 끝) 리스트 (찾지 못하면 (None, None)), 다음 탐색 위치)
+    """
+    offsets = []
+    for child in children:
+        start, position = None, cursor
+        for line in child.split('\n'):
+            position = text.find(line, position)
+            if position < 0:
+                break
+            start = position if start is None else start
+            position += len(line)
+        if position < 0:
+            offsets.append((None, None))
+            continue
+        offsets.append((start, position))
+        cursor = start
+    return offsets, cursor
+
+
+def build_parent_corpus(documents, child_size=256, overlap_lines=1):
+    """
+    문서들로 자식 코퍼스와 부모 테이블을 만듭니다.
+
+    매개변수:
+    - documents: {source: (문서 텍스트, 최종 수정 시각)}
+    - child_size: 자식 청크 최대 문자 수
+    - overlap_lines: 자식 청크 간 중복 줄 수
+
+    반환값:
+    - tuple: (corpus_df[doc_id, contents, metadata, parent_id],
+              parents_df[parent_id, contents, source, 분류, 세분류, child_count])
+    """
+    processor = TermsAndConditionsDocumentProcessor()
+    child_rows, parent_rows = [], []
+    for source, (text, last_modified) in documents.items():
+        parents = processor.parse_document(text)
+        for position, parent in enumerate(parents):
+            parent_id = str(uuid.uuid5(PARENT_NAMESPACE, f"{source}\x00{position}\x00{parent['세분류']}"))
+            children = split_child_chunks(parent['청킹내용'], child_size, overlap_lines)
+            parent_rows.append({'parent_id': parent_id, 'contents': parent['청킹내용'], 'source': source,
+                                '분류': parent['분류'], '세분류': parent['세분류'], 'child_count': len(children)})
+            # 자식은 부모 청크의 원문 위치부터 찾습니다.
+            offsets, _ = locate_children(text, children, parents.span(position)[0])
+            for child, (start, end) in zip(children, offsets):
+                child_rows.append({
+                    'doc_id': str(uuid.uuid4()),
+                    'contents': child,
+                    'metadata': {'last_modified_datetime': last_modified, 'source': source,
+                                 'parent_id': parent_id, 'start_char_idx': start, 'end_char_idx': end},
+                    'parent_id': parent_id,
+                })
+    corpus_df = pd.DataFrame(child_rows, columns=['doc_id', 'contents', 'metadata', 'parent_id'])
+    parents_df = pd.DataFrame(parent_rows, columns=['parent_id', 'contents', 'source', '분류', '세분류', 'child_count'])
+    return corpus_df, parents_df
+
+
+def read_text_documents(dir_path):
+    """디렉토리의 .txt 파일들을 {source: (텍스트, 최종 수정 시각)}으로 읽습니다."""
+    documents = {}
+    for current_dir, _, file_names in os.walk(dir_path):
+        for file_name in sorted(file_names):
+            if file_name.lower().endswith('.txt'):
+                path = os.path.join(current_dir, file_name)
+                with open(path, encoding='utf-8') as f:
+                    documents[os.path.relpath(path, dir_path)] = (f.read(), datetime.fromtimestamp(os.path.getmtime(path)))
+    return documents
+
+
+def read_page_store_documents(store):
+    """PageStore의 문서들을 페이지 순서로 이어 붙여 {source: (텍스트, 현재 시각)}으로 읽습니다."""
+    now = datetime.now()
+    return {name or doc: ('\n'.join(text for _, text in store.pages(doc)), now)
+            for doc, name in store.documents().items()}
+
+
+class ParentLookup:
+    """
+    자식 doc_id → 부모 텍스트 확장을 위한 조회 구조입니다.
+    자식 doc_id를 pandas Index로, 부모를 정수 코드 배열로 들고 있어 검색 결과 전체를 한 번의 조인으로 확장합니다.
+    """
+
+    def __init__(self, corpus_df, parents_df):
+        self.parent_ids = parents_df['parent_id'].to_numpy()
+        self.parent_contents = parents_df['contents'].to_numpy()
+        self.child_index = pd.Index(corpus_df['doc_id'])
+        self.child_parent = pd.Index(self.parent_ids).get_indexer(corpus_df['parent_id'])
+
+    @classmethod
+    def load(cls, corpus_path):
+        corpus_df = pd.read_parquet(corpus_path, columns=['doc_id', 'parent_id'])
+        return cls(corpus_df, pd.read_parquet(parents_path(corpus_path)))
+
+    def expand(self, retrieved_ids, retrieve_scores=None, top_k=None):
+        """
+        질의별 검색된 자식 doc_id 리스트를 부모 단위로 확장합니다.
+        같은 부모의 자식이 여러 개 검색되면 가장 앞(점수가 가장 높은) 순위 하나만 남깁니다.
+
+        매개변수:
+        - retrieved_ids: 질의별 자식 doc_id 리스트의 리스트
+        - retrieve_scores: 질의별 점수 리스트의 리스트 (선택)
+        - top_k: 질의별로 남길 부모 수 (선택)
+
+        반환값:
+        - tuple: (부모 id 리스트의 리스트, 부모 텍스트 리스트의 리스트, 점수 리스트의 리스트)
+        """
+        lengths = np.fromiter((len(ids) for ids in retrieved_ids), dtype=np.int64, count=len(retrieved_ids))
+        flat_ids = np.concatenate([np.asarray(ids, dtype=object) for ids in retrieved_ids]) if lengths.sum() else \
+            np.empty(0, dtype=object)
+        positions = self.child_index.get_indexer(flat_ids)
+        parents = np.where(positions >= 0, self.child_parent[positions], -1)
+        flat = pd.DataFrame({
+            'query': np.repeat(np.arange(len(retrieved_ids)), lengths),
+            'parent': parents,
+            'score': np.concatenate([np.asarray(s, dtype=float) for s in retrieve_scores]) if retrieve_scores is not None
+            and lengths.sum() else np.zeros(len(parents)),
+        })
+        # 순위 순서를 유지한 채 (질의, 부모) 중복을 제거합니다.
+        flat = flat[flat['parent'] >= 0].drop_duplicates(['query', 'parent'])
+        if top_k is not None:
+            flat = flat[flat.groupby('query').cumcount() < top_k]
+        grouped = flat.groupby('query')
+        ids, contents, scores = [[] for _ in retrieved_ids], [[] for _ in retrieved_ids], [[] for _ in retrieved_ids]
+        for query, group in grouped:
+            codes = group['parent'].to_numpy()
+            ids[query] = self.parent_ids[codes].tolist()
+            contents[query] = self.parent_contents[codes].tolist()
+            scores[query] = group['score'].tolist()
+        return ids, contents, scores
+
+    def expand_frame(self, result_df, top_k=None):
+        """
+        AutoRAG 검색 결과 DataFrame(retrieved_ids, retrieved_contents, retrieve_scores)의
+        내용을 부모 텍스트로 바꾼 사본을 돌려줍니다. prompt_maker에 넘기기 전에 사용합니다.
+        """
+        ids, contents, scores = self.expand(result_df['retrieved_ids'].tolist(),
+                                            result_df['retrieve_scores'].tolist()
+                                            if 'retrieve_scores' in result_df else None, top_k)
+        expanded = result_df.copy()
+        expanded['retrieved_ids'] = ids
+        expanded['retrieved_contents'] = contents
+        if 'retrieve_scores' in result_df:
+            expanded['retrieve_scores'] = scores
+        return expanded
@@ -1,23 +1,32 @@
 import re
 import os
 import click
-import pdfplumber
 import tempfile
-from pdf2image import convert_from_path
-import img2pdf
-from PIL import Image
 import io
-import pandas as pd
 from collections import defaultdict
-from langchain_upstage import UpstageLayoutAnalysisLoader
-from langchain.schema import Document
-from rainbow_html_Indentation import HTMLToTextWithMarkdownTables
+from concurrent.futures import ProcessPoolExecutor
+from chunk_store import ChunkTable
+from pdf_table_extractor import extract_text_with_local_tables
+from instrumentation import span, tracer
+from lazy_import import lazy_module
+
+# 모드에 따라 필요한 의존성만 불러오도록 무거운 모듈은 처음 사용할 때 import합니다.
+# (hybrid/local 모드의 워커 프로세스는 langchain_upstage, pdf2image를 import하지 않습니다.)
+pd = lazy_module('pandas')
+fitz = lazy_module('fitz')
+
+root_dir = os.path.dirname(os.path.realpath(__file__))
 
 def convert_pdf_to_pdf(input_path, output_path):
     """PDF를 이미지로 변환한 후 다시 PDF로 변환합니다."""
+    import img2pdf
+    from pdf2image import convert_from_path
+
     with tempfile.TemporaryDirectory() as temp_dir:
         # PDF를 이미지로 변환
-        images = convert_from_path(input_path)
+        with span('rasterize', document=os.path.basename(input_path)) as rasterize_span:
+            images = convert_from_path(input_path)
+            rasterize_span.count('pages', len(images))
         
         # 이미지를 바이트 스트림으로 변환
         image_bytes = []
@@ -30,17 +39,22 @@ def convert_pdf_to_pdf(input_path, output_path):
         with open(output_path, "wb") as f:
             f.write(img2pdf.convert(image_bytes))
 
-def extract_text_with_page_info(pdf_path):
-    """UpstageLayoutAnalysisLoader를 사용하여 PDF에서 페이지 정보를 포함한 텍스트를 추출하고 저장합니다."""
+def load_layout_documents(pdf_path):
+    """UpstageLayoutAnalysisLoader로 PDF의 페이지별 레이아웃 분석 결과(HTML Document)를 가져옵니다."""
+    from langchain_upstage import UpstageLayoutAnalysisLoader
+
     try:
-        loader = UpstageLayoutAnalysisLoader(
-            pdf_path,
-            split="page",
-            use_ocr=True,  # OCR 활성화
-            # ocr_languages=["eng", "kor"],  # OCR 언어 설정 (영어와 한국어)
-            exclude=["annotations"]
-        )
-        documents = loader.load()
+        with span('layout_analysis', document=os.path.basename(pdf_path)) as layout_span:
+            loader = UpstageLayoutAnalysisLoader(
+                pdf_path,
+                split="page",
+                use_ocr=True,  # OCR 활성화
+                # ocr_languages=["eng", "kor"],  # OCR 언어 설정 (영어와 한국어)
+                exclude=["annotations"]
+            )
+            documents = loader.load()
+            layout_span.count('pages', len(documents))
+            layout_span.count('bytes', os.path.getsize(pdf_path))
     except KeyError as e:
         print(f"Error processing {pdf_path}: {e}")
         print("Attempting to convert and reprocess the PDF...")
@@ -54,57 +68,180 @@ def extract_text_with_page_info(pdf_path):
         
         # 변환된 PDF로 다시 시도
         try:
-            loader = UpstageLayoutAnalysisLoader(
-                        temp_pdf_path,
-                        split="page",
-                        use_ocr=True,  # OCR 활성화
-                        # ocr_languages=["eng", "kor"],  # OCR 언어 설정 (영어와 한국어)
-                        exclude=["annotations"]
-                    )
-            documents = loader.load()
+            with span('layout_analysis', document=os.path.basename(pdf_path)) as layout_span:
+                layout_span.count('retries')
+                loader = UpstageLayoutAnalysisLoader(
+                            temp_pdf_path,
+                            split="page",
+                            use_ocr=True,  # OCR 활성화
+                            # ocr_languages=["eng", "kor"],  # OCR 언어 설정 (영어와 한국어)
+                            exclude=["annotations"]
+                        )
+                documents = loader.load()
+                layout_span.count('pages', len(documents))
+                layout_span.count('bytes', os.path.getsize(temp_pdf_path))
         except Exception as e:
             print(f"Error processing converted PDF: {e}")
             os.unlink(temp_pdf_path)  # 임시 파일 삭제
             return []  # 빈 리스트 반환 또는 다른 적절한 처리
         
         os.unlink(temp_pdf_path)  # 임시 파일 삭제
-    
+    return documents
+
+def save_pages(pdf_path, text_with_page_info, page_store=None):
+    """
+    페이지 텍스트를 페이지 저장소(PageStore)에 (PDF 해시, 페이지) 단위로 저장합니다.
+    processed_txt 형식의 파일이 필요하면 `python page_store.py export`로 내보냅니다.
+    """
+    from page_store import PageStore, pdf_hash
+
+    if page_store is None:
+        page_store = PageStore()
+    pdf_name = os.path.splitext(os.path.basename(pdf_path))[0]
+    with span('write', document=pdf_name) as write_span:
+        page_store.put_pages(pdf_hash(pdf_path), text_with_page_info, name=pdf_name)
+        write_span.count('pages', len(text_with_page_info))
+        write_span.count('bytes', sum(len(text.encode('utf-8')) for _, text in text_with_page_info))
+    print(f"Processed and saved {len(text_with_page_info)} pages of {pdf_name} to {page_store.store_dir}")
+
+def transform_layout_documents(documents, pdf_name, page_numbers=None, html_transformer=None):
+    """
+    레이아웃 분석 HTML을 텍스트로 변환하여 (페이지 번호, 텍스트) 리스트로 돌려줍니다.
+    page_numbers가 주어지면 Document의 페이지 번호(1부터)를 원본 PDF의 페이지 번호로 바꿉니다.
+    html_transformer를 주면 새로 만들지 않고 재사용합니다.
+    """
+    if html_transformer is None:
+        from rainbow_html_transformer import HTMLToTextWithMarkdownTables
+        html_transformer = HTMLToTextWithMarkdownTables()
+
     text_with_page_info = []
-    html_transformer = HTMLToTextWithMarkdownTables()
+    for doc in documents:
+        with span('html_transform', document=pdf_name) as transform_span:
+            transformed_doc = html_transformer.transform_documents([doc])[0]
+            transform_span.count('pages')
+        page_number = transformed_doc.metadata['page']
+        if page_numbers is not None:
+            page_number = page_numbers[page_number - 1]
+        text_with_page_info.append((page_number, transformed_doc.page_content))
+    return text_with_page_info
+
+def extract_text_with_page_info(pdf_path, page_store=None):
+    """UpstageLayoutAnalysisLoader를 사용하여 PDF에서 페이지 정보를 포함한 텍스트를 추출하고 저장합니다."""
+    documents = load_layout_documents(pdf_path)
     
     # PDF 파일 이름 추출 (확장자 제외)
     pdf_name = os.path.splitext(os.path.basename(pdf_path))[0]
     
-    # 저장할 디렉토리 생성
-    output_dir = "./processed_txt"
-    os.makedirs(output_dir, exist_ok=True)
-    
-    for doc in documents:
-        transformed_doc = html_transformer.transform_documents([doc])[0]
-        page_number = transformed_doc.metadata['page']
-        text_content = transformed_doc.page_content
-        
-        # 텍스트 파일로 저장
-        output_filename = f"{pdf_name}_Page_{page_number}.txt"
-        output_path = os.path.join(output_dir, output_filename)
-        
-        with open(output_path, 'w', encoding='utf-8') as file:
-            file.write(text_content)
-        
-        text_with_page_info.append((page_number, text_content))
-        print(f"Processed and saved page {page_number} to {output_filename}")
+    text_with_page_info = transform_layout_documents(documents, pdf_name)
+    save_pages(pdf_path, text_with_page_info, page_store)
+
+    return text_with_page_info
+
+def analyze_native_pages(pdf_path, first_page, last_page, min_chars=100, max_image_coverage=0.5, detect_tables=True):
+    """
+    PyMuPDF로 페이지 범위 [first_page, last_page)의 내장 텍스트를 추출하고 OCR이 필요한지 판단합니다.
+    프로세스 풀의 워커에서 호출됩니다.
+
+    - 내장 텍스트가 min_chars자 미만이면 스캔 페이지로 보고 OCR 대상으로 분류합니다.
+    - 이미지가 페이지 면적의 max_image_coverage 이상을 덮으면 OCR 대상으로 분류합니다.
+    - detect_tables가 참이고 표가 발견되면 표 구조를 살리기 위해 레이아웃 분석 대상으로 분류합니다.
+
+    반환값:
+    - list: (페이지 번호(1부터), 내장 텍스트, OCR 필요 여부) 튜플 리스트
+    """
+    results = []
+    with fitz.open(pdf_path) as doc:
+        for page_index in range(first_page, last_page):
+            page = doc[page_index]
+            text = page.get_text()
+            page_area = abs(page.rect) or 1.0
+            image_area = sum(abs(fitz.Rect(info['bbox']) & page.rect) for info in page.get_image_info())
+            needs_ocr = len(text.strip()) < min_chars or image_area / page_area >= max_image_coverage
+            if not needs_ocr and detect_tables:
+                needs_ocr = len(page.find_tables().tables) > 0
+            results.append((page_index + 1, text, needs_ocr))
+    return results
+
+def extract_text_hybrid(pdf_path, workers=None, pages_per_task=16, page_store=None, save=True, html_transformer=None,
+                        **page_options):
+    """
+    내장 텍스트 우선(hybrid) 추출: 텍스트가 충분한 페이지는 PyMuPDF로 병렬 추출하고,
+    스캔 페이지나 표가 많은 페이지만 모아 레이아웃 분석(OCR)에 보냅니다.
+
+    매개변수:
+    - pdf_path: PDF 파일 경로
+    - workers: 내장 텍스트 추출 프로세스 수 (기본값: CPU 수)
+    - pages_per_task: 워커 하나가 한 번에 처리할 페이지 수
+    - page_store: 페이지 텍스트를 저장할 PageStore (기본값: page_store/)
+    - save: 거짓이면 저장하지 않고 결과만 돌려줍니다 (ingest_daemon 워커는 저장을 데몬 프로세스에 맡깁니다)
+    - html_transformer: 재사용할 HTMLToTextWithMarkdownTables (None이면 새로 만듭니다)
+    - page_options: analyze_native_pages의 판단 기준 (min_chars, max_image_coverage, detect_tables)
 
+    반환값:
+    - list: (페이지 번호, 텍스트) 튜플 리스트 (페이지 순서)
+    """
+    pdf_name = os.path.splitext(os.path.basename(pdf_path))[0]
+    with fitz.open(pdf_path) as doc:
+        page_count = len(doc)
+
+    with span('native_text', document=pdf_name) as native_span:
+        ranges = [(start, min(start + pages_per_task, page_count)) for start in range(0, page_count, pages_per_task)]
+        if len(ranges) <= 1 or workers == 1:
+            page_results = [result for start, end in ranges
+                            for result in analyze_native_pages(pdf_path, start, end, **page_options)]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(analyze_native_pages, pdf_path, start, end, **page_options)
+                           for start, end in ranges]
+                page_results = [result for future in futures for result in future.result()]
+        native_span.count('pages', page_count)
+
+    text_by_page = {page: text for page, text, needs_ocr in page_results if not needs_ocr}
+    ocr_pages = [page for page, _, needs_ocr in page_results if needs_ocr]
+    print(f"{pdf_name}: {page_count}페이지 중 {len(text_by_page)}페이지 내장 텍스트, {len(ocr_pages)}페이지 OCR")
+
+    if ocr_pages:
+        # OCR이 필요한 페이지만 모은 임시 PDF를 만들어 레이아웃 분석에 보냅니다.
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as temp_file:
+            subset_pdf_path = temp_file.name
+        try:
+            with fitz.open(pdf_path) as doc, fitz.open() as subset:
+                for page in ocr_pages:
+                    subset.insert_pdf(doc, from_page=page - 1, to_page=page - 1)
+                subset.save(subset_pdf_path)
+            documents = load_layout_documents(subset_pdf_path)
+        finally:
+            os.unlink(subset_pdf_path)
+        text_by_page.update(transform_layout_documents(documents, pdf_name, page_numbers=ocr_pages,
+                                                       html_transformer=html_transformer))
+
+    text_with_page_info = sorted(text_by_page.items())
+    if save:
+        save_pages(pdf_path, text_with_page_info, page_store)
     return text_with_page_info
 
 def split_text_into_sections_with_metadata(text_with_page_info):
-    """텍스트를 페이지 및 섹션, 서브 섹션 메타데이터와 함께 분리합니다."""
-    sections = []
+    """
+    텍스트를 페이지 및 섹션, 서브 섹션 메타데이터와 함께 분리합니다.
+    섹션이 여러 페이지에 걸치면 'Page'는 시작 페이지, 'EndPage'는 마지막 내용이 있는 페이지입니다.
+
+    반환값:
+    - ChunkTable: 'Section', 'Subsection', 'Page', 'EndPage', 'Content' 열의 청크 테이블 (딕셔너리로 순회 가능)
+    """
+    sections = ChunkTable(('Section', 'Subsection'), 'Content', integer_fields=('Page', 'EndPage'))
     
     section_pattern = re.compile(r'^\d+\.\s[^\n]+', re.MULTILINE)
     subsection_pattern = re.compile(r'^\d+\.\d+\.\s[^\n]+', re.MULTILINE)
     
     current_section = None
-    current_subsection = None
+    # 아직 테이블에 넣지 않은 현재 섹션: [Page, EndPage, Section, Subsection, 내용 줄 리스트]
+    pending = None
+
+    def flush():
+        if pending is not None:
+            page, end_page, section, subsection, lines = pending
+            sections.append(''.join(' ' + line for line in lines).strip(),
+                            Section=section, Subsection=subsection, Page=page, EndPage=end_page)
 
     for page_num, text in text_with_page_info:
         for line in text.splitlines():
@@ -112,44 +249,24 @@ def split_text_into_sections_with_metadata(text_with_page_info):
             subsection_match = subsection_pattern.match(line)
 
             if section_match:
+                flush()
                 current_section = section_match.group().strip()
-                current_subsection = None  # 섹션이 변경되면 서브섹션 초기화
-                sections.append({
-                    'Page': page_num,
-                    'Section': current_section,
-                    'Subsection': '',
-                    'Content': ''
-                })
+                pending = [page_num, page_num, current_section, '', []]
             elif subsection_match and current_section:
-                current_subsection = subsection_match.group().strip()
-                sections.append({
-                    'Page': page_num,
-                    'Section': current_section,
-                    'Subsection': current_subsection,
-                    'Content': ''
-                })
+                flush()
+                pending = [page_num, page_num, current_section, subsection_match.group().strip(), []]
             elif current_section:
-                if current_subsection:
-                    sections[-1]['Content'] += " " + line.strip()
-                else:
-                    sections[-1]['Content'] += " " + line.strip()
+                pending[1] = page_num
+                pending[4].append(line.strip())
 
+    flush()
     return sections
 
 def sections_to_dataframe_with_metadata(sections, file_name):
     """섹션과 메타데이터를 포함한 데이터프레임으로 변환합니다."""
-    data = []
-    for section_data in sections:
-        data.append([
-            file_name,
-            section_data['Page'],
-            section_data['Section'],
-            section_data['Subsection'],
-            section_data['Content'].strip()
-        ])
-    
-    df = pd.DataFrame(data, columns=["File", "Page", "Section", "Subsection", "Content"])
-    return df
+    df = sections.to_pandas()
+    df.insert(0, 'File', pd.Categorical([file_name] * len(df)))
+    return df[["File", "Page", "EndPage", "Section", "Subsection", "Content"]]
 
 def save_sections_to_excel(df, output_path):
     """데이터프레임을 엑셀 파일로 저장합니다."""
@@ -160,14 +277,37 @@ def save_sections_to_excel(df, output_path):
               default=os.path.join(root_dir, 'raw_docs'))
 @click.option('--save_path', type=click.Path(exists=False, dir_okay=False, file_okay=True),
               default=os.path.join(root_dir, 'data', 'corpus_new.parquet'))
-def main(dir_path: str, save_path: str):
+@click.option('--mode', type=click.Choice(['layout', 'hybrid', 'local']), default='layout',
+              help='layout: 모든 페이지 레이아웃 분석(OCR), hybrid: 내장 텍스트 우선, 필요한 페이지만 OCR, '
+                   'local: pdfplumber/PyMuPDF로 표까지 로컬 추출')
+@click.option('--table_engine', type=click.Choice(['pdfplumber', 'pymupdf']), default='pdfplumber',
+              help='local 모드의 표 추출 엔진')
+@click.option('--workers', type=int, default=None, help='hybrid/local 모드의 추출 프로세스 수')
+@click.option('--page_store_dir', type=click.Path(file_okay=False), default=None,
+              help='페이지 텍스트 저장소 디렉토리 (기본값: page_store/)')
+def main(dir_path: str, save_path: str, mode: str, table_engine: str, workers: int, page_store_dir: str):
     """디렉토리 내 모든 PDF 파일을 처리하여 결과를 엑셀 파일로 저장합니다."""
+    from page_store import PageStore
+    from section_index import SectionIndex
+
+    page_store = PageStore(page_store_dir) if page_store_dir else PageStore()
     all_dataframes = []
+    documents = {}
     for file_name in os.listdir(dir_path):
         if file_name.lower().endswith(".pdf"):  # 확장자가 .pdf 또는 .PDF인 경우 처리
             pdf_path = os.path.join(dir_path, file_name)
-            text_with_page_info = extract_text_with_page_info(pdf_path)
-            sections = split_text_into_sections_with_metadata(text_with_page_info)
+            if mode == 'hybrid':
+                text_with_page_info = extract_text_hybrid(pdf_path, workers=workers, page_store=page_store)
+            elif mode == 'local':
+                text_with_page_info = extract_text_with_local_tables(pdf_path, engine=table_engine, workers=workers)
+                save_pages(pdf_path, text_with_page_info, page_store)
+            else:
+                text_with_page_info = extract_text_with_page_info(pdf_path, page_store)
+            documents[file_name] = text_with_page_info
+            with span('split', document=file_name) as split_span:
+                sections = split_text_into_sections_with_metadata(text_with_page_info)
+                split_span.count('pages', len(text_with_page_info))
+                split_span.count('sections', len(sections))
             df = sections_to_dataframe_with_metadata(sections, file_name)
             all_dataframes.append(df)
     
@@ -175,9 +315,18 @@ def main(dir_path: str, save_path: str):
     if all_dataframes:
         
         final_df = pd.concat(all_dataframes, ignore_index=True)
-        save_sections_to_excel(final_df, save_path)
+        with span('write', document=save_path):
+            save_sections_to_excel(final_df, save_path)
+        # 관/조/항/호 계층 색인을 결과 파일 옆에 저장합니다.
+        with span('section_index') as index_span:
+            section_index = SectionIndex.from_documents(documents)
+            index_path = section_index.save(save_path)
+            index_span.count('sections', len(section_index))
+        print(f"Saved {len(section_index)} section index entries to {index_path}")
     else:
         print("No PDF files found in the specified directory.")
+    if tracer.enabled:
+        tracer.print_summary()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,169 @@
+"""
+로컬 표 추출 엔진
+
+원격 레이아웃 분석(UpstageLayoutAnalysisLoader) 없이 pdfplumber 또는 PyMuPDF로 페이지의 표를 찾아
+마크다운 표로 바로 변환합니다. 표 바깥의 텍스트는 줄 단위로 추출하여 표와 함께 위에서 아래 순서로 배치하므로,
+결과는 extract_text_with_page_info와 같은 (페이지 번호, 텍스트) 리스트이며
+split_text_into_sections_with_metadata에 그대로 넣을 수 있습니다.
+
+표가 많은 사업방법서를 API 호출 없이 로컬 CPU 속도로 처리하기 위한 경로이며,
+페이지 범위 단위로 프로세스 풀에서 병렬 처리합니다.
+"""
+
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import click
+
+from instrumentation import span
+from lazy_import import lazy_module
+
+pd = lazy_module('pandas')
+
+ENGINES = ('pdfplumber', 'pymupdf')
+
+
+def _clean_cell(cell):
+    if cell is None:
+        return ''
+    return re.sub(r'\s+', ' ', str(cell)).strip()
+
+
+def table_rows_to_markdown(rows):
+    """
+    표의 행 리스트(첫 행은 머리글)를 마크다운 표로 변환합니다.
+    HTMLToTextWithMarkdownTables.html_table_to_markdown과 같은 형식(DataFrame.to_markdown)을 사용합니다.
+
+    매개변수:
+    - rows: 셀 문자열(또는 None)의 리스트의 리스트
+
+    반환값:
+    - str: 마크다운 표 (빈 표면 빈 문자열)
+    """
+    rows = [[_clean_cell(cell) for cell in row] for row in rows if row and any(cell for cell in row)]
+    if not rows:
+        return ''
+    width = max(len(row) for row in rows)
+    rows = [row + [''] * (width - len(row)) for row in rows]
+    header = rows[0]
+    # 병합 셀 때문에 머리글이 비거나 중복되면 열 이름을 보정합니다.
+    columns = []
+    for i, name in enumerate(header):
+        name = name or f'Unnamed: {i}'
+        while name in columns:
+            name = f'{name}.{i}'
+        columns.append(name)
+    return pd.DataFrame(rows[1:], columns=columns).to_markdown(index=False)
+
+
+def _inside_any(bbox, table_bboxes):
+    x0, top, x1, bottom = bbox
+    cx, cy = (x0 + x1) / 2, (top + bottom) / 2
+    return any(tx0 <= cx <= tx1 and ttop <= cy <= tbottom for tx0, ttop, tx1, tbottom in table_bboxes)
+
+
+def _compose_blocks(blocks):
+    """(y 좌표, 텍스트) 블록을 위에서 아래 순서로 이어 붙입니다."""
+    text = '\n'.join(content for _, content in sorted(blocks, key=lambda block: block[0]) if content)
+    return re.sub(r'\n+', '\n', text).strip()
+
+
+def _pdfplumber_pages(pdf_path, first_page, last_page):
+    import pdfplumber
+
+    results = []
+    with pdfplumber.open(pdf_path) as pdf:
+        for page_index in range(first_page, last_page):
+            page = pdf.pages[page_index]
+            tables = page.find_tables()
+            table_bboxes = [table.bbox for table in tables]
+            blocks = [(table.bbox[1], table_rows_to_markdown(table.extract())) for table in tables]
+            blocks += [(line['top'], line['text']) for line in page.extract_text_lines()
+                       if not _inside_any((line['x0'], line['top'], line['x1'], line['bottom']), table_bboxes)]
+            results.append((page_index + 1, _compose_blocks(blocks), len(tables)))
+            page.flush_cache()
+    return results
+
+
+def _pymupdf_pages(pdf_path, first_page, last_page):
+    import fitz
+
+    results = []
+    with fitz.open(pdf_path) as doc:
+        for page_index in range(first_page, last_page):
+            page = doc[page_index]
+            tables = page.find_tables().tables
+            table_bboxes = [tuple(table.bbox) for table in tables]
+            blocks = [(table.bbox[1], table_rows_to_markdown(table.extract())) for table in tables]
+            for x0, y0, x1, y1, content, _, block_type in page.get_text('blocks'):
+                if block_type == 0 and not _inside_any((x0, y0, x1, y1), table_bboxes):
+                    blocks.append((y0, content.strip()))
+            results.append((page_index + 1, _compose_blocks(blocks), len(tables)))
+    return results
+
+
+def extract_page_range(pdf_path, first_page, last_page, engine='pdfplumber'):
+    """
+    페이지 범위 [first_page, last_page)에서 표는 마크다운으로, 나머지는 텍스트로 추출합니다.
+    프로세스 풀의 워커에서 호출됩니다.
+
+    반환값:
+    - list: (페이지 번호(1부터), 텍스트, 표 개수) 튜플 리스트
+    """
+    if engine == 'pymupdf':
+        return _pymupdf_pages(pdf_path, first_page, last_page)
+    return _pdfplumber_pages(pdf_path, first_page, last_page)
+
+
+def extract_text_with_local_tables(pdf_path, engine='pdfplumber', workers=None, pages_per_task=8):
+    """
+    PDF 전체를 로컬 표 추출 엔진으로 처리합니다.
+
+    매개변수:
+    - pdf_path: PDF 파일 경로
+    - engine: 'pdfplumber' 또는 'pymupdf'
+    - workers: 프로세스 수 (기본값: CPU 수)
+    - pages_per_task: 워커 하나가 한 번에 처리할 페이지 수
+
+    반환값:
+    - list: (페이지 번호, 텍스트) 튜플 리스트 (페이지 순서)
+    """
+    import fitz
+
+    if engine not in ENGINES:
+        raise ValueError(f"지원하지 않는 엔진입니다: {engine} (사용 가능: {', '.join(ENGINES)})")
+    pdf_name = os.path.splitext(os.path.basename(pdf_path))[0]
+    with fitz.open(pdf_path) as doc:
+        page_count = len(doc)
+
+    with span('local_table_extraction', document=pdf_name, engine=engine) as extract_span:
+        ranges = [(start, min(start + pages_per_task, page_count)) for start in range(0, page_count, pages_per_task)]
+        if len(ranges) <= 1 or workers == 1:
+            page_results = [result for start, end in ranges for result in extract_page_range(pdf_path, start, end, engine)]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(extract_page_range, pdf_path, start, end, engine) for start, end in ranges]
+                page_results = [result for future in futures for result in future.result()]
+        table_count = sum(tables for _, _, tables in page_results)
+        extract_span.count('pages', page_count)
+        extract_span.count('tables', table_count)
+
+    print(f"{pdf_name}: {page_count}페이지, 표 {table_count}개 추출 ({engine})")
+    return [(page, text) for page, text, _ in page_results]
+
+
+@click.command()
+@click.argument('pdf_path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--engine', type=click.Choice(ENGINES), default='pdfplumber')
+@click.option('--workers', type=int, default=None)
+@click.option('--page', type=int, default=None, help='지정하면 해당 페이지만 출력합니다.')
+def main(pdf_path, engine, workers, page):
+    for page_number, text in extract_text_with_local_tables(pdf_path, engine=engine, workers=workers):
+        if page is None or page == page_number:
+            print(f"===== Page {page_number} =====")
+            print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,344 @@
+"""
+수집(ingestion) 파이프라인 처리량 벤치마크
+
+PDF 텍스트 추출부터 corpus Parquet 저장까지 각 단계를 1x/10x/100x 규모의 입력으로 실행하여
+pages/sec, MB/s, 최대 RSS를 측정합니다. 입력은 new_data/corpus.csv의 실제 청크와 합성 약관 텍스트를
+섞어 만들며, 레이아웃 분석(Upstage)과 임베딩/LLM은 fake 백엔드로 대체하므로 API 키가 필요 없습니다.
+
+각 (단계, 규모)는 새 프로세스에서 실행하여 최대 RSS가 서로 섞이지 않게 합니다.
+결과는 JSON으로 저장하며, 기준선(baseline)과 비교하여 처리량이 허용치 이상 떨어지거나
+단계가 오류로 끝나거나 기준선의 단계가 결과에 없으면 종료 코드 1을 돌려줍니다.
+
+사용법
+    python pipeline_benchmark.py --save_baseline
+    python pipeline_benchmark.py --scale 1 --scale 10 --baseline benchmark_baselines/pipeline.json
+"""
+
+import contextlib
+import importlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime
+
+import click
+
+root_dir = os.path.dirname(os.path.realpath(__file__))
+DEFAULT_BASELINE = os.path.join(root_dir, 'benchmark_baselines', 'pipeline.json')
+BASE_PAGES = 20  # 1x 규모의 페이지 수 (합성 약관 페이지와 corpus.csv 청크 각각)
+PDF_BASE_PAGES = 10
+
+
+def synthetic_terms_pages(n_pages):
+    """
+    관/조/항/호 구조를 가진 합성 약관 페이지를 만듭니다.
+
+    반환값:
+    - list: (페이지 번호, 텍스트) 튜플 리스트
+    """
+    pages = []
+    article = 1
+    for page in range(1, n_pages + 1):
+        lines = []
+        if page % 5 == 1:
+            lines.append(f"제{(page // 5) % 99 + 1}관 보험금의 지급")
+        for _ in range(3):
+            lines.append(f"제{article % 99 + 1}조(보험금의 지급사유) 회사는 피보험자에게 다음 중 어느 하나의 사유가 "
+                         f"발생한 경우에는 보험수익자에게 약정한 보험금을 지급합니다.")
+            for item in range(1, 4):
+                lines.append(f"{item}. 보험기간 중 피보험자가 질병으로 진단확정된 경우 진단비를 지급합니다.")
+            lines.append("① 제1항에도 불구하고 계약일부터 90일 이내에 진단확정된 경우에는 보험금을 지급하지 않습니다.")
+            article += 1
+        pages.append((page, '\n'.join(lines)))
+    return pages
+
+
+def load_corpus_pages(n_pages):
+    """new_data/corpus.csv의 청크를 페이지 텍스트로 사용합니다. 부족하면 반복합니다."""
+    import pandas as pd
+    contents = pd.read_csv(os.path.join(root_dir, 'new_data', 'corpus.csv'), usecols=['contents'])['contents']
+    contents = contents.dropna().tolist()
+    return [(i + 1, contents[i % len(contents)]) for i in range(n_pages)]
+
+
+def build_pages(scale):
+    n_pages = BASE_PAGES * scale
+    pages = synthetic_terms_pages(n_pages)
+    pages += [(n_pages + page, text) for page, text in load_corpus_pages(n_pages)]
+    return pages
+
+
+def fake_layout_html(text):
+    """레이아웃 분석 결과를 흉내 낸 HTML (문단 + 표 하나)"""
+    paragraphs = ''.join(f"<p>{line}</p>" for line in text.splitlines() if line.strip())
+    table = ("<table><tr><th>구분</th><th>지급금액</th></tr>"
+             "<tr><td>암진단비</td><td>3,000만원</td></tr><tr><td>뇌출혈진단비</td><td>1,000만원</td></tr></table>")
+    return f"<h1 style='font-size:24px'>보험약관</h1>{paragraphs}<br>{table}"
+
+
+def _text_bytes(pages):
+    return sum(len(text.encode('utf-8')) for _, text in pages)
+
+
+def prepare_pdf(scale, work_dir):
+    import fitz
+    pdf_path = os.path.join(work_dir, 'synthetic.pdf')
+    doc = fitz.open()
+    for _, text in synthetic_terms_pages(PDF_BASE_PAGES * scale):
+        page = doc.new_page()
+        page.insert_textbox(fitz.Rect(40, 40, 560, 800), text, fontname='korea', fontsize=9)
+    doc.save(pdf_path)
+    doc.close()
+    return pdf_path, PDF_BASE_PAGES * scale, os.path.getsize(pdf_path)
+
+
+def run_pdf(pdf_path):
+    from classify_documents import extract_text_from_pdf
+    extract_text_from_pdf(pdf_path, max_pages=PDF_BASE_PAGES * 1000)
+
+
+def prepare_html(scale, work_dir):
+    from langchain.schema import Document
+    pages = build_pages(scale)
+    documents = [Document(page_content=fake_layout_html(text), metadata={'page': page}) for page, text in pages]
+    return documents, len(pages), sum(len(doc.page_content.encode('utf-8')) for doc in documents)
+
+
+def run_html_tables(documents):
+    from rainbow_html_transformer import HTMLToTextWithMarkdownTables
+    HTMLToTextWithMarkdownTables().transform_documents(documents)
+
+
+def run_html_indentation(documents):
+    from rainbow_html_Indentation import HTMLToTextWithIndentation
+    HTMLToTextWithIndentation().transform_documents(documents)
+
+
+def run_html_markdown(documents):
+    from html_to_markdown import HTMLToMarkdown
+    HTMLToMarkdown().transform_documents(documents)
+
+
+def prepare_text(scale, work_dir):
+    pages = build_pages(scale)
+    return '\n'.join(text for _, text in pages), len(pages), _text_bytes(pages)
+
+
+def run_terms_processor(text):
+    from TermsAndConditionsDocumentProcessor import TermsAndConditionsDocumentProcessor
+    TermsAndConditionsDocumentProcessor(chunk_size=512, overlap_lines=2).process_document_to_dataframe(text)
+
+
+def run_general_chunker(text):
+    from GeneralDocumentChunker import GeneralDocumentChunker
+    GeneralDocumentChunker(max_chunk_size=50, overlap_lines=3).process_document_to_dataframe(text)
+
+
+def run_classification(text):
+    from classify_documents import classify_document, load_document_classes
+    document_classes = load_document_classes(os.path.join(root_dir, 'document_class.json'))
+    # 실제 분류처럼 문서(여기서는 4KB 단위)마다 키워드를 검사합니다.
+    for start in range(0, len(text), 4096):
+        classify_document(text[start:start + 4096], document_classes)
+
+
+def prepare_sections(scale, work_dir):
+    pages = build_pages(scale)
+    return pages, len(pages), _text_bytes(pages)
+
+
+def run_sections(pages):
+    from pdf_section_extractor import sections_to_dataframe_with_metadata, split_text_into_sections_with_metadata
+    sections_to_dataframe_with_metadata(split_text_into_sections_with_metadata(pages), 'synthetic.pdf')
+
+
+def prepare_parquet(scale, work_dir):
+    import pandas as pd
+    pages = build_pages(scale)
+    corpus_df = pd.DataFrame({
+        'doc_id': [str(uuid.uuid4()) for _ in pages],
+        'contents': [text for _, text in pages],
+        'metadata': [{'file_name': 'synthetic.pdf', 'page': page} for page, _ in pages],
+    })
+    return (corpus_df, os.path.join(work_dir, 'corpus.parquet')), len(pages), _text_bytes(pages)
+
+
+def run_parquet(args):
+    from corpus_io import write_corpus
+    corpus_df, path = args
+    write_corpus(corpus_df, path)
+
+
+def prepare_embedding(scale, work_dir):
+    pages = build_pages(scale)
+    return ([text for _, text in pages], os.path.join(work_dir, 'embedding_cache')), len(pages), _text_bytes(pages)
+
+
+def run_embedding(args):
+    from embedding_store import EmbeddingStore
+    from fake_backends import fake_embeddings
+    texts, store_dir = args
+    store = EmbeddingStore(store_dir)
+    store.get_or_compute(texts, fake_embeddings)  # 미적중: fake 임베딩 계산 후 저장
+    store.get_or_compute(texts, fake_embeddings)  # 적중: memory-map에서 읽기
+
+
+# 단계 이름: (입력 준비 함수, 측정 대상 함수, 측정 전에 미리 import할 모듈)
+STAGES = {
+    'pdf_text_extraction': (prepare_pdf, run_pdf, ['classify_documents']),
+    'html_markdown_tables': (prepare_html, run_html_tables, ['rainbow_html_transformer']),
+    'html_indentation': (prepare_html, run_html_indentation, ['rainbow_html_Indentation']),
+    'html_to_markdown': (prepare_html, run_html_markdown, ['html_to_markdown']),
+    'terms_processor': (prepare_text, run_terms_processor, ['TermsAndConditionsDocumentProcessor']),
+    'general_chunker': (prepare_text, run_general_chunker, ['GeneralDocumentChunker']),
+    'section_split': (prepare_sections, run_sections, ['pdf_section_extractor']),
+    'keyword_classification': (prepare_text, run_classification, ['classify_documents']),
+    'corpus_parquet_write': (prepare_parquet, run_parquet, ['corpus_io', 'pyarrow']),
+    'embedding_cache_fake': (prepare_embedding, run_embedding, ['embedding_store', 'fake_backends']),
+}
+
+
+def _max_rss_mb():
+    # 리눅스에서 ru_maxrss 단위는 KB, macOS에서는 byte입니다.
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+
+def run_stage(stage, scale):
+    """단계 하나를 실행하고 측정값을 돌려줍니다. 새 프로세스 안에서 호출됩니다."""
+    prepare, run, modules = STAGES[stage]
+    result = {'stage': stage, 'scale': scale}
+    try:
+        with tempfile.TemporaryDirectory() as work_dir, contextlib.redirect_stdout(io.StringIO()):
+            # import 시간이 처리량에 섞이지 않도록 측정 전에 불러옵니다.
+            for module in modules:
+                importlib.import_module(module)
+            data, pages, n_bytes = prepare(scale, work_dir)
+            rss_before = _max_rss_mb()
+            start = time.perf_counter()
+            run(data)
+            seconds = time.perf_counter() - start
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+        return result
+    result.update({
+        'pages': pages,
+        'bytes': n_bytes,
+        'seconds': round(seconds, 4),
+        'pages_per_sec': round(pages / seconds, 2) if seconds else None,
+        'mb_per_sec': round(n_bytes / 1e6 / seconds, 3) if seconds else None,
+        'peak_rss_mb': round(_max_rss_mb(), 1),
+        'rss_before_mb': round(rss_before, 1),
+    })
+    return result
+
+
+def run_benchmarks(stages, scales):
+    results = []
+    context = multiprocessing.get_context('spawn')
+    for stage in stages:
+        for scale in scales:
+            with context.Pool(1) as pool:
+                result = pool.apply(run_stage, (stage, scale))
+            results.append(result)
+            if 'error' in result:
+                print(f"{stage:24s} {scale:>4d}x  오류: {result['error']}")
+            else:
+                print(f"{stage:24s} {scale:>4d}x  {result['pages_per_sec']:>10.1f} pages/s  "
+                      f"{result['mb_per_sec']:>8.2f} MB/s  peak RSS {result['peak_rss_mb']:.0f}MB")
+    return results
+
+
+def compare_with_baseline(results, baseline, tolerance, stages=None, scales=None):
+    """
+    기준선보다 MB/s가 tolerance 비율 이상 떨어진 항목, 오류로 끝난 항목, 기준선에 있지만 결과에 없는 항목을 찾습니다.
+
+    매개변수:
+    - results: run_benchmarks 결과
+    - baseline: 기준선 JSON
+    - tolerance: 허용하는 처리량 감소 비율
+    - stages, scales: 이번에 실행한 단계와 규모 (None이면 결과의 단계와 규모)
+
+    반환값:
+    - list: 성능 저하 항목 설명 문자열 리스트
+    """
+    stages = set(stages or (result['stage'] for result in results))
+    scales = set(scales or (result['scale'] for result in results))
+    result_map = {(r['stage'], r['scale']): r for r in results}
+    regressions = [f"{r['stage']} {r['scale']}x: 오류 - {r['error']}" for r in results if 'error' in r]
+    for base in baseline['results']:
+        if 'error' in base or base['scale'] not in scales:
+            continue
+        # STAGES에서 사라진 단계는 선택할 수 없으므로, 실행하지 않은 단계여도 결과에 없는 것으로 봅니다.
+        if base['stage'] in STAGES and base['stage'] not in stages:
+            continue
+        result = result_map.get((base['stage'], base['scale']))
+        if result is None:
+            regressions.append(f"{base['stage']} {base['scale']}x: 결과 없음")
+        elif 'error' not in result and result['mb_per_sec'] < base['mb_per_sec'] * (1 - tolerance):
+            regressions.append(f"{result['stage']} {result['scale']}x: "
+                               f"{base['mb_per_sec']} → {result['mb_per_sec']} MB/s")
+    return regressions
+
+
+@click.command()
+@click.option('--stage', 'stages', multiple=True, type=click.Choice(list(STAGES)),
+              help='실행할 단계 (여러 번 지정 가능, 기본값: 전체)')
+@click.option('--scale', 'scales', multiple=True, type=int, help='입력 규모 배수 (여러 번 지정 가능, 기본값: 1 10 100)')
+@click.option('--output', type=click.Path(dir_okay=False), default=None, help='결과 JSON 저장 경로')
+@click.option('--baseline', type=click.Path(dir_okay=False), default=DEFAULT_BASELINE, help='비교할 기준선 JSON 경로')
+@click.option('--save_baseline', is_flag=True, help='결과를 기준선으로 저장합니다.')
+@click.option('--tolerance', type=float, default=0.3, help='허용하는 처리량 감소 비율')
+def main(stages, scales, output, baseline, save_baseline, tolerance):
+    stages = list(stages) or list(STAGES)
+    scales = list(scales) or [1, 10, 100]
+    report = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'results': run_benchmarks(stages, scales),
+    }
+
+    errors = [f"{r['stage']} {r['scale']}x: 오류 - {r['error']}" for r in report['results'] if 'error' in r]
+    output_paths = [output] if output else []
+    if save_baseline and not errors:
+        output_paths.append(baseline)
+    for path in output_paths:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"결과 저장: {path}")
+
+    if save_baseline:
+        if errors:
+            # 실패한 단계가 있는 결과를 기준선으로 쓰면 이후 비교가 그 단계를 건너뛰게 됩니다.
+            print("오류로 끝난 단계가 있어 기준선을 저장하지 않습니다:")
+            for error in errors:
+                print(f"  {error}")
+            sys.exit(1)
+        return
+    if os.path.exists(baseline):
+        with open(baseline, 'r', encoding='utf-8') as f:
+            regressions = compare_with_baseline(report['results'], json.load(f), tolerance, stages, scales)
+    else:
+        # 기준선이 없어도 오류로 끝난 단계는 실패로 봅니다.
+        regressions = errors
+    if regressions:
+        print("기준선 대비 성능 저하:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+    if os.path.exists(baseline):
+        print("기준선 대비 성능 저하 없음")
+
+
+if __name__ == '__main__':
+    main()
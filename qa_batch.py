@@ -0,0 +1,271 @@
+"""
+OpenAI Batch API를 이용한 QA 데이터셋 생성
+
+make_qa.py의 동기 호출 대신, 샘플링한 corpus 전체의 QA 프롬프트를 Batch API 형식의 JSONL로 기록하고
+한 번에 제출합니다. 완료될 때까지 상태를 확인한 뒤 결과를 qa.parquet 스키마
+(qid, query, generation_gt, retrieval_gt)로 되돌립니다. 배치 요금과 처리량을 활용할 수 있습니다.
+
+batch_dir 구성 (<client>는 클라이언트 이름 'openai' 또는 'local'이며, 두 클라이언트는 서로의 파일을 건드리지 않습니다)
+- <client>_batch_input.jsonl: 제출할 요청 (한 줄에 한 요청)
+- <client>_batch_mapping.csv: custom_id → doc_id 매핑 (retrieval_gt 복원용)
+- <client>_batch_output.jsonl: 완료된 결과
+- <client>_batch_state.json: 제출한 batch id, 생성 설정, 샘플(doc_id와 내용 해시) (중단 후 재개용)
+
+재개할 때는 저장된 설정과 샘플이 이번 실행과 같은지 확인하고, 다르면 오류를 냅니다.
+배치가 failed/expired/cancelled로 끝나거나 결과 파일 없이 끝나면 상태 파일을 지우므로 다음 실행은 새로 제출합니다.
+시간 초과로 기다림을 멈춘 경우에는 배치가 아직 진행 중일 수 있으므로 상태를 남겨 다음 실행에서 이어서 기다립니다.
+
+LocalBatchClient는 네트워크 없이 같은 흐름을 실행하는 파일 기반 대체 구현입니다.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+
+from fake_backends import fake_chat_completion
+from lazy_import import lazy_module
+
+pd = lazy_module('pandas')
+
+BATCH_ENDPOINT = '/v1/chat/completions'
+
+
+class BatchFailedError(RuntimeError):
+    """배치가 결과 없이 끝나 다시 제출해야 하는 경우"""
+
+
+def render_prompt(prompt, text, num_questions):
+    """generate_qa_llama_index와 같은 방식으로 프롬프트 템플릿을 채웁니다."""
+    return prompt.replace('{{text}}', text).replace('{{num_questions}}', str(num_questions))
+
+
+def write_batch_input(corpus_df, prompt, batch_dir, model='gpt-4o', temperature=0.5,
+                      question_num_per_content=1, prefix=''):
+    """
+    corpus의 각 청크에 대한 QA 생성 요청을 Batch API 입력 JSONL로 기록합니다.
+
+    매개변수:
+    - corpus_df: 샘플링된 corpus 데이터프레임 ('doc_id', 'contents' 컬럼 필요)
+    - prompt: '{{text}}', '{{num_questions}}'를 포함하는 프롬프트 템플릿
+    - batch_dir: 배치 파일을 저장할 디렉토리
+    - prefix: 파일 이름 접두어 (예: 'openai_')
+
+    반환값:
+    - str: 입력 JSONL 파일 경로
+    """
+    os.makedirs(batch_dir, exist_ok=True)
+    input_path = os.path.join(batch_dir, f'{prefix}batch_input.jsonl')
+    mapping = []
+    with open(input_path, 'w', encoding='utf-8') as f:
+        for i, (doc_id, contents) in enumerate(zip(corpus_df['doc_id'], corpus_df['contents'])):
+            custom_id = f"qa-{i}"
+            request = {
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": BATCH_ENDPOINT,
+                "body": {
+                    "model": model,
+                    "temperature": temperature,
+                    "messages": [{"role": "user",
+                                  "content": render_prompt(prompt, contents, question_num_per_content)}],
+                },
+            }
+            f.write(json.dumps(request, ensure_ascii=False) + '\n')
+            mapping.append({'custom_id': custom_id, 'doc_id': doc_id})
+    pd.DataFrame(mapping).to_csv(os.path.join(batch_dir, f'{prefix}batch_mapping.csv'), index=False)
+    return input_path
+
+
+class OpenAIBatchClient:
+    """OpenAI Batch API 클라이언트 래퍼입니다."""
+
+    name = 'openai'
+
+    def __init__(self, client=None):
+        if client is None:
+            from openai import OpenAI
+            client = OpenAI()
+        self.client = client
+
+    def submit(self, input_path):
+        with open(input_path, 'rb') as f:
+            input_file = self.client.files.create(file=f, purpose='batch')
+        batch = self.client.batches.create(input_file_id=input_file.id, endpoint=BATCH_ENDPOINT,
+                                           completion_window='24h')
+        return batch.id
+
+    def status(self, batch_id):
+        batch = self.client.batches.retrieve(batch_id)
+        return batch.status, batch.output_file_id
+
+    def download(self, output_file_id, output_path):
+        content = self.client.files.content(output_file_id)
+        with open(output_path, 'w', encoding='utf-8') as f:
+            f.write(content.text)
+
+
+class LocalBatchClient:
+    """
+    Batch API를 파일 시스템으로 흉내 내는 오프라인 대체 클라이언트입니다.
+    제출 시 입력 파일을 work_dir에 복사하고, 첫 상태 조회 때 fake 응답으로 결과 파일을 만듭니다.
+    """
+
+    name = 'local'
+
+    def __init__(self, work_dir, responder=fake_chat_completion):
+        self.work_dir = work_dir
+        self.responder = responder
+        os.makedirs(work_dir, exist_ok=True)
+
+    def submit(self, input_path):
+        batch_id = f"batch_local_{uuid.uuid4().hex[:12]}"
+        shutil.copy(input_path, os.path.join(self.work_dir, f"{batch_id}_input.jsonl"))
+        return batch_id
+
+    def status(self, batch_id):
+        input_path = os.path.join(self.work_dir, f"{batch_id}_input.jsonl")
+        output_file_id = f"{batch_id}_output.jsonl"
+        output_path = os.path.join(self.work_dir, output_file_id)
+        if not os.path.exists(input_path):
+            return 'failed', None
+        if not os.path.exists(output_path):
+            with open(input_path, 'r', encoding='utf-8') as src, open(output_path, 'w', encoding='utf-8') as dst:
+                for i, line in enumerate(src):
+                    request = json.loads(line)
+                    result = {
+                        "id": f"batch_req_{i}",
+                        "custom_id": request['custom_id'],
+                        "response": {"status_code": 200, "request_id": f"req_{i}",
+                                     "body": self.responder(request['body'], i)},
+                        "error": None,
+                    }
+                    dst.write(json.dumps(result, ensure_ascii=False) + '\n')
+        return 'completed', output_file_id
+
+    def download(self, output_file_id, output_path):
+        shutil.copy(os.path.join(self.work_dir, output_file_id), output_path)
+
+
+def wait_for_batch(client, batch_id, poll_interval=30.0, timeout=None):
+    """
+    배치가 끝날 때까지 상태를 주기적으로 확인합니다.
+
+    반환값:
+    - str: 결과 파일 id
+    """
+    start_time = time.time()
+    while True:
+        status, output_file_id = client.status(batch_id)
+        print(f"배치 {batch_id} 상태: {status}")
+        if status == 'completed':
+            return output_file_id
+        if status in ('failed', 'expired', 'cancelled'):
+            raise BatchFailedError(f"배치 {batch_id}가 {status} 상태로 종료되었습니다.")
+        if timeout is not None and time.time() - start_time > timeout:
+            raise TimeoutError(f"배치 {batch_id}가 {timeout}초 안에 끝나지 않았습니다.")
+        time.sleep(poll_interval)
+
+
+def parse_qa_output(result):
+    """AutoRAG의 QA 파서와 같은 규칙으로 '[Q]: ... [A]: ...' 응답을 분리합니다."""
+    qa_pairs = []
+    for res in result.strip().split('[Q]:'):
+        res = res.strip()
+        if res and '\n[A]:' in res:
+            query, answer = res.split('\n[A]:', 1)
+            qa_pairs.append({'query': query.strip(), 'generation_gt': answer.strip()})
+    return qa_pairs
+
+
+def parse_batch_output(output_path, mapping_path):
+    """
+    배치 결과 JSONL을 qa.parquet 스키마 데이터프레임으로 변환합니다.
+    실패한 요청은 건너뛰고 개수를 출력합니다.
+    """
+    doc_ids = pd.read_csv(mapping_path, dtype=str).set_index('custom_id')['doc_id'].to_dict()
+    rows = []
+    failed = 0
+    with open(output_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            result = json.loads(line)
+            response = result.get('response') or {}
+            if result.get('error') or response.get('status_code') != 200:
+                failed += 1
+                continue
+            content = response['body']['choices'][0]['message']['content']
+            doc_id = doc_ids[result['custom_id']]
+            for qa in parse_qa_output(content):
+                rows.append({
+                    'qid': str(uuid.uuid4()),
+                    'query': qa['query'],
+                    'generation_gt': [qa['generation_gt']],
+                    'retrieval_gt': [[doc_id]],
+                })
+    if failed:
+        print(f"실패한 배치 요청 {failed}개를 건너뛰었습니다.")
+    return pd.DataFrame(rows, columns=['qid', 'query', 'generation_gt', 'retrieval_gt'])
+
+
+def sample_fingerprint(sampled_df):
+    """샘플의 doc_id와 내용 sha256 (재개할 때 corpus가 바뀌었는지 확인용)"""
+    return {str(doc_id): hashlib.sha256(str(contents).encode('utf-8')).hexdigest()
+            for doc_id, contents in zip(sampled_df['doc_id'], sampled_df['contents'])}
+
+
+def _check_resume(state, settings, corpus_df, state_path):
+    """저장된 배치의 설정과 샘플이 이번 실행과 같은지 확인합니다."""
+    changed = [key for key, value in settings.items() if state.get('settings', {}).get(key) != value]
+    sample = state.get('sample') or {}
+    current = sample_fingerprint(corpus_df[corpus_df['doc_id'].astype(str).isin(list(sample))])
+    if current != sample:
+        changed.append('corpus')
+    if changed:
+        raise ValueError(f"진행 중인 배치 {state['batch_id']}와 설정이 다릅니다 ({', '.join(changed)}). "
+                         f"같은 설정으로 다시 실행하거나 {state_path}를 지우고 새로 제출하세요.")
+
+
+def make_batch_qa(corpus_df, prompt, batch_dir, client, content_size, model='gpt-4o', temperature=0.5,
+                  question_num_per_content=1, poll_interval=30.0, random_state=None, timeout=None):
+    """
+    corpus를 샘플링하여 배치로 QA를 생성합니다. 클라이언트의 상태 파일이 있으면 제출을 건너뛰고 이어서 기다립니다.
+
+    반환값:
+    - DataFrame: qa.parquet 스키마 데이터프레임
+    """
+    prefix = f'{client.name}_'
+    state_path = os.path.join(batch_dir, f'{prefix}batch_state.json')
+    settings = {'model': model, 'temperature': temperature, 'question_num_per_content': question_num_per_content,
+                'content_size': min(content_size, len(corpus_df)),
+                'prompt_sha256': hashlib.sha256(prompt.encode('utf-8')).hexdigest()}
+    if os.path.exists(state_path):
+        with open(state_path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        _check_resume(state, settings, corpus_df, state_path)
+        batch_id = state['batch_id']
+        print(f"기존 배치 {batch_id}를 이어서 확인합니다.")
+    else:
+        sampled_df = corpus_df.sample(n=settings['content_size'], random_state=random_state)
+        input_path = write_batch_input(sampled_df, prompt, batch_dir, model, temperature, question_num_per_content,
+                                       prefix=prefix)
+        batch_id = client.submit(input_path)
+        with open(state_path, 'w', encoding='utf-8') as f:
+            json.dump({'batch_id': batch_id, 'settings': settings, 'sample': sample_fingerprint(sampled_df)}, f,
+                      ensure_ascii=False)
+        print(f"배치 {batch_id} 제출 완료 ({len(sampled_df)}개 요청)")
+
+    try:
+        output_file_id = wait_for_batch(client, batch_id, poll_interval=poll_interval, timeout=timeout)
+        if output_file_id is None:
+            raise BatchFailedError(f"배치 {batch_id}가 결과 파일 없이 끝났습니다 (모든 요청이 실패했을 수 있습니다).")
+    except BatchFailedError:
+        # 끝난 배치는 다시 기다려도 결과가 없으므로 다음 실행에서 새로 제출하도록 상태를 지웁니다.
+        os.remove(state_path)
+        raise
+    output_path = os.path.join(batch_dir, f'{prefix}batch_output.jsonl')
+    client.download(output_file_id, output_path)
+    qa_df = parse_batch_output(output_path, os.path.join(batch_dir, f'{prefix}batch_mapping.csv'))
+    os.remove(state_path)
+    return qa_df
@@ -0,0 +1,137 @@
+"""
+QA 생성 전 관련성 사전 필터
+
+make_qa.py는 무작위로 뽑은 청크를 GPT-4o에 보낸 뒤에야 '뉴진스와 관련 없습니다' 질문을 걸러냅니다.
+이 모듈은 LLM 호출 전에 주제 설명(topic)과 각 청크의 BM25 점수를 계산하여
+관련 후보 청크만 남기므로, 관련 없는 청크에 생성 호출을 낭비하지 않습니다.
+
+한국어는 조사가 붙어 어절 단위 매칭이 잘 되지 않고(뉴진스가, 뉴진스의 ...) PDF 추출 텍스트는
+음절 사이에 공백이 끼는 경우가 많으므로('뉴 진 스'), 한글 사이의 공백을 없앤 뒤 음절 bigram으로,
+영문/숫자는 소문자 단어 단위로 토큰화합니다. 형태소 분석기가 필요 없어 빠릅니다.
+
+사용법
+    python qa_prefilter.py --corpus_path data/corpus_new.parquet --topic "걸그룹 뉴진스"
+"""
+
+import math
+import re
+from collections import Counter
+
+import click
+
+from corpus_io import read_corpus
+from lazy_import import lazy_module
+
+pd = lazy_module('pandas')
+
+DEFAULT_TOPIC = "걸그룹 뉴진스 NewJeans 민지 하니 다니엘 해린 혜인 어도어 버니즈"
+
+_hangul_pattern = re.compile(r'[가-힣]+')
+_hangul_space_pattern = re.compile(r'(?<=[가-힣])\s+(?=[가-힣])')
+_latin_pattern = re.compile(r'[A-Za-z0-9]+')
+
+
+def tokenize(text):
+    """
+    텍스트를 BM25용 토큰 리스트로 변환합니다.
+    한글은 공백을 제거한 연속 구간의 음절 bigram(한 글자 구간은 그대로), 영문/숫자는 소문자 단어로 분리합니다.
+    """
+    tokens = []
+    for word in _hangul_pattern.findall(_hangul_space_pattern.sub('', text)):
+        if len(word) == 1:
+            tokens.append(word)
+        else:
+            tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+    tokens.extend(word.lower() for word in _latin_pattern.findall(text))
+    return tokens
+
+
+def score_relevance(contents, topic, k1=1.5, b=0.75):
+    """
+    각 청크와 주제 설명 사이의 BM25 점수를 계산합니다.
+
+    매개변수:
+    - contents: 청크 텍스트 리스트(또는 Series)
+    - topic: 주제 설명 문자열
+    - k1, b: BM25 파라미터
+
+    반환값:
+    - list: 청크별 BM25 점수
+    """
+    query_terms = set(tokenize(topic))
+    if not query_terms:
+        raise ValueError("주제 설명에서 토큰을 추출할 수 없습니다.")
+
+    # 질의어에 해당하는 토큰만 세면 되므로 문서별 전체 어휘를 보관하지 않습니다.
+    doc_term_counts = []
+    doc_lengths = []
+    document_frequency = Counter()
+    for text in contents:
+        tokens = tokenize(text or '')
+        doc_lengths.append(len(tokens))
+        counts = Counter(token for token in tokens if token in query_terms)
+        doc_term_counts.append(counts)
+        document_frequency.update(counts.keys())
+
+    n_docs = len(doc_lengths)
+    if n_docs == 0:
+        return []
+    avg_length = (sum(doc_lengths) / n_docs) or 1.0
+    idf = {term: math.log(1 + (n_docs - df + 0.5) / (df + 0.5)) for term, df in document_frequency.items()}
+
+    scores = []
+    for counts, length in zip(doc_term_counts, doc_lengths):
+        norm = k1 * (1 - b + b * length / avg_length)
+        scores.append(sum(idf[term] * tf * (k1 + 1) / (tf + norm) for term, tf in counts.items()))
+    return scores
+
+
+def prefilter_corpus(corpus_df, topic=DEFAULT_TOPIC, min_score=2.0):
+    """
+    주제와 관련된 후보 청크만 남깁니다.
+
+    매개변수:
+    - corpus_df: AutoRAG corpus 데이터프레임 ('contents' 컬럼 필요)
+    - topic: 주제 설명 문자열
+    - min_score: 후보로 남길 최소 BM25 점수
+
+    반환값:
+    - (DataFrame, dict): 후보 청크 데이터프레임(점수 내림차순)과 필터 통계
+    """
+    scores = pd.Series(score_relevance(corpus_df['contents'].tolist(), topic), index=corpus_df.index)
+    mask = scores >= min_score
+    candidate_df = corpus_df.loc[mask].copy()
+    candidate_df['relevance_score'] = scores[mask]
+    candidate_df = candidate_df.sort_values('relevance_score', ascending=False)
+
+    total = len(corpus_df)
+    stats = {
+        "total": total,
+        "candidates": len(candidate_df),
+        "hit_rate": len(candidate_df) / total if total else 0.0,
+    }
+    return candidate_df, stats
+
+
+def print_filter_stats(stats):
+    """사전 필터 통계를 출력합니다."""
+    print(f"사전 필터: 전체 {stats['total']}개 중 후보 {stats['candidates']}개 "
+          f"(적중률 {stats['hit_rate']:.1%})")
+
+
+@click.command()
+@click.option('--corpus_path', type=click.Path(exists=True), default='data/corpus_new.parquet')
+@click.option('--topic', type=str, default=DEFAULT_TOPIC)
+@click.option('--min_score', type=float, default=2.0)
+@click.option('--show', type=int, default=10, help='상위 후보 출력 개수')
+def main(corpus_path, topic, min_score, show):
+    corpus_df = read_corpus(corpus_path, columns=['doc_id', 'contents'])
+    candidate_df, stats = prefilter_corpus(corpus_df, topic, min_score)
+    print_filter_stats(stats)
+    for _, row in candidate_df.head(show).iterrows():
+        preview = row['contents'][:60].replace('\n', ' ')
+        print(f"{row['relevance_score']:.2f}\t{row['doc_id']}\t{preview}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,258 @@
+"""
+재청킹 후 QA retrieval_gt 다시 매핑
+
+make_corpus.py의 청킹(chunk_size, overlap, TermsAndConditionsDocumentProcessor 사용 여부)을 바꾸면 doc_id가 모두 바뀌어
+기존 qa.parquet의 retrieval_gt를 쓸 수 없습니다. 이 모듈은 QA를 새로 생성하지 않고, 원문 문자 위치 구간으로
+이전 정답 청크와 겹치는 새 청크를 찾아 retrieval_gt를 바꿉니다.
+
+청크 위치 (원문 기준 문자 구간)
+- offsets: 두 코퍼스 모두 metadata에 start_char_idx/end_char_idx와 source(file_path)가 있으면 그대로 사용합니다.
+  (make_corpus.py가 만든 코퍼스)
+- text: 그 밖의 경우 공백을 정규화한 원문에서 청크 텍스트를 찾아 위치를 정합니다.
+  원문은 --source_dir의 파일을 쓰고, 없으면 이전 코퍼스의 청크를 겹치는 부분을 합쳐 복원합니다.
+
+source별로 새 청크 구간을 시작 위치로 정렬하고 끝 위치의 누적 최댓값을 두어, 이전 정답 청크마다 이진 탐색
+두 번으로 겹치는 후보 범위를 찾습니다 (전체 O((n + m) log n)). 겹친 길이가 두 청크 중 짧은 쪽의
+min_overlap 이상인 새 청크만 남깁니다. 이전 정답 그룹(OR 후보들)은 매핑된 새 청크들의 합집합이 됩니다.
+
+사용법
+    python qa_remap.py --qa_path data/qa.parquet --old_corpus_path data/corpus.parquet \
+        --new_corpus_path data/corpus_new.parquet --save_path data/qa_remapped.parquet
+"""
+
+import os
+import re
+
+import click
+import numpy as np
+
+from corpus_io import SOURCE_KEYS, read_corpus, read_qa, write_qa
+
+_whitespace = re.compile(r'\s+')
+# 청크가 겹치는 부분을 찾을 때 쓰는 앞부분 길이 (이보다 짧은 겹침은 우연으로 보고 무시)
+ANCHOR_CHARS = 16
+
+
+def normalize_text(text):
+    return _whitespace.sub(' ', text).strip()
+
+
+def chunk_sources(corpus_df):
+    """metadata의 source(없으면 file_path, file_name) 값 배열. 하나라도 없으면 None"""
+    sources = corpus_df['metadata'].map(
+        lambda metadata: next((metadata[key] for key in SOURCE_KEYS
+                               if isinstance(metadata, dict) and metadata.get(key)), None))
+    return None if sources.isna().any() else sources.to_numpy()
+
+
+def chunk_offsets(corpus_df):
+    """metadata의 (start_char_idx, end_char_idx) 배열. 하나라도 없으면 None"""
+    def get(key):
+        return corpus_df['metadata'].map(lambda metadata: metadata.get(key) if isinstance(metadata, dict) else None)
+    starts, ends = get('start_char_idx'), get('end_char_idx')
+    if starts.isna().any() or ends.isna().any():
+        return None
+    return starts.astype(np.int64).to_numpy(), ends.astype(np.int64).to_numpy()
+
+
+def _suffix_prefix_overlap(text, chunk):
+    """text의 끝과 chunk의 앞이 겹치는 가장 긴 길이 (ANCHOR_CHARS 미만이면 0)"""
+    if len(chunk) < ANCHOR_CHARS:
+        return len(chunk) if text.endswith(chunk) else 0
+    tail = text[-len(chunk):]
+    anchor = chunk[:ANCHOR_CHARS]
+    position = tail.find(anchor)
+    while position >= 0:
+        if chunk.startswith(tail[position:]):
+            return len(tail) - position
+        position = tail.find(anchor, position + 1)
+    return 0
+
+
+def merge_chunks(chunks):
+    """
+    순서대로 놓인 (정규화된) 청크들을 겹치는 부분을 합쳐 원문을 복원합니다.
+
+    반환값:
+    - (복원한 텍스트, 청크별 (시작, 끝) 리스트)
+    """
+    parts, spans, length, tail = [], [], 0, ''
+    for chunk in chunks:
+        overlap = _suffix_prefix_overlap(tail, chunk) if tail else 0
+        if overlap == 0 and length:
+            parts.append(' ')
+            length += 1
+        start = length - overlap
+        parts.append(chunk[overlap:])
+        length += len(chunk) - overlap
+        tail = (tail + chunk[overlap:])[-max(len(chunk), 4096):]
+        spans.append((start, start + len(chunk)))
+    return ''.join(parts), spans
+
+
+def locate_chunks(reference, chunks):
+    """
+    청크들을 reference에서 찾아 위치를 정합니다. 청크는 대체로 원문 순서이므로 이전 청크 위치부터 찾습니다.
+
+    반환값:
+    - (시작 배열, 끝 배열). 찾지 못한 청크는 -1
+    """
+    starts = np.full(len(chunks), -1, dtype=np.int64)
+    ends = np.full(len(chunks), -1, dtype=np.int64)
+    cursor = 0
+    for i, chunk in enumerate(chunks):
+        if not chunk:
+            continue
+        position = reference.find(chunk, cursor)
+        if position < 0:
+            position = reference.find(chunk)
+        if position >= 0:
+            starts[i], ends[i] = position, position + len(chunk)
+            cursor = position + 1
+    return starts, ends
+
+
+def overlapping_chunks(old_starts, old_ends, new_starts, new_ends, min_overlap=0.5):
+    """
+    이전 청크 구간마다 겹치는 새 청크 번호를 찾습니다.
+
+    반환값:
+    - list: 이전 청크별 새 청크 번호 배열 (원문 순서)
+    """
+    valid = np.flatnonzero(new_starts >= 0)
+    order = valid[np.argsort(new_starts[valid], kind='stable')]
+    sorted_starts, sorted_ends = new_starts[order], new_ends[order]
+    running_max_end = np.maximum.accumulate(sorted_ends) if len(order) else sorted_ends
+    # 끝 위치 누적 최댓값이 시작보다 큰 첫 후보 ~ 시작이 끝보다 작은 마지막 후보
+    lows = np.searchsorted(running_max_end, old_starts, side='right')
+    highs = np.searchsorted(sorted_starts, old_ends, side='left')
+    matches = []
+    for old_start, old_end, low, high in zip(old_starts, old_ends, lows, highs):
+        if old_start < 0 or low >= high:
+            matches.append(np.empty(0, dtype=np.int64))
+            continue
+        candidate_starts, candidate_ends = sorted_starts[low:high], sorted_ends[low:high]
+        overlap = np.minimum(candidate_ends, old_end) - np.maximum(candidate_starts, old_start)
+        shorter = np.minimum(candidate_ends - candidate_starts, old_end - old_start)
+        matches.append(order[low:high][overlap >= min_overlap * np.maximum(shorter, 1)])
+    return matches
+
+
+def _reference_texts(old_df, groups, source_dir):
+    """source별 정규화된 원문. source_dir에 파일이 없으면 이전 코퍼스 청크를 합쳐 복원합니다."""
+    references = {}
+    for group in dict.fromkeys(groups):
+        path = None
+        if source_dir and group is not None:
+            for candidate in (os.path.join(source_dir, group), os.path.join(source_dir, os.path.basename(group))):
+                if os.path.exists(candidate):
+                    path = candidate
+                    break
+        if path is not None:
+            with open(path, encoding='utf-8') as f:
+                references[group] = normalize_text(f.read())
+        else:
+            references[group] = merge_chunks(old_df.loc[groups == group, 'contents'].map(normalize_text).tolist())[0]
+    return references
+
+
+def build_doc_id_mapping(old_df, new_df, needed_ids=None, source_dir=None, min_overlap=0.5):
+    """
+    이전 doc_id → 겹치는 새 doc_id 리스트 딕셔너리를 만듭니다.
+
+    매개변수:
+    - old_df, new_df: 이전/새 코퍼스 (doc_id, contents, metadata)
+    - needed_ids: 매핑할 이전 doc_id (None이면 전체, 보통 retrieval_gt에 나온 id)
+    - source_dir: 원문 텍스트 디렉토리 (text 방식에서 사용, 선택)
+    - min_overlap: 짧은 쪽 청크 길이 대비 최소 겹침 비율
+
+    반환값:
+    - (매핑 딕셔너리, 사용한 방식 'offsets' 또는 'text')
+    """
+    old_sources, new_sources = chunk_sources(old_df), chunk_sources(new_df)
+    if old_sources is None or new_sources is None or not set(old_sources) & set(new_sources):
+        # source를 맞출 수 없으면 코퍼스 전체를 하나의 원문으로 봅니다.
+        old_sources = np.full(len(old_df), None, dtype=object)
+        new_sources = np.full(len(new_df), None, dtype=object)
+    old_offsets, new_offsets = chunk_offsets(old_df), chunk_offsets(new_df)
+    method = 'offsets' if old_offsets is not None and new_offsets is not None and old_sources[0] is not None else 'text'
+
+    if method == 'offsets':
+        old_starts, old_ends = old_offsets
+        new_starts, new_ends = new_offsets
+    else:
+        references = _reference_texts(old_df, old_sources, source_dir)
+        old_starts = np.full(len(old_df), -1, dtype=np.int64)
+        old_ends = old_starts.copy()
+        new_starts = np.full(len(new_df), -1, dtype=np.int64)
+        new_ends = new_starts.copy()
+        for group, reference in references.items():
+            old_rows = np.flatnonzero(old_sources == group)
+            new_rows = np.flatnonzero(new_sources == group)
+            old_starts[old_rows], old_ends[old_rows] = locate_chunks(
+                reference, old_df['contents'].iloc[old_rows].map(normalize_text).tolist())
+            new_starts[new_rows], new_ends[new_rows] = locate_chunks(
+                reference, new_df['contents'].iloc[new_rows].map(normalize_text).tolist())
+
+    old_ids = old_df['doc_id'].to_numpy()
+    new_ids = new_df['doc_id'].to_numpy()
+    wanted = np.ones(len(old_df), dtype=bool) if needed_ids is None else np.isin(old_ids, list(needed_ids))
+    mapping = {}
+    for group in dict.fromkeys(old_sources[wanted]):
+        old_rows = np.flatnonzero(wanted & (old_sources == group))
+        new_rows = np.flatnonzero(new_sources == group)
+        matches = overlapping_chunks(old_starts[old_rows], old_ends[old_rows], new_starts[new_rows],
+                                     new_ends[new_rows], min_overlap)
+        for old_row, match in zip(old_rows, matches):
+            mapping[old_ids[old_row]] = new_ids[new_rows[match]].tolist()
+    return mapping, method
+
+
+def remap_retrieval_gt(qa_df, mapping):
+    """
+    retrieval_gt의 이전 doc_id를 새 doc_id로 바꿉니다. 그룹 안의 후보들은 매핑 결과의 합집합이 되고,
+    매핑되지 않은 그룹은 빠집니다. 모든 그룹이 빠진 질문은 제외합니다.
+
+    반환값:
+    - (새 qa DataFrame, 제외된 qid 리스트)
+    """
+    remapped, dropped = [], []
+    for qid, groups in zip(qa_df['qid'], qa_df['retrieval_gt']):
+        new_groups = []
+        for group in groups:
+            new_ids = list(dict.fromkeys(new_id for old_id in group for new_id in mapping.get(old_id, [])))
+            if new_ids:
+                new_groups.append(new_ids)
+        remapped.append(new_groups)
+        if not new_groups:
+            dropped.append(qid)
+    qa_df = qa_df.assign(retrieval_gt=remapped)
+    return qa_df[~qa_df['qid'].isin(dropped)].reset_index(drop=True), dropped
+
+
+@click.command()
+@click.option('--qa_path', type=click.Path(exists=True, dir_okay=False), default=os.path.join('data', 'qa.parquet'))
+@click.option('--old_corpus_path', type=click.Path(exists=True, dir_okay=False),
+              default=os.path.join('data', 'corpus.parquet'))
+@click.option('--new_corpus_path', type=click.Path(exists=True, dir_okay=False),
+              default=os.path.join('data', 'corpus_new.parquet'))
+@click.option('--save_path', type=click.Path(dir_okay=False), default=os.path.join('data', 'qa_remapped.parquet'))
+@click.option('--source_dir', type=click.Path(exists=True, file_okay=False), default=None,
+              help='원문 텍스트 디렉토리 (없으면 이전 코퍼스 청크로 원문을 복원)')
+@click.option('--min_overlap', type=float, default=0.5, help='짧은 쪽 청크 길이 대비 최소 겹침 비율')
+def main(qa_path, old_corpus_path, new_corpus_path, save_path, source_dir, min_overlap):
+    qa_df = read_qa(qa_path)
+    old_df = read_corpus(old_corpus_path, columns=['doc_id', 'contents', 'metadata'])
+    new_df = read_corpus(new_corpus_path, columns=['doc_id', 'contents', 'metadata'])
+    needed_ids = {doc_id for groups in qa_df['retrieval_gt'] for group in groups for doc_id in group}
+    mapping, method = build_doc_id_mapping(old_df, new_df, needed_ids, source_dir, min_overlap)
+    remapped_df, dropped = remap_retrieval_gt(qa_df, mapping)
+    write_qa(remapped_df, save_path)
+    mapped = sum(1 for doc_id in needed_ids if mapping.get(doc_id))
+    fan_out = np.mean([len(mapping[doc_id]) for doc_id in needed_ids if mapping.get(doc_id)]) if mapped else 0.0
+    print(f"위치 방식: {method}, 정답 청크 {len(needed_ids)}개 중 {mapped}개 매핑 (평균 새 청크 {fan_out:.2f}개)")
+    print(f"질문 {len(qa_df)}개 중 {len(remapped_df)}개 저장, 제외 {len(dropped)}개 → {save_path}")
+
+
+if __name__ == '__main__':
+    main()
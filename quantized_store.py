@@ -0,0 +1,334 @@
+"""
+양자화된 memory-map 벡터 저장소
+
+config/tutorial_ko.yaml의 vectordb 모듈은 chromadb에 float32 OpenAI 임베딩(1536차원, 문서당 6KB)을 올리므로
+corpus가 커지면 메모리를 많이 쓰고 처음 읽는 데 오래 걸립니다. 이 모듈은 L2 정규화한 문서 임베딩을
+float16 또는 int8(벡터별 scale)로 양자화하여 memory-map 행렬로 저장하고, NumPy로 정확한(전수) top-k 검색을 합니다.
+- int8: 벡터마다 scale = max|x| / 127, x ≈ q * scale (float32 대비 1/4 크기)
+- float16: scale = 1 (1/2 크기)
+- 검색은 문서 블록 단위로 점수를 계산하며 블록별 후보를 합쳐 top-k를 유지하므로 메모리 사용량이 문서 수에 비례하지 않습니다.
+- rescore를 주면 양자화 점수 상위 rescore개 후보를 float32 원본(memory-map, 후보 행만 읽음)으로 다시 계산합니다.
+
+AutoRAG에는 외부 retrieval 모듈을 등록할 수 없으므로 Evaluator trial(main.py)의 vectordb를 대신하지는 않습니다.
+retrieval_sweep.py(--vector_store)와 serve.py(--vector_store)에서 vectordb 대신 사용할 수 있습니다.
+
+저장 구조 (store_root/<corpus 해시 앞 16자리>_<모델명>_<dtype>/)
+- meta.json: 차원, dtype, 문서 수, 모델명, corpus 해시
+- doc_ids.json: 문서 id 리스트 (행 순서)
+- vectors.npy: (문서 수, 차원) 양자화 행렬, scales.npy: (문서 수,) float32 scale
+- full.npy: (문서 수, 차원) 정규화된 float32 행렬 (rescore용, --no_full이면 만들지 않음)
+
+사용법
+    python quantized_store.py build --corpus_path data/corpus.parquet --dtype int8
+    python quantized_store.py bench --synthetic_docs 200000 --dim 256 --top_k 10 --rescore 50
+"""
+
+import json
+import os
+import re
+import shutil
+import time
+
+import click
+import numpy as np
+
+from lazy_import import lazy_module
+
+pd = lazy_module('pandas')
+
+DTYPES = ('float32', 'float16', 'int8')
+# 한 번에 점수를 계산하는 문서 행 수와 질의 수 (점수 블록은 최대 QUERY_BATCH × BLOCK_ROWS × 4바이트)
+BLOCK_ROWS = 65536
+QUERY_BATCH = 256
+
+
+def normalize_rows(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True).clip(min=1e-12)
+
+
+def quantize(vectors, dtype):
+    """
+    L2 정규화한 벡터를 양자화합니다.
+
+    반환값:
+    - (양자화 행렬, 벡터별 float32 scale)
+    """
+    vectors = normalize_rows(vectors)
+    if dtype == 'int8':
+        scales = np.abs(vectors).max(axis=1) / 127
+        scales[scales == 0] = 1.0
+        return np.rint(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+    if dtype in ('float16', 'float32'):
+        return vectors.astype(dtype), np.ones(len(vectors), dtype=np.float32)
+    raise ValueError(f"지원하지 않는 dtype입니다: {dtype} ({', '.join(DTYPES)})")
+
+
+def write_store(store_dir, doc_ids, vectors, dtype='int8', keep_full=True, **meta):
+    """
+    벡터를 양자화하여 저장합니다. 임시 디렉토리에 쓴 뒤 이름을 바꾸므로 중간에 중단되어도 반쯤 쓴 저장소가 남지 않습니다.
+
+    매개변수:
+    - store_dir: 저장할 디렉토리 (이미 있으면 덮어씁니다)
+    - doc_ids: 행 순서의 문서 id 리스트
+    - vectors: (문서 수, 차원) 벡터
+    - dtype: 'float32', 'float16', 'int8'
+    - keep_full: rescore용 float32 원본 저장 여부 (dtype이 float32면 만들지 않음)
+    - meta: meta.json에 함께 기록할 값
+    """
+    quantized, scales = quantize(vectors, dtype)
+    temp_dir = f"{store_dir}.tmp{os.getpid()}"
+    shutil.rmtree(temp_dir, ignore_errors=True)
+    os.makedirs(temp_dir)
+    np.save(os.path.join(temp_dir, 'vectors.npy'), quantized)
+    np.save(os.path.join(temp_dir, 'scales.npy'), scales)
+    if keep_full and dtype != 'float32':
+        np.save(os.path.join(temp_dir, 'full.npy'), normalize_rows(vectors))
+    with open(os.path.join(temp_dir, 'doc_ids.json'), 'w', encoding='utf-8') as f:
+        json.dump(list(doc_ids), f, ensure_ascii=False)
+    with open(os.path.join(temp_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump({'dim': int(quantized.shape[1]) if quantized.ndim == 2 else 0, 'dtype': dtype,
+                   'n_docs': len(doc_ids), **meta}, f, ensure_ascii=False)
+    shutil.rmtree(store_dir, ignore_errors=True)
+    os.replace(temp_dir, store_dir)
+    return store_dir
+
+
+class QuantizedStore:
+    """memory-map으로 읽는 양자화 벡터 저장소입니다."""
+
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+        with open(os.path.join(store_dir, 'meta.json'), 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+        with open(os.path.join(store_dir, 'doc_ids.json'), 'r', encoding='utf-8') as f:
+            self.doc_ids = json.load(f)
+        load = lambda name: np.load(os.path.join(store_dir, f'{name}.npy'), mmap_mode='r')
+        self.vectors = load('vectors')
+        self.scales = load('scales')
+        full_path = os.path.join(store_dir, 'full.npy')
+        if self.meta['dtype'] == 'float32':
+            self.full = self.vectors
+        else:
+            self.full = load('full') if os.path.exists(full_path) else None
+
+    @property
+    def n_docs(self):
+        return len(self.doc_ids)
+
+    @property
+    def nbytes(self):
+        """검색에 쓰는 양자화 행렬과 scale의 크기 (rescore용 원본 제외)"""
+        return self.vectors.nbytes + self.scales.nbytes
+
+    def _block_scores(self, queries, start, end):
+        block = np.asarray(self.vectors[start:end], dtype=np.float32)
+        scores = queries @ block.T
+        if self.meta['dtype'] == 'int8':
+            scores *= self.scales[start:end]
+        return scores
+
+    def score_matrix(self, queries):
+        """(질의 수, 문서 수) 근사 코사인 유사도 행렬 (retrieval_sweep, hybrid 융합용)"""
+        queries = normalize_rows(queries)
+        scores = np.empty((len(queries), self.n_docs), dtype=np.float32)
+        for start in range(0, self.n_docs, BLOCK_ROWS):
+            end = min(start + BLOCK_ROWS, self.n_docs)
+            scores[:, start:end] = self._block_scores(queries, start, end)
+        return scores
+
+    def _search_batch(self, queries, k):
+        rows = np.arange(len(queries))[:, None]
+        best_docs = np.empty((len(queries), 0), dtype=np.int64)
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        for start in range(0, self.n_docs, BLOCK_ROWS):
+            end = min(start + BLOCK_ROWS, self.n_docs)
+            block_scores = self._block_scores(queries, start, end)
+            if end - start > k:
+                top = np.argpartition(-block_scores, k - 1, axis=1)[:, :k]
+                block_scores = block_scores[rows, top]
+            else:
+                top = np.broadcast_to(np.arange(end - start), block_scores.shape)
+            best_docs = np.concatenate([best_docs, top + start], axis=1)
+            best_scores = np.concatenate([best_scores, block_scores], axis=1)
+            if best_docs.shape[1] > k:
+                keep = np.argpartition(-best_scores, k - 1, axis=1)[:, :k]
+                best_docs, best_scores = best_docs[rows, keep], best_scores[rows, keep]
+        return best_docs, best_scores
+
+    def search(self, queries, top_k=10, rescore=0):
+        """
+        질의 배치의 정확한(전수) top-k 검색입니다.
+
+        매개변수:
+        - queries: (질의 수, 차원) 질의 벡터
+        - top_k: 돌려줄 문서 수
+        - rescore: 양자화 점수 상위 후보 수. top_k보다 크면 이 후보들을 float32 원본으로 다시 계산합니다.
+
+        반환값:
+        - (문서 번호 행렬, 점수 행렬): (질의 수, top_k), 점수 내림차순
+        """
+        queries = normalize_rows(queries)
+        top_k = min(top_k, self.n_docs)
+        candidates = min(max(top_k, rescore or 0), self.n_docs)
+        if candidates > top_k and self.full is None:
+            raise ValueError(f"{self.store_dir}에 rescore용 float32 원본(full.npy)이 없습니다.")
+        all_docs, all_scores = [], []
+        for q_start in range(0, len(queries), QUERY_BATCH):
+            batch = queries[q_start:q_start + QUERY_BATCH]
+            docs, scores = self._search_batch(batch, candidates)
+            if candidates > top_k:
+                # 후보 행만 원본에서 읽어 다시 계산합니다.
+                unique_docs, inverse = np.unique(docs, return_inverse=True)
+                exact = np.asarray(self.full[unique_docs], dtype=np.float32)
+                scores = np.einsum('qd,qkd->qk', batch, exact[inverse.reshape(docs.shape)])
+            order = np.argsort(-scores, axis=1, kind='stable')[:, :top_k]
+            all_docs.append(np.take_along_axis(docs, order, axis=1))
+            all_scores.append(np.take_along_axis(scores, order, axis=1))
+        if not all_docs:
+            return np.empty((0, top_k), dtype=np.int64), np.empty((0, top_k), dtype=np.float32)
+        return np.concatenate(all_docs), np.concatenate(all_scores)
+
+
+def _store_name(key, model_name, dtype):
+    return f"{key[:16]}_{re.sub(r'[^0-9A-Za-z.-]+', '-', model_name)}_{dtype}"
+
+
+def build_store(corpus_df, store_root, embedding_model='openai', embedding_cache_dir='embedding_cache',
+                dtype='int8', keep_full=True):
+    """
+    corpus의 양자화 벡터 저장소를 찾거나 만듭니다. 문서 임베딩은 embedding_store 캐시를 거쳐 계산합니다.
+
+    반환값:
+    - str: 저장소 디렉토리 경로
+    """
+    from bm25_index import content_hashes, corpus_hash
+    from embedding_store import EmbeddingStore
+    from retrieval_sweep import embedding_functions
+
+    doc_ids = corpus_df['doc_id'].tolist()
+    contents = corpus_df['contents'].tolist()
+    key = corpus_hash(doc_ids, content_hashes(contents))
+    model_name, embed_texts, _ = embedding_functions(embedding_model)
+    store_dir = os.path.join(store_root, _store_name(key, model_name, dtype))
+    has_full = dtype == 'float32' or os.path.exists(os.path.join(store_dir, 'full.npy'))
+    if os.path.exists(os.path.join(store_dir, 'meta.json')) and (has_full or not keep_full):
+        print(f"기존 양자화 벡터 저장소를 사용합니다: {store_dir}")
+        return store_dir
+    vectors = EmbeddingStore(embedding_cache_dir).get_or_compute(contents, embed_texts, model_name, kind='text')
+    os.makedirs(store_root, exist_ok=True)
+    write_store(store_dir, doc_ids, vectors, dtype, keep_full, model_name=model_name, corpus_hash=key)
+    print(f"양자화 벡터 저장소 ({dtype}, 문서 {len(doc_ids)}개): {store_dir}")
+    return store_dir
+
+
+def quantized_score_matrix(queries, corpus_df, embedding_model, embedding_cache_dir, store_root, dtype):
+    """retrieval_sweep.dense_score_matrix의 양자화 저장소 버전입니다. 질의 임베딩도 캐시를 거칩니다."""
+    from embedding_store import EmbeddingStore
+    from retrieval_sweep import embedding_functions
+
+    store = QuantizedStore(build_store(corpus_df, store_root, embedding_model, embedding_cache_dir, dtype,
+                                       keep_full=False))
+    model_name, _, embed_queries = embedding_functions(embedding_model)
+    query_vectors = EmbeddingStore(embedding_cache_dir).get_or_compute(list(queries), embed_queries, model_name,
+                                                                       kind='query')
+    return store.score_matrix(query_vectors)
+
+
+def synthetic_vectors(n_docs, dim, n_queries, seed=0, clusters=256):
+    """군집이 있는 가우시안 문서 벡터와, 문서 벡터에 잡음을 더한 질의 벡터 (벤치마크용)"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    docs = centers[rng.integers(clusters, size=n_docs)] + 0.7 * rng.standard_normal((n_docs, dim)).astype(np.float32)
+    queries = docs[rng.integers(n_docs, size=n_queries)] + 0.5 * rng.standard_normal((n_queries, dim)).astype(np.float32)
+    return docs, queries
+
+
+def benchmark(doc_vectors, query_vectors, work_dir, top_k=10, rescore=50):
+    """
+    dtype과 rescore 조합별로 저장소 크기, 여는 시간, 검색 시간, float32 정확 검색 대비 recall@k를 측정합니다.
+
+    반환값:
+    - DataFrame: dtype, rescore, store_mb, memory_ratio, open_ms, search_ms_per_query, recall 열
+    """
+    doc_ids = [str(i) for i in range(len(doc_vectors))]
+    exact_docs = None
+    rows = []
+    for dtype in DTYPES:
+        store_dir = write_store(os.path.join(work_dir, dtype), doc_ids, doc_vectors, dtype, keep_full=True)
+        for candidates in ([0] if dtype == 'float32' else [0, rescore]):
+            start = time.perf_counter()
+            store = QuantizedStore(store_dir)
+            open_ms = (time.perf_counter() - start) * 1000
+            start = time.perf_counter()
+            docs, _ = store.search(query_vectors, top_k, rescore=candidates)
+            search_seconds = time.perf_counter() - start
+            if exact_docs is None:
+                exact_docs = docs
+            hits = [len(set(found) & set(expected)) for found, expected in zip(docs, exact_docs)]
+            rows.append({'dtype': dtype, 'rescore': candidates, 'store_mb': store.nbytes / 1e6,
+                         'open_ms': open_ms, 'search_ms_per_query': search_seconds * 1000 / len(query_vectors),
+                         f'recall@{top_k}': float(np.mean(hits)) / docs.shape[1]})
+    result = pd.DataFrame(rows)
+    result.insert(3, 'memory_ratio', result['store_mb'] / result.loc[0, 'store_mb'])
+    return result
+
+
+@click.group()
+def cli():
+    pass
+
+
+@cli.command()
+@click.option('--corpus_path', type=click.Path(exists=True, dir_okay=False), default='data/corpus.parquet')
+@click.option('--store_root', type=click.Path(file_okay=False), default='quantized_store')
+@click.option('--embedding_model', type=click.Choice(['openai', 'fake']), default='openai')
+@click.option('--embedding_cache_dir', type=click.Path(file_okay=False), default='embedding_cache')
+@click.option('--dtype', type=click.Choice(DTYPES), default='int8')
+@click.option('--no_full', is_flag=True, default=False, help='rescore용 float32 원본을 저장하지 않습니다.')
+def build(corpus_path, store_root, embedding_model, embedding_cache_dir, dtype, no_full):
+    from corpus_io import read_corpus
+
+    corpus_df = read_corpus(corpus_path, columns=['doc_id', 'contents'])
+    store = QuantizedStore(build_store(corpus_df, store_root, embedding_model, embedding_cache_dir, dtype,
+                                       keep_full=not no_full))
+    print(f"문서 {store.n_docs}개, 차원 {store.meta['dim']}, 검색 행렬 {store.nbytes / 1e6:.1f}MB "
+          f"(float32 대비 {store.nbytes / max(store.n_docs * store.meta['dim'] * 4, 1):.2f})")
+
+
+@cli.command()
+@click.option('--synthetic_docs', type=int, default=0, help='가우시안 합성 벡터 문서 수 (0이면 corpus/qa 사용)')
+@click.option('--dim', type=int, default=256, help='합성 벡터 차원')
+@click.option('--queries', 'n_queries', type=int, default=200, help='합성 질의 수')
+@click.option('--corpus_path', type=click.Path(dir_okay=False), default='data/corpus.parquet')
+@click.option('--qa_path', type=click.Path(dir_okay=False), default='data/qa.parquet')
+@click.option('--embedding_model', type=click.Choice(['openai', 'fake']), default='fake')
+@click.option('--embedding_cache_dir', type=click.Path(file_okay=False), default='embedding_cache')
+@click.option('--top_k', type=int, default=10)
+@click.option('--rescore', type=int, default=50, help='rescore 후보 수')
+@click.option('--work_dir', type=click.Path(file_okay=False), default=os.path.join('quantized_store', 'bench'))
+def bench(synthetic_docs, dim, n_queries, corpus_path, qa_path, embedding_model, embedding_cache_dir, top_k,
+          rescore, work_dir):
+    """recall@k와 메모리/검색 시간을 dtype별로 비교합니다."""
+    if synthetic_docs:
+        doc_vectors, query_vectors = synthetic_vectors(synthetic_docs, dim, n_queries)
+    else:
+        from corpus_io import read_corpus, read_qa
+        from embedding_store import EmbeddingStore
+        from retrieval_sweep import embedding_functions
+
+        model_name, embed_texts, embed_queries = embedding_functions(embedding_model)
+        embedding_store = EmbeddingStore(embedding_cache_dir)
+        doc_vectors = embedding_store.get_or_compute(
+            read_corpus(corpus_path, columns=['contents'])['contents'].tolist(), embed_texts, model_name, kind='text')
+        query_vectors = embedding_store.get_or_compute(
+            read_qa(qa_path, columns=['query'])['query'].tolist(), embed_queries, model_name, kind='query')
+    os.makedirs(work_dir, exist_ok=True)
+    result = benchmark(doc_vectors, query_vectors, work_dir, top_k, rescore)
+    print(f"문서 {len(doc_vectors)}개 × {doc_vectors.shape[1]}차원, 질의 {len(query_vectors)}개, "
+          f"float32 전수 검색 기준 recall@{top_k}")
+    print(result.to_string(index=False, float_format='{:.4f}'.format))
+
+
+if __name__ == '__main__':
+    cli()
@@ -0,0 +1,270 @@
+"""
+생성(generator) 응답 캐시
+
+config/tutorial_ko.yaml의 generator 노드는 prompt_maker의 프롬프트마다 openai_llm을 호출합니다.
+같은 (프롬프트, 모델, 생성 파라미터) 요청은 trial이 바뀌어도, QA에 중복 질문이 있어도 매번 다시 전송됩니다.
+이 모듈은 정규화한 프롬프트 해시와 생성 파라미터를 키로 응답을 SQLite에 저장하여,
+지표만 바꿔 평가를 다시 돌릴 때 생성 호출이 발생하지 않도록 합니다.
+
+temperature 정책 (temperature가 max_cached_temperature보다 높은 요청):
+- bypass: 캐시하지 않고 항상 API를 호출합니다.
+- reuse: 낮은 temperature와 똑같이 하나의 응답을 재사용합니다.
+- samples: 키마다 n_samples개의 응답을 따로 저장하고, 한 실행 안에서 같은 요청이 반복되면
+  0, 1, 2 ... 번째 샘플을 차례로 돌려줍니다 (분포는 유지하면서 재실행은 재현 가능).
+
+저장소 관리: ttl_days가 지난 응답은 사용하지 않고 지우며, 저장할 때마다 항목 수/전체 크기를 확인해 한도를 넘으면
+가장 오래 사용되지 않은 응답부터 지웁니다. 항목 수와 크기는 트리거가 usage 테이블에 유지하므로 확인 비용은 행 하나를 읽는 정도입니다.
+같은 키의 요청이 동시에 진행 중이면 하나만 API로 보냅니다.
+
+사용법
+    python response_cache.py --cache_path response_cache.sqlite   # 통계 출력
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+
+import click
+
+TEMPERATURE_POLICIES = ('bypass', 'reuse', 'samples')
+# 응답 내용에 영향을 주지 않는 요청 인자
+IGNORED_PARAMS = {'messages', 'model', 'timeout', 'extra_headers', 'extra_query', 'extra_body', 'user', 'stream_options'}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    model TEXT,
+    response TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access);
+CREATE TABLE IF NOT EXISTS usage (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    entries INTEGER NOT NULL,
+    bytes INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO usage SELECT 0, COUNT(*), COALESCE(SUM(size), 0) FROM responses;
+CREATE TRIGGER IF NOT EXISTS responses_insert AFTER INSERT ON responses BEGIN
+    UPDATE usage SET entries = entries + 1, bytes = bytes + NEW.size WHERE id = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS responses_delete AFTER DELETE ON responses BEGIN
+    UPDATE usage SET entries = entries - 1, bytes = bytes - OLD.size WHERE id = 0;
+END;
+"""
+
+
+def normalize_messages(messages):
+    """메시지 내용의 연속 공백을 하나로 줄이고 앞뒤 공백을 제거합니다."""
+    normalized = []
+    for message in messages:
+        content = message.get('content')
+        if isinstance(content, str):
+            content = re.sub(r'\s+', ' ', content).strip()
+        normalized.append({'role': message.get('role'), 'content': content})
+    return normalized
+
+
+class ResponseCache:
+    """
+    SQLite 기반 chat completion 응답 캐시입니다. 프로세스마다 연결을 따로 열므로
+    main.py --grid의 워커들이 같은 파일을 함께 사용할 수 있습니다.
+    """
+
+    def __init__(self, path, ttl_days=30.0, max_entries=200_000, max_mb=1024.0, max_cached_temperature=0.2,
+                 temperature_policy='bypass', n_samples=3):
+        if temperature_policy not in TEMPERATURE_POLICIES:
+            raise ValueError(f"temperature_policy는 {TEMPERATURE_POLICIES} 중 하나여야 합니다: {temperature_policy}")
+        self.path = path
+        self.ttl = ttl_days * 86400 if ttl_days else None
+        self.max_entries = max_entries
+        self.max_bytes = int(max_mb * 1e6) if max_mb else None
+        self.max_cached_temperature = max_cached_temperature
+        self.temperature_policy = temperature_policy
+        self.n_samples = n_samples
+        self._init_state()
+
+    def _init_state(self):
+        self._conn = None
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._occurrences = Counter()
+        self._puts = 0
+        self.stats = Counter()
+
+    def __getstate__(self):
+        # 프로세스 풀로 넘길 때는 설정만 전달하고 연결과 진행 중 요청은 새로 만듭니다.
+        return {key: value for key, value in self.__dict__.items()
+                if key not in {'_conn', '_lock', '_inflight', '_occurrences', '_puts', 'stats'}}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._init_state()
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            # INSERT OR REPLACE로 지워지는 행에도 삭제 트리거가 실행되어야 usage가 맞습니다.
+            self._conn.execute('PRAGMA recursive_triggers=ON')
+            self._conn.executescript(_SCHEMA)
+        return self._conn
+
+    def request_key(self, kwargs):
+        """
+        create() 인자로 캐시 키를 만듭니다.
+
+        반환값:
+        - str: 캐시 키, 캐시하지 않는 요청(stream, bypass 정책의 높은 temperature)은 None
+        """
+        if kwargs.get('stream'):
+            return None
+        params = {key: value for key, value in kwargs.items() if key not in IGNORED_PARAMS}
+        temperature = float(params.get('temperature', 1.0))
+        params['temperature'] = round(temperature, 3)
+        sample = None
+        if temperature > self.max_cached_temperature:
+            if self.temperature_policy == 'bypass':
+                return None
+            if self.temperature_policy == 'samples':
+                sample = -1  # 아래에서 실행 내 반복 순번으로 바꿉니다.
+        payload = json.dumps({'model': kwargs.get('model'), 'messages': normalize_messages(kwargs.get('messages', [])),
+                              'params': params}, sort_keys=True, ensure_ascii=False, default=str)
+        key = hashlib.sha256(payload.encode('utf-8')).hexdigest()
+        if sample is not None:
+            with self._lock:
+                sample = self._occurrences[key] % self.n_samples
+                self._occurrences[key] += 1
+            key = f"{key}:{sample}"
+        return key
+
+    def get(self, key):
+        """저장된 응답 JSON 문자열 (없거나 만료되었으면 None)"""
+        now = time.time()
+        with self._lock:
+            row = self.conn.execute('SELECT response, created FROM responses WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            if self.ttl is not None and now - row[1] > self.ttl:
+                self.conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+                return None
+            self.conn.execute('UPDATE responses SET last_access = ? WHERE key = ?', (now, key))
+        return row[0]
+
+    def put(self, key, model, response_json):
+        now = time.time()
+        with self._lock:
+            self.conn.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)',
+                              (key, model, response_json, len(response_json.encode('utf-8')), now, now))
+            self._puts += 1
+            # 만료된 응답은 get에서 쓰지 않으므로 100번 저장할 때마다 한 번만 지웁니다.
+            if self.ttl is not None and self._puts % 100 == 1:
+                self.conn.execute('DELETE FROM responses WHERE created < ?', (now - self.ttl,))
+            self._evict()
+
+    def _usage(self):
+        return self.conn.execute('SELECT entries, bytes FROM usage WHERE id = 0').fetchone()
+
+    def _evict(self):
+        """항목 수/크기 한도를 넘으면 오래 사용되지 않은 것부터 지웁니다."""
+        count, total = self._usage()
+        while count:
+            excess = max(count - self.max_entries, 0) if self.max_entries else 0
+            if self.max_bytes and total > self.max_bytes:
+                # 평균 크기로 지울 개수를 어림하고, 목표의 90%까지 줄여 매번 지우지 않게 합니다.
+                average = total / count
+                excess = max(excess, int((total - 0.9 * self.max_bytes) / average) + 1)
+            if not excess:
+                break
+            self.conn.execute('DELETE FROM responses WHERE key IN '
+                              '(SELECT key FROM responses ORDER BY last_access LIMIT ?)', (excess,))
+            self.stats['evicted'] += excess
+            count, total = self._usage()
+
+    def call(self, kwargs, fetch, serialize, deserialize):
+        """
+        동기 create 호출을 캐시를 거쳐 실행합니다.
+
+        매개변수:
+        - kwargs: create() 인자
+        - fetch: 캐시에 없을 때 API를 호출하는 함수
+        - serialize, deserialize: 응답 객체 <-> JSON 문자열 변환 함수
+        """
+        key = self.request_key(kwargs)
+        if key is None:
+            self.stats['bypassed'] += 1
+            return fetch()
+        cached = self.get(key)
+        if cached is not None:
+            self.stats['hits'] += 1
+            return deserialize(cached)
+        self.stats['misses'] += 1
+        response = fetch()
+        self.put(key, kwargs.get('model'), serialize(response))
+        return response
+
+    async def acall(self, kwargs, fetch, serialize, deserialize):
+        """비동기 create 호출용 call입니다. 같은 키의 요청이 진행 중이면 그 결과를 함께 기다립니다."""
+        key = self.request_key(kwargs)
+        if key is None:
+            self.stats['bypassed'] += 1
+            return await fetch()
+        cached = self.get(key)
+        if cached is not None:
+            self.stats['hits'] += 1
+            return deserialize(cached)
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.stats['deduplicated'] += 1
+            return deserialize(await asyncio.shield(inflight))
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        self.stats['misses'] += 1
+        try:
+            response = await fetch()
+            response_json = serialize(response)
+            self.put(key, kwargs.get('model'), response_json)
+            future.set_result(response_json)
+            return response
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # 기다리는 요청이 없어도 경고가 나지 않도록 예외를 확인 처리합니다.
+            raise
+        finally:
+            del self._inflight[key]
+
+    def summary(self):
+        """저장소 전체 통계와 현재 프로세스의 적중 통계"""
+        count, total = self._usage()
+        return {'entries': count, 'mb': total / 1e6, **self.stats}
+
+
+def print_cache_stats(cache):
+    summary = cache.summary()
+    print(f"응답 캐시: {summary['entries']}개 ({summary['mb']:.1f}MB), 적중 {summary.get('hits', 0)} / "
+          f"미적중 {summary.get('misses', 0)} / 중복 제거 {summary.get('deduplicated', 0)} / "
+          f"캐시 제외 {summary.get('bypassed', 0)}")
+
+
+@click.command()
+@click.option('--cache_path', type=click.Path(exists=True, dir_okay=False), default='response_cache.sqlite')
+@click.option('--clear', is_flag=True, default=False, help='저장된 응답을 모두 지웁니다.')
+def main(cache_path, clear):
+    cache = ResponseCache(cache_path)
+    if clear:
+        cache.conn.execute('DELETE FROM responses')
+        cache.conn.execute('VACUUM')
+    print_cache_stats(cache)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,271 @@
+"""
+로컬 retrieval 평가 스윕
+
+main.py로 retrieval 설정(top_k, hybrid_cc의 normalize mm/tmm와 가중치, hybrid_rrf)을 바꿔 볼 때마다
+AutoRAG Evaluator trial 전체를 돌리는 대신, qa/corpus를 한 번 읽고
+BM25(bm25_index)와 dense(embedding_store) 점수 행렬을 미리 계산한 뒤
+모든 조합의 retrieval_f1, retrieval_recall, retrieval_precision, retrieval_ndcg, retrieval_map을
+NumPy 벡터 연산으로 계산합니다.
+
+지표 정의는 AutoRAG의 retrieval 지표와 같습니다 (retrieval_gt는 '하나라도 맞으면 되는 id 묶음'의 리스트).
+hybrid 모듈은 기본적으로 corpus 전체 점수를 융합합니다. AutoRAG처럼 각 retriever의 상위 후보만
+융합하려면 --pool로 후보 수를 지정합니다.
+--vector_store float16/int8을 주면 dense 점수를 quantized_store.py의 양자화 저장소로 계산하여
+양자화가 지표에 주는 영향을 확인할 수 있습니다.
+
+사용법
+    python retrieval_sweep.py --qa_data_path data/qa.parquet --corpus_data_path data/corpus.parquet \\
+        --embedding_model fake --top_k 1,3,5,10 --weights 0.0,0.1,0.3,0.5,0.7,0.9,1.0
+"""
+
+import itertools
+import os
+import time
+
+import click
+import numpy as np
+import pandas as pd
+
+from bm25_index import BM25Index, build_index
+from embedding_store import EmbeddingStore
+from fake_backends import fake_embeddings
+
+METRICS = ['retrieval_f1', 'retrieval_recall', 'retrieval_precision', 'retrieval_ndcg', 'retrieval_map']
+# tmm 정규화에서 사용하는 각 점수의 이론적 최솟값 (BM25: 0, 코사인 유사도: -1)
+THEORETICAL_MIN = {'bm25': 0.0, 'vectordb': -1.0}
+
+
+class GroundTruth:
+    """
+    retrieval_gt를 corpus 문서 번호 기준의 불리언 행렬로 바꿔 둡니다.
+    - relevant: (질의 수, 문서 수) 정답 문서 여부
+    - group_relevant: (정답 묶음 수, 문서 수) 묶음별 정답 여부, group_query: 묶음이 속한 질의 번호
+    """
+
+    def __init__(self, retrieval_gt, doc_ids):
+        position = {doc_id: i for i, doc_id in enumerate(doc_ids)}
+        n_queries, n_docs = len(retrieval_gt), len(doc_ids)
+        self.relevant = np.zeros((n_queries, n_docs), dtype=bool)
+        groups, group_query = [], []
+        self.n_relevant = np.zeros(n_queries, dtype=np.int64)
+        for q, gt in enumerate(retrieval_gt):
+            gt = [list(group) for group in gt]
+            flat = {doc_id for group in gt for doc_id in group}
+            self.n_relevant[q] = len(flat)
+            self.relevant[q, [position[d] for d in flat if d in position]] = True
+            for group in gt:
+                groups.append([position[d] for d in group if d in position])
+                group_query.append(q)
+        self.group_query = np.asarray(group_query, dtype=np.int64)
+        self.group_relevant = np.zeros((len(groups), n_docs), dtype=bool)
+        for g, members in enumerate(groups):
+            self.group_relevant[g, members] = True
+        self.n_groups = np.bincount(self.group_query, minlength=n_queries)
+
+
+def rank_top(scores, k):
+    """(질의 수, 문서 수) 점수 행렬에서 질의별 상위 k개 문서 번호를 점수 내림차순으로 돌려줍니다."""
+    k = min(k, scores.shape[1])
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1, kind='stable')
+    return np.take_along_axis(top, order, axis=1)
+
+
+def evaluate_ranking(ranking, gt, top_ks):
+    """
+    상위 문서 순위 행렬로 top_k별 지표 평균을 계산합니다.
+
+    매개변수:
+    - ranking: (질의 수, max(top_ks)) 문서 번호 행렬
+    - gt: GroundTruth
+    - top_ks: 평가할 top_k 리스트
+
+    반환값:
+    - dict: {top_k: {지표 이름: 평균값}}
+    """
+    rows = np.arange(ranking.shape[0])[:, None]
+    hits_all = gt.relevant[rows, ranking]
+    group_hits_all = gt.group_relevant[np.arange(len(gt.group_query))[:, None], ranking[gt.group_query]]
+    results = {}
+    for k in top_ks:
+        hits, group_hits = hits_all[:, :k], group_hits_all[:, :k]
+        precision = hits.sum(axis=1) / k
+        found = np.bincount(gt.group_query, weights=group_hits.any(axis=1), minlength=len(hits))
+        recall = np.divide(found, gt.n_groups, out=np.zeros(len(hits)), where=gt.n_groups > 0)
+        f1 = np.divide(2 * precision * recall, precision + recall, out=np.zeros(len(hits)),
+                       where=(precision + recall) > 0)
+
+        discounts = 1.0 / np.log2(np.arange(k) + 2)
+        dcg = (hits * discounts).sum(axis=1)
+        ideal = np.concatenate([[0.0], np.cumsum(discounts)])[np.minimum(gt.n_relevant, k)]
+        ndcg = np.divide(dcg, ideal, out=np.zeros(len(hits)), where=ideal > 0)
+
+        precision_at = np.cumsum(group_hits, axis=1) / np.arange(1, k + 1)
+        n_group_hits = group_hits.sum(axis=1)
+        ap = np.divide((precision_at * group_hits).sum(axis=1), n_group_hits,
+                       out=np.zeros(len(n_group_hits)), where=n_group_hits > 0)
+        mean_ap = np.divide(np.bincount(gt.group_query, weights=ap, minlength=len(hits)), gt.n_groups,
+                            out=np.zeros(len(hits)), where=gt.n_groups > 0)
+        results[k] = {'retrieval_f1': f1.mean(), 'retrieval_recall': recall.mean(),
+                      'retrieval_precision': precision.mean(), 'retrieval_ndcg': ndcg.mean(),
+                      'retrieval_map': mean_ap.mean()}
+    return results
+
+
+def candidate_mask(score_matrices, pool):
+    """각 retriever의 상위 pool개 후보의 합집합 (pool이 None이면 전체 문서)"""
+    if pool is None:
+        return None
+    mask = np.zeros(score_matrices[0].shape, dtype=bool)
+    rows = np.arange(mask.shape[0])[:, None]
+    for scores in score_matrices:
+        mask[rows, rank_top(scores, pool)] = True
+    return mask
+
+
+def normalize(scores, method, theoretical_min, mask=None):
+    """hybrid_cc의 점수 정규화 (mm: 최솟값-최댓값, tmm: 이론적 최솟값-최댓값)"""
+    masked = scores if mask is None else np.where(mask, scores, np.nan)
+    high = np.nanmax(masked, axis=1, keepdims=True)
+    low = np.nanmin(masked, axis=1, keepdims=True) if method == 'mm' else np.full_like(high, theoretical_min)
+    span = np.where(high - low > 0, high - low, 1.0)
+    return (scores - low) / span
+
+
+def reciprocal_ranks(scores, rrf_k, mask=None):
+    """hybrid_rrf의 1 / (rrf_k + 순위) 행렬. 후보가 아닌 문서는 0입니다."""
+    masked = scores if mask is None else np.where(mask, scores, -np.inf)
+    ranks = np.empty(scores.shape, dtype=np.float64)
+    order = np.argsort(-masked, axis=1, kind='stable')
+    np.put_along_axis(ranks, order, np.arange(1, scores.shape[1] + 1, dtype=np.float64)[None, :], axis=1)
+    rrf = 1.0 / (rrf_k + ranks)
+    return rrf if mask is None else np.where(mask, rrf, 0.0)
+
+
+def sweep(bm25_scores, dense_scores, gt, top_ks, weights=(0.5,), normalize_methods=('mm', 'tmm'),
+          rrf_ks=(60,), pool=None):
+    """
+    retrieval 설정 그리드 전체를 평가합니다.
+
+    매개변수:
+    - bm25_scores, dense_scores: (질의 수, 문서 수) 점수 행렬
+    - gt: GroundTruth
+    - top_ks: top_k 리스트
+    - weights: hybrid_cc의 dense 가중치 리스트 (점수 = w * dense + (1 - w) * bm25)
+    - normalize_methods: hybrid_cc 정규화 방법 리스트
+    - rrf_ks: hybrid_rrf의 rrf_k 리스트
+    - pool: hybrid 융합에 사용할 retriever별 후보 수 (None이면 전체 문서)
+
+    반환값:
+    - DataFrame: module_type, module_params, top_k, 지표 열
+    """
+    max_k = max(top_ks)
+    rows = []
+
+    def add(module_type, params, fused):
+        for k, metrics in evaluate_ranking(rank_top(fused, max_k), gt, top_ks).items():
+            rows.append({'module_type': module_type, 'module_params': params, 'top_k': k, **metrics})
+
+    add('bm25', {}, bm25_scores)
+    add('vectordb', {}, dense_scores)
+    mask = candidate_mask([bm25_scores, dense_scores], pool)
+    excluded = None if mask is None else ~mask
+    for rrf_k in rrf_ks:
+        fused = reciprocal_ranks(bm25_scores, rrf_k, mask) + reciprocal_ranks(dense_scores, rrf_k, mask)
+        add('hybrid_rrf', {'rrf_k': rrf_k}, fused if excluded is None else np.where(excluded, -np.inf, fused))
+    for method in normalize_methods:
+        bm25_norm = normalize(bm25_scores, method, THEORETICAL_MIN['bm25'], mask)
+        dense_norm = normalize(dense_scores, method, THEORETICAL_MIN['vectordb'], mask)
+        for weight in weights:
+            fused = weight * dense_norm + (1 - weight) * bm25_norm
+            add('hybrid_cc', {'normalize_method': method, 'weight': weight},
+                fused if excluded is None else np.where(excluded, -np.inf, fused))
+    result = pd.DataFrame(rows)
+    result['mean'] = result[['retrieval_f1', 'retrieval_ndcg', 'retrieval_map']].mean(axis=1)
+    return result.sort_values(['top_k', 'mean'], ascending=[True, False], ignore_index=True)
+
+
+def embedding_functions(embedding_model):
+    """
+    임베딩 모델 이름('openai' 또는 'fake')으로 (캐시 키용 모델명, 문서 임베딩 함수, 질의 임베딩 함수)를 돌려줍니다.
+    두 함수 모두 텍스트 리스트를 받아 벡터 리스트를 돌려줍니다.
+    """
+    if embedding_model == 'fake':
+        return 'fake', fake_embeddings, fake_embeddings
+    from llama_index.embeddings.openai import OpenAIEmbedding
+
+    model = OpenAIEmbedding()
+    return (model.model_name, model.get_text_embedding_batch,
+            lambda texts: [model.get_query_embedding(text) for text in texts])
+
+
+def dense_score_matrix(queries, contents, embedding_model, store_dir):
+    """
+    질의와 문서의 임베딩 코사인 유사도 행렬을 계산합니다.
+    임베딩은 EmbeddingStore에 캐시되며, main.py의 임베딩 캐시와 같은 키(모델명, text/query)를 사용합니다.
+    """
+    model_name, embed_texts, embed_queries = embedding_functions(embedding_model)
+    store = EmbeddingStore(store_dir)
+    doc_vectors = store.get_or_compute(list(contents), embed_texts, model_name, kind='text')
+    query_vectors = store.get_or_compute(list(queries), embed_queries, model_name, kind='query')
+    doc_vectors /= np.linalg.norm(doc_vectors, axis=1, keepdims=True).clip(min=1e-12)
+    query_vectors /= np.linalg.norm(query_vectors, axis=1, keepdims=True).clip(min=1e-12)
+    return query_vectors @ doc_vectors.T
+
+
+def _parse_list(value, cast):
+    return [cast(item) for item in value.split(',') if item.strip()]
+
+
+@click.command()
+@click.option('--qa_data_path', type=click.Path(exists=True, dir_okay=False), default='data/qa.parquet')
+@click.option('--corpus_data_path', type=click.Path(exists=True, dir_okay=False), default='data/corpus.parquet')
+@click.option('--embedding_model', type=click.Choice(['openai', 'fake']), default='openai')
+@click.option('--embedding_cache_dir', type=click.Path(file_okay=False), default='embedding_cache')
+@click.option('--bm25_index_root', type=click.Path(file_okay=False), default='bm25_index')
+@click.option('--top_k', 'top_k', default='1,3,5,10', help='쉼표로 구분한 top_k 목록')
+@click.option('--weights', default='0.0,0.1,0.2,0.3,0.4,0.5,0.6,0.7,0.8,0.9,1.0',
+              help='hybrid_cc의 dense 가중치 목록')
+@click.option('--normalize_method', default='mm,tmm', help='hybrid_cc 정규화 방법 목록')
+@click.option('--rrf_k', default='60', help='hybrid_rrf의 rrf_k 목록')
+@click.option('--pool', type=int, default=None, help='hybrid 융합 후보 수 (기본값: 전체 문서)')
+@click.option('--vector_store', type=click.Choice(['float32', 'float16', 'int8']), default=None,
+              help='dense 점수를 quantized_store의 양자화 저장소로 계산합니다 (기본값: float32 메모리 행렬)')
+@click.option('--vector_store_root', type=click.Path(file_okay=False), default='quantized_store')
+@click.option('--output', type=click.Path(dir_okay=False), default=None, help='결과 CSV 저장 경로')
+@click.option('--show', type=int, default=10, help='top_k별로 출력할 상위 설정 수')
+def main(qa_data_path, corpus_data_path, embedding_model, embedding_cache_dir, bm25_index_root, top_k, weights,
+         normalize_method, rrf_k, pool, vector_store, vector_store_root, output, show):
+    qa_df = pd.read_parquet(qa_data_path)
+    corpus_df = pd.read_parquet(corpus_data_path)
+    queries = qa_df['query'].tolist()
+
+    start = time.perf_counter()
+    bm25_scores = BM25Index(build_index(corpus_df, bm25_index_root)).score_matrix(queries)
+    print(f"BM25 점수 행렬 {bm25_scores.shape}: {time.perf_counter() - start:.1f}초")
+    start = time.perf_counter()
+    if vector_store is None:
+        dense_scores = dense_score_matrix(queries, corpus_df['contents'], embedding_model, embedding_cache_dir)
+    else:
+        from quantized_store import quantized_score_matrix
+        dense_scores = quantized_score_matrix(queries, corpus_df, embedding_model, embedding_cache_dir,
+                                              vector_store_root, vector_store)
+    print(f"dense 점수 행렬 {dense_scores.shape} ({vector_store or 'float32'}): {time.perf_counter() - start:.1f}초")
+
+    start = time.perf_counter()
+    gt = GroundTruth(qa_df['retrieval_gt'].tolist(), corpus_df['doc_id'].tolist())
+    result = sweep(bm25_scores, dense_scores, gt, _parse_list(top_k, int), _parse_list(weights, float),
+                   _parse_list(normalize_method, str), _parse_list(rrf_k, float), pool)
+    print(f"설정 {len(result)}개 평가: {time.perf_counter() - start:.2f}초")
+
+    for k, group in result.groupby('top_k'):
+        print(f"\n[top_k={k}]")
+        print(group.head(show).drop(columns='top_k').to_string(index=False, float_format='{:.4f}'.format))
+    if output:
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        result.assign(module_params=result['module_params'].astype(str)).to_csv(output, index=False)
+        print(f"결과를 {output}에 저장했습니다.")
+
+
+if __name__ == '__main__':
+    main()
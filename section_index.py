@@ -0,0 +1,276 @@
+"""
+계층형 섹션 색인 (관 → 조 → 항 → 호 → 목)
+
+페이지별 텍스트 [(페이지 번호, 텍스트)]를 한 번 훑어서 약관/사업방법서의 구조를 색인합니다.
+각 섹션 노드는 문서 텍스트(페이지 텍스트를 '\\n'으로 이은 것) 안의 [시작, 끝) 문자 오프셋과
+시작/끝 페이지, 부모 노드를 가지므로 페이지를 넘어 이어지는 조항도 하나의 구간으로 표현됩니다.
+
+노드는 문서별로 시작 오프셋 순서로 정렬된 배열에 저장되어,
+- locate: 문자 오프셋이 속한 가장 안쪽 섹션 (이분 탐색 O(log n))
+- parent: 상위 조/관으로 확장 (깊이는 최대 5)
+- neighbors: 같은 부모 아래 앞뒤 섹션 (O(1))
+을 문서를 다시 파싱하지 않고 찾을 수 있습니다.
+
+저장 형식: 코퍼스 옆의 '<코퍼스 이름>.sections.parquet'(노드)와 '<코퍼스 이름>.sections.docs.parquet'(문서 텍스트)
+"""
+
+import os
+import re
+from bisect import bisect_right
+
+import click
+import numpy as np
+import pandas as pd
+
+LEVELS = ('관', '조', '항', '호', '목')
+
+LEVEL_PATTERNS = (
+    # 관 (부표도 관과 같은 깊이로 취급합니다)
+    re.compile(r'(제\s*\d{1,2}\s*관|부표\s*\d+)(?=\s|$)'),
+    # 조: '제2조(보험금의 지급사유)', '제 12 조 ...', '제3조의2(...)'. '제3조에 따라' 같은 본문 인용은 제외합니다.
+    re.compile(r'(제\s*\d{1,3}\s*조(?:의\s*\d+)?)(?=[\s(（]|$)'),
+    # 항: ① ~ ⑳
+    re.compile(r'([①-⑳])'),
+    # 호: '1.' (사업방법서의 1단계 번호와 같습니다)
+    re.compile(r'(\d{1,2}\.)(?=\s)'),
+    # 목: '1.1.', '가.'
+    re.compile(r'(\d{1,2}\.\d{1,2}\.?|[가-하]\.)(?=\s)'),
+)
+
+NODE_COLUMNS = ['doc', 'level', 'label', 'title', 'start', 'end', 'start_page', 'end_page', 'parent']
+
+
+def match_level(line):
+    """
+    줄의 시작이 섹션 머리인지 판단합니다.
+
+    반환값:
+    - tuple: (깊이, 레이블) 또는 섹션 머리가 아니면 None
+    """
+    for level, pattern in enumerate(LEVEL_PATTERNS):
+        match = pattern.match(line)
+        if match:
+            return level, re.sub(r'\s+', '', match.group(1))
+    return None
+
+
+def parse_document(text_with_page_info):
+    """
+    한 문서의 페이지 텍스트를 한 번 훑어 섹션 노드를 만듭니다.
+
+    매개변수:
+    - text_with_page_info: (페이지 번호, 텍스트) 튜플 리스트
+
+    반환값:
+    - tuple: (문서 텍스트, 페이지 번호 리스트, 페이지 시작 오프셋 리스트, 노드 딕셔너리 리스트)
+      노드의 parent는 같은 문서 안에서의 노드 번호입니다 (-1은 최상위).
+    """
+    page_numbers, page_starts, parts = [], [], []
+    nodes, stack = [], []
+    offset = 0
+    for page_number, text in text_with_page_info:
+        page_numbers.append(page_number)
+        page_starts.append(offset)
+        for line in text.splitlines(keepends=True):
+            stripped = line.strip()
+            matched = match_level(stripped) if stripped else None
+            if matched:
+                level, label = matched
+                start = offset + len(line) - len(line.lstrip())
+                # 같거나 더 높은 깊이의 새 섹션이 시작되면 열려 있던 섹션들이 끝납니다.
+                while stack and nodes[stack[-1]]['level'] >= level:
+                    nodes[stack.pop()]['end'] = start
+                nodes.append({'level': level, 'label': label, 'title': stripped[:200],
+                              'start': start, 'end': None, 'parent': stack[-1] if stack else -1})
+                stack.append(len(nodes) - 1)
+            offset += len(line)
+        parts.append(text)
+        offset += 1  # 페이지 사이의 '\n'
+    document_text = '\n'.join(parts)
+    for node in nodes:
+        if node['end'] is None:
+            node['end'] = len(document_text)
+        node['start_page'] = page_numbers[bisect_right(page_starts, node['start']) - 1]
+        node['end_page'] = page_numbers[bisect_right(page_starts, max(node['end'] - 1, node['start'])) - 1]
+    return document_text, page_numbers, page_starts, nodes
+
+
+def section_index_paths(corpus_path):
+    """코퍼스 경로 옆의 (노드 파일, 문서 파일) 경로를 돌려줍니다."""
+    base = os.path.splitext(corpus_path)[0]
+    return base + '.sections.parquet', base + '.sections.docs.parquet'
+
+
+class SectionIndex:
+    """여러 문서의 섹션 노드를 정렬된 배열로 보관하는 색인입니다."""
+
+    def __init__(self, nodes_df, docs_df):
+        self.nodes = nodes_df.reset_index(drop=True)
+        self.docs = docs_df.set_index('doc')
+        self._starts = self.nodes['start'].to_numpy(np.int64)
+        self._ends = self.nodes['end'].to_numpy(np.int64)
+        self._levels = self.nodes['level'].to_numpy(np.int8)
+        self._parents = self.nodes['parent'].to_numpy(np.int64)
+        # 문서별 노드 구간 [lo, hi)
+        doc_codes = self.nodes['doc'].to_numpy()
+        self._doc_bounds = {}
+        if len(doc_codes):
+            boundaries = np.flatnonzero(doc_codes[1:] != doc_codes[:-1]) + 1
+            for lo, hi in zip(np.r_[0, boundaries], np.r_[boundaries, len(doc_codes)]):
+                self._doc_bounds[doc_codes[lo]] = (int(lo), int(hi))
+        # 형제 목록: (문서, 부모) → 자식 노드 번호 배열, 각 노드의 형제 내 위치
+        self._sibling_position = np.zeros(len(self.nodes), dtype=np.int64)
+        self._siblings = {}
+        for key, group in self.nodes.groupby(['doc', 'parent'], sort=False).indices.items():
+            group = np.sort(group)
+            self._siblings[key] = group
+            self._sibling_position[group] = np.arange(len(group))
+
+    @classmethod
+    def from_documents(cls, documents):
+        """
+        매개변수:
+        - documents: {문서 이름: [(페이지 번호, 텍스트), ...]}
+        """
+        node_rows, doc_rows = [], []
+        for doc, text_with_page_info in documents.items():
+            document_text, page_numbers, page_starts, nodes = parse_document(text_with_page_info)
+            base = len(node_rows)
+            for node in nodes:
+                node_rows.append({**node, 'doc': doc, 'parent': node['parent'] + base if node['parent'] >= 0 else -1})
+            doc_rows.append({'doc': doc, 'text': document_text,
+                             'page_numbers': page_numbers, 'page_starts': page_starts})
+        nodes_df = pd.DataFrame(node_rows, columns=NODE_COLUMNS).astype(
+            {'level': 'int8', 'start': 'int64', 'end': 'int64', 'start_page': 'int32', 'end_page': 'int32',
+             'parent': 'int64'})
+        docs_df = pd.DataFrame(doc_rows, columns=['doc', 'text', 'page_numbers', 'page_starts'])
+        return cls(nodes_df, docs_df)
+
+    def save(self, corpus_path):
+        """코퍼스 옆에 색인을 저장합니다."""
+        nodes_path, docs_path = section_index_paths(corpus_path)
+        self.nodes.to_parquet(nodes_path, index=False)
+        self.docs.reset_index().to_parquet(docs_path, index=False)
+        return nodes_path
+
+    @classmethod
+    def load(cls, corpus_path):
+        nodes_path, docs_path = section_index_paths(corpus_path)
+        return cls(pd.read_parquet(nodes_path), pd.read_parquet(docs_path))
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def _level_number(self, level):
+        return LEVELS.index(level) if isinstance(level, str) else level
+
+    def locate(self, doc, offset, level=None):
+        """
+        문서의 문자 오프셋을 포함하는 가장 안쪽 섹션 노드 번호를 찾습니다.
+
+        매개변수:
+        - doc: 문서 이름
+        - offset: 문서 텍스트 안의 문자 오프셋
+        - level: 지정하면 그 깊이('조' 등) 이상으로 확장한 노드를 돌려줍니다.
+
+        반환값:
+        - int: 노드 번호 또는 해당 섹션이 없으면 None
+        """
+        if doc not in self._doc_bounds:
+            return None
+        lo, hi = self._doc_bounds[doc]
+        node = lo + bisect_right(self._starts[lo:hi], offset) - 1
+        if node < lo:
+            return None
+        while node >= 0 and self._ends[node] <= offset:
+            node = int(self._parents[node])
+        if node < 0:
+            return None
+        return self.parent(node, level) if level is not None else int(node)
+
+    def parent(self, node, level=None):
+        """
+        상위 섹션 노드 번호를 돌려줍니다. level을 지정하면 그 깊이 이상이 될 때까지 올라갑니다
+        (예: 호에서 '조'로 확장). 노드 자체가 이미 그 깊이 이상이면 자신을 돌려줍니다.
+        """
+        if level is None:
+            parent = int(self._parents[node])
+            return parent if parent >= 0 else None
+        level = self._level_number(level)
+        while node >= 0 and self._levels[node] > level:
+            node = int(self._parents[node])
+        return int(node) if node >= 0 else None
+
+    def ancestors(self, node):
+        """최상위부터 노드 자신까지의 경로"""
+        path = []
+        while node >= 0:
+            path.append(int(node))
+            node = self._parents[node]
+        return path[::-1]
+
+    def children(self, node):
+        return self._siblings.get((self.nodes.at[node, 'doc'], node), np.empty(0, dtype=np.int64)).tolist()
+
+    def neighbors(self, node, k=1):
+        """같은 부모 아래에서 앞뒤 k개 섹션 (자신 포함)의 노드 번호"""
+        siblings = self._siblings[(self.nodes.at[node, 'doc'], int(self._parents[node]))]
+        position = self._sibling_position[node]
+        return siblings[max(position - k, 0):position + k + 1].tolist()
+
+    def text(self, node):
+        """섹션의 전체 텍스트"""
+        doc = self.nodes.at[node, 'doc']
+        return self.docs.at[doc, 'text'][self._starts[node]:self._ends[node]]
+
+    def page_of(self, doc, offset):
+        page_starts = self.docs.at[doc, 'page_starts']
+        return int(self.docs.at[doc, 'page_numbers'][bisect_right(page_starts, offset) - 1])
+
+    def describe(self, node):
+        """'제1관 > 제2조 > ②' 형식의 경로 문자열"""
+        return ' > '.join(self.nodes.at[i, 'label'] for i in self.ancestors(node))
+
+
+def build_from_page_store(store):
+    """PageStore의 모든 문서로 섹션 색인을 만듭니다."""
+    return SectionIndex.from_documents({name or doc: store.pages(doc) for doc, name in store.documents().items()})
+
+
+@click.group()
+def cli():
+    pass
+
+
+@cli.command()
+@click.option('--page_store_dir', type=click.Path(exists=True, file_okay=False), required=True)
+@click.option('--corpus_path', type=click.Path(dir_okay=False), required=True,
+              help='색인을 저장할 기준 코퍼스 경로 (같은 위치에 .sections.parquet로 저장)')
+def build(page_store_dir, corpus_path):
+    """페이지 저장소에서 섹션 색인을 만듭니다."""
+    from page_store import PageStore
+
+    index = build_from_page_store(PageStore(page_store_dir))
+    path = index.save(corpus_path)
+    counts = index.nodes['level'].value_counts().sort_index()
+    print(f"섹션 {len(index)}개 ({', '.join(f'{LEVELS[level]} {count}' for level, count in counts.items())}) → {path}")
+
+
+@cli.command()
+@click.option('--corpus_path', type=click.Path(dir_okay=False), required=True)
+@click.argument('doc')
+@click.argument('offset', type=int)
+@click.option('--level', type=click.Choice(LEVELS), default=None)
+def locate(corpus_path, doc, offset, level):
+    """문서의 문자 오프셋이 속한 섹션을 출력합니다."""
+    index = SectionIndex.load(corpus_path)
+    node = index.locate(doc, offset, level)
+    if node is None:
+        raise click.ClickException('해당 오프셋의 섹션이 없습니다.')
+    row = index.nodes.loc[node]
+    print(f"{index.describe(node)} (페이지 {row['start_page']}-{row['end_page']})")
+    print(index.text(node))
+
+
+if __name__ == '__main__':
+    cli()
@@ -0,0 +1,615 @@
+"""
+Evaluator가 고른 파이프라인 서빙
+
+main.py의 Evaluator.start_trial이 고른 best retrieval + prompt_maker + generator 설정을 project_dir의 trial에서 읽어
+비동기 HTTP API로 질의에 답합니다.
+- 시작할 때 corpus를 한 번 읽고 BM25 역색인(bm25_index)과 문서 임베딩 행렬(embedding_store 캐시)을 메모리에 올립니다.
+- 동시에 들어온 질의는 MicroBatcher가 모아 질의 임베딩과 점수 계산(BM25, 행렬 곱, hybrid 융합)을 한 번에 처리합니다.
+- generator 호출은 설정의 batch 값만큼 동시에 보냅니다.
+- corpus가 parent 레이아웃(make_corpus.py --layout parent)이면 검색된 자식 청크를 부모 조 전체로 확장하여
+  (parent_corpus.ParentLookup) 프롬프트를 만듭니다.
+- 단계별(retrieval, generation, total) 지연 시간의 p50/p99를 /stats로 확인하고, 종료할 때 출력합니다.
+
+API
+- POST /retrieve {"query": "..."} → {"query", "retrieved": [{"doc_id", "contents", "score"}], "latency_ms"}
+- POST /query {"query": "..."} → 위 내용 + {"prompt", "answer"}
+  (부모 확장을 사용하면 두 응답 모두 {"parents": [{"parent_id", "contents", "score"}]}를 포함합니다)
+- GET /stats, GET /health
+
+--fake를 주면 API 키 없이 fake_backends의 가짜 임베딩과 가짜 LLM으로 실행합니다.
+
+사용법
+    python serve.py serve --project_dir benchmark --port 8080
+    python serve.py serve --config config/tutorial_ko.yaml --corpus_data_path data/corpus.parquet --fake
+    python serve.py bench --url http://127.0.0.1:8080 --qa_data_path data/qa.parquet --concurrency 32
+"""
+
+import ast
+import asyncio
+import os
+import time
+from collections import deque
+
+import click
+
+from lazy_import import lazy_module
+
+np = lazy_module('numpy')
+pd = lazy_module('pandas')
+
+root_dir = os.path.dirname(os.path.realpath(__file__))
+
+PIPELINE_NODE_TYPES = ('retrieval', 'prompt_maker', 'generator')
+# summary.csv의 모듈 이름(AutoRAG 클래스 이름)과 설정의 module_type을 같은 이름으로 맞춥니다.
+MODULE_TYPES = {'bm25': 'bm25', 'vectordb': 'vectordb', 'hybridrrf': 'hybrid_rrf', 'hybridcc': 'hybrid_cc',
+                'fstring': 'fstring', 'openaillm': 'openai_llm'}
+LATENCY_WINDOW = 10000
+
+
+def module_type(name):
+    key = str(name).lower().replace('_', '')
+    if key not in MODULE_TYPES:
+        raise ValueError(f"서빙할 수 없는 모듈입니다: {name} (지원: {sorted(set(MODULE_TYPES.values()))})")
+    return MODULE_TYPES[key]
+
+
+def _parse_params(value):
+    if isinstance(value, dict):
+        return dict(value)
+    if not isinstance(value, str) or not value.strip():
+        return {}
+    return ast.literal_eval(value)
+
+
+def load_best_pipeline(project_dir, trial=None):
+    """
+    trial의 summary.csv에서 노드별 best 모듈과 파라미터를 읽습니다.
+
+    매개변수:
+    - project_dir: main.py의 project_dir
+    - trial: trial 이름 (None이면 trial.json의 마지막 trial)
+
+    반환값:
+    - dict: {노드 타입: {'module_type': ..., 파라미터...}}
+    """
+    from trial_cache import _read_trials
+
+    if trial is None:
+        trials = _read_trials(project_dir)
+        if not trials:
+            raise ValueError(f"{project_dir}에 trial이 없습니다. main.py로 먼저 평가를 실행하세요.")
+        trial = trials[-1]['trial_name']
+    summary_path = os.path.join(project_dir, str(trial), 'summary.csv')
+    if not os.path.exists(summary_path):
+        raise ValueError(f"trial {trial}의 summary.csv가 없습니다 (완료되지 않은 trial): {summary_path}")
+    summary = pd.read_csv(summary_path)
+    pipeline = {row.node_type: {'module_type': module_type(row.best_module_name),
+                                **_parse_params(row.best_module_params)}
+                for row in summary.itertuples() if row.node_type in PIPELINE_NODE_TYPES}
+    if 'retrieval' not in pipeline:
+        raise ValueError(f"trial {trial}에 retrieval 노드가 없습니다.")
+    return pipeline
+
+
+def pipeline_from_config(config):
+    """평가 없이 설정 파일의 노드별 첫 모듈과 리스트 값 파라미터의 첫 값으로 파이프라인을 만듭니다."""
+    pipeline = {}
+    for node_line in config['node_lines']:
+        for node in node_line['nodes']:
+            if node['node_type'] not in PIPELINE_NODE_TYPES:
+                continue
+            module = dict(node['modules'][0])
+            params = {key: value[0] if isinstance(value, list) else value for key, value in module.items()}
+            if 'top_k' in node:
+                params.setdefault('top_k', node['top_k'])
+            params['module_type'] = module_type(params['module_type'])
+            pipeline[node['node_type']] = params
+    return pipeline
+
+
+def _embedding_model(params):
+    """vectordb 또는 hybrid 모듈 파라미터에서 임베딩 모델 이름을 찾습니다."""
+    if 'embedding_model' in params:
+        return params['embedding_model']
+    for target_params in params.get('target_module_params') or ():
+        if isinstance(target_params, dict) and 'embedding_model' in target_params:
+            return target_params['embedding_model']
+    return 'openai'
+
+
+def _dense_weight(params):
+    """hybrid_cc의 dense 가중치 (weight 또는 target_modules 순서의 weights)"""
+    if 'weight' in params:
+        return float(params['weight'])
+    weights, targets = params.get('weights'), list(params.get('target_modules') or ())
+    if weights is not None and 'vectordb' in targets:
+        return float(weights[targets.index('vectordb')])
+    return 0.5
+
+
+class RetrievalEngine:
+    """
+    메모리에 올린 색인으로 질의 배치를 검색합니다.
+
+    매개변수:
+    - corpus_df: doc_id, contents 열의 corpus
+    - params: retrieval 노드의 best 모듈 파라미터 (module_type, top_k, ...)
+    - bm25_index_root: BM25 색인 디렉토리 (bm25, hybrid 모듈)
+    - embedding_cache_dir: 문서 임베딩 캐시 디렉토리 (vectordb, hybrid 모듈)
+    - embedding_model: 임베딩 모델 이름 (None이면 파라미터의 embedding_model)
+    - pool: hybrid 융합에 사용할 retriever별 후보 수 (None이면 전체 문서, retrieval_sweep과 같음)
+    - vector_store: None이면 float32 문서 임베딩 행렬을 메모리에 올리고, 'float16'/'int8'이면
+      quantized_store의 memory-map 양자화 저장소를 사용합니다.
+    - vector_store_root: 양자화 저장소 디렉토리
+    - rescore: vectordb 모듈에서 양자화 점수 상위 후보를 float32 원본으로 다시 계산할 후보 수 (0이면 하지 않음)
+    """
+
+    def __init__(self, corpus_df, params, bm25_index_root, embedding_cache_dir, embedding_model=None, pool=None,
+                 vector_store=None, vector_store_root='quantized_store', rescore=0):
+        from bm25_index import BM25Index, build_index
+        from embedding_store import EmbeddingStore
+        from retrieval_sweep import embedding_functions
+
+        self.module_type = params['module_type']
+        self.params = params
+        self.top_k = int(params.get('top_k', 3))
+        self.pool = pool
+        self.doc_ids = corpus_df['doc_id'].tolist()
+        self.contents = corpus_df['contents'].tolist()
+        self.bm25 = None
+        self.doc_vectors = None
+        self.vector_store = None
+        self.rescore = rescore
+        if self.module_type != 'vectordb':
+            self.bm25 = BM25Index(build_index(corpus_df[['doc_id', 'contents']], bm25_index_root))
+        if self.module_type != 'bm25' and vector_store is not None:
+            from quantized_store import QuantizedStore, build_store
+
+            embedding_model = embedding_model or _embedding_model(params)
+            _, _, self.embed_queries = embedding_functions(embedding_model)
+            self.vector_store = QuantizedStore(build_store(corpus_df, vector_store_root, embedding_model,
+                                                           embedding_cache_dir, vector_store, keep_full=rescore > 0))
+        elif self.module_type != 'bm25':
+            model_name, embed_texts, self.embed_queries = embedding_functions(
+                embedding_model or _embedding_model(params))
+            vectors = EmbeddingStore(embedding_cache_dir).get_or_compute(self.contents, embed_texts, model_name,
+                                                                         kind='text')
+            vectors /= np.linalg.norm(vectors, axis=1, keepdims=True).clip(min=1e-12)
+            self.doc_vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+
+    def dense_scores(self, queries):
+        if self.vector_store is not None:
+            return self.vector_store.score_matrix(self.embed_queries(queries))
+        vectors = np.asarray(self.embed_queries(queries), dtype=np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True).clip(min=1e-12)
+        return vectors @ self.doc_vectors.T
+
+    def scores(self, queries):
+        """질의 배치의 (질의 수, 문서 수) 최종 점수 행렬"""
+        from retrieval_sweep import THEORETICAL_MIN, candidate_mask, normalize, reciprocal_ranks
+
+        if self.module_type == 'bm25':
+            return self.bm25.score_matrix(queries)
+        if self.module_type == 'vectordb':
+            return self.dense_scores(queries)
+        bm25_scores = self.bm25.score_matrix(queries).astype(np.float64)
+        dense_scores = self.dense_scores(queries).astype(np.float64)
+        mask = candidate_mask([bm25_scores, dense_scores], self.pool)
+        if self.module_type == 'hybrid_rrf':
+            rrf_k = float(self.params.get('rrf_k', 60))
+            fused = reciprocal_ranks(bm25_scores, rrf_k, mask) + reciprocal_ranks(dense_scores, rrf_k, mask)
+        else:
+            method = self.params.get('normalize_method', 'mm')
+            weight = _dense_weight(self.params)
+            fused = (weight * normalize(dense_scores, method, THEORETICAL_MIN['vectordb'], mask)
+                     + (1 - weight) * normalize(bm25_scores, method, THEORETICAL_MIN['bm25'], mask))
+        return fused if mask is None else np.where(mask, fused, -np.inf)
+
+    def retrieve(self, queries):
+        """
+        질의 배치를 검색합니다.
+
+        반환값:
+        - list: 질의별 [{'doc_id', 'contents', 'score'}] (점수 내림차순 top_k개)
+        """
+        from retrieval_sweep import rank_top
+
+        if self.module_type == 'vectordb' and self.vector_store is not None:
+            # 전체 점수 행렬 없이 블록 단위 top-k 검색 (필요하면 후보를 float32로 다시 계산)
+            ranking, top_scores = self.vector_store.search(self.embed_queries(queries), self.top_k, self.rescore)
+        else:
+            scores = self.scores(queries)
+            ranking = rank_top(scores, self.top_k)
+            top_scores = np.take_along_axis(scores, ranking, axis=1)
+        return [[{'doc_id': self.doc_ids[d], 'contents': self.contents[d], 'score': float(score)}
+                 for d, score in zip(row, row_scores)] for row, row_scores in zip(ranking, top_scores)]
+
+
+def make_prompt(params, query, contents):
+    """prompt_maker 노드 설정으로 프롬프트를 만듭니다 (AutoRAG fstring과 같이 단락을 빈 줄로 잇습니다)."""
+    if params is None:
+        return None
+    if params['module_type'] != 'fstring':
+        raise ValueError(f"서빙할 수 없는 prompt_maker 모듈입니다: {params['module_type']}")
+    return params['prompt'].format(query=query, retrieved_contents='\n\n'.join(contents))
+
+
+class Generator:
+    """
+    generator 노드 설정(openai_llm)으로 답변을 만듭니다. 설정의 batch 값만큼 동시에 요청합니다.
+
+    매개변수:
+    - params: generator 노드의 best 모듈 파라미터 (llm, temperature, max_tokens, batch, ...)
+    - fake: True면 fake_backends.fake_answer로 답합니다.
+    """
+
+    REQUEST_PARAMS = ('temperature', 'max_tokens', 'top_p', 'frequency_penalty', 'presence_penalty')
+
+    def __init__(self, params, fake=False):
+        self.model = params.get('llm', 'gpt-3.5-turbo')
+        self.request_params = {key: params[key] for key in self.REQUEST_PARAMS if key in params}
+        self.fake = fake
+        self.semaphore = asyncio.Semaphore(int(params.get('batch', 16)))
+        self._client = None
+
+    async def generate(self, prompt):
+        if self.fake:
+            from fake_backends import fake_answer
+            return fake_answer(prompt)
+        if self._client is None:
+            from openai import AsyncOpenAI
+            self._client = AsyncOpenAI()
+        async with self.semaphore:
+            response = await self._client.chat.completions.create(
+                model=self.model, messages=[{'role': 'user', 'content': prompt}], **self.request_params)
+        return response.choices[0].message.content
+
+
+class MicroBatcher:
+    """
+    동시에 들어온 요청을 모아 process_batch(항목 리스트) → 결과 리스트를 한 번에 호출합니다.
+    첫 요청 후 max_wait_ms까지 또는 max_batch개가 모일 때까지 기다리며, 배치를 처리하는 동안 들어온 요청은 다음 배치가 됩니다.
+    process_batch는 이벤트 루프를 막지 않도록 별도 스레드에서 실행합니다.
+    """
+
+    def __init__(self, process_batch, max_batch=32, max_wait_ms=2.0):
+        self.process_batch = process_batch
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.batch_sizes = deque(maxlen=LATENCY_WINDOW)
+        self._queue = None
+        self._task = None
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def submit(self, item):
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future))
+        return await future
+
+    async def _collect(self):
+        batch = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            self.batch_sizes.append(len(batch))
+            try:
+                results = await loop.run_in_executor(None, self.process_batch, [item for item, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+
+class LatencyStats:
+    """단계별 최근 지연 시간(초)을 모아 p50/p99를 계산합니다."""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.window = window
+        self.samples = {}
+        self.counts = {}
+
+    def add(self, stage, seconds):
+        self.samples.setdefault(stage, deque(maxlen=self.window)).append(seconds)
+        self.counts[stage] = self.counts.get(stage, 0) + 1
+
+    def summary(self):
+        result = {}
+        for stage, samples in self.samples.items():
+            values = np.asarray(samples) * 1000
+            result[stage] = {'count': self.counts[stage], 'mean_ms': float(values.mean()),
+                             'p50_ms': float(np.percentile(values, 50)), 'p99_ms': float(np.percentile(values, 99))}
+        return result
+
+
+def print_latency_summary(summary, batch_sizes=None):
+    for stage, stats in summary.items():
+        print(f"{stage}: {stats['count']}건, 평균 {stats['mean_ms']:.1f}ms, "
+              f"p50 {stats['p50_ms']:.1f}ms, p99 {stats['p99_ms']:.1f}ms")
+    if batch_sizes:
+        print(f"retrieval 배치: {len(batch_sizes)}개, 평균 크기 {np.mean(batch_sizes):.1f}, 최대 {max(batch_sizes)}")
+
+
+class QueryService:
+    """
+    retrieval 배치 처리, 프롬프트 생성, 답변 생성을 묶은 서비스입니다.
+    parent_lookup(parent_corpus.ParentLookup)을 주면 검색된 자식 청크를 배치 단위로 부모 텍스트로 확장하여 프롬프트에 넣습니다.
+    """
+
+    def __init__(self, engine, prompt_params=None, generator=None, max_batch=32, max_wait_ms=2.0, parent_lookup=None):
+        self.engine = engine
+        self.prompt_params = prompt_params
+        self.generator = generator
+        self.parent_lookup = parent_lookup
+        self.batcher = MicroBatcher(self._retrieve_batch, max_batch, max_wait_ms)
+        self.latency = LatencyStats()
+
+    def _retrieve_batch(self, queries):
+        """질의 배치의 (검색 결과, 부모 확장 결과 또는 None) 리스트"""
+        retrieved = self.engine.retrieve(queries)
+        if self.parent_lookup is None:
+            return [(docs, None) for docs in retrieved]
+        ids, contents, scores = self.parent_lookup.expand([[doc['doc_id'] for doc in docs] for docs in retrieved],
+                                                          [[doc['score'] for doc in docs] for docs in retrieved])
+        parents = [[{'parent_id': parent_id, 'contents': text, 'score': score}
+                    for parent_id, text, score in zip(*row)] for row in zip(ids, contents, scores)]
+        return list(zip(retrieved, parents))
+
+    async def retrieve(self, query):
+        """
+        반환값:
+        - (검색된 문서 리스트, 부모 리스트 (부모 확장을 사용하지 않으면 None)) 튜플
+        """
+        start = time.perf_counter()
+        retrieved, parents = await self.batcher.submit(query)
+        self.latency.add('retrieval', time.perf_counter() - start)
+        return retrieved, parents
+
+    async def answer(self, query, generate=True):
+        """
+        질의 하나에 답합니다.
+
+        반환값:
+        - dict: query, retrieved, (부모 확장을 사용하면) parents, (generate=True면) prompt, answer, latency_ms
+        """
+        start = time.perf_counter()
+        retrieved, parents = await self.retrieve(query)
+        retrieval_seconds = time.perf_counter() - start
+        result = {'query': query, 'retrieved': retrieved}
+        if parents is not None:
+            result['parents'] = parents
+        latency = {'retrieval': retrieval_seconds * 1000}
+        if generate and self.prompt_params is not None:
+            contexts = parents if parents is not None else retrieved
+            prompt = make_prompt(self.prompt_params, query, [doc['contents'] for doc in contexts])
+            result['prompt'] = prompt
+            if self.generator is not None:
+                generation_start = time.perf_counter()
+                result['answer'] = await self.generator.generate(prompt)
+                generation_seconds = time.perf_counter() - generation_start
+                self.latency.add('generation', generation_seconds)
+                latency['generation'] = generation_seconds * 1000
+        total_seconds = time.perf_counter() - start
+        self.latency.add('total', total_seconds)
+        latency['total'] = total_seconds * 1000
+        result['latency_ms'] = latency
+        return result
+
+    def stats(self):
+        sizes = list(self.batcher.batch_sizes)
+        return {'latency': self.latency.summary(),
+                'batches': {'count': len(sizes), 'mean_size': float(np.mean(sizes)) if sizes else 0.0,
+                            'max_size': max(sizes) if sizes else 0}}
+
+
+def create_app(service):
+    """QueryService를 감싼 aiohttp 앱을 만듭니다."""
+    from aiohttp import web
+
+    async def read_query(request):
+        try:
+            body = await request.json()
+        except ValueError:
+            raise web.HTTPBadRequest(text='{"error": "요청 body는 JSON이어야 합니다."}', content_type='application/json')
+        query = body.get('query') if isinstance(body, dict) else None
+        if not isinstance(query, str) or not query.strip():
+            raise web.HTTPBadRequest(text='{"error": "query 문자열이 필요합니다."}', content_type='application/json')
+        return query
+
+    async def handle_query(request):
+        return web.json_response(await service.answer(await read_query(request)))
+
+    async def handle_retrieve(request):
+        return web.json_response(await service.answer(await read_query(request), generate=False))
+
+    async def handle_stats(request):
+        return web.json_response(service.stats())
+
+    async def handle_health(request):
+        return web.json_response({'status': 'ok', 'documents': len(service.engine.doc_ids),
+                                  'retrieval': service.engine.module_type})
+
+    async def on_startup(app):
+        service.batcher.start()
+
+    async def on_cleanup(app):
+        await service.batcher.stop()
+        print_latency_summary(service.latency.summary(), list(service.batcher.batch_sizes))
+
+    app = web.Application()
+    app.add_routes([web.post('/query', handle_query), web.post('/retrieve', handle_retrieve),
+                    web.get('/stats', handle_stats), web.get('/health', handle_health)])
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    return app
+
+
+def build_service(pipeline, corpus_df, bm25_index_root, embedding_cache_dir, fake=False, pool=None,
+                  max_batch=32, max_wait_ms=2.0, vector_store=None, vector_store_root='quantized_store', rescore=0,
+                  parent_lookup=None):
+    """
+    파이프라인 설정과 corpus로 QueryService를 만듭니다. 색인과 문서 임베딩은 여기서 한 번 준비합니다.
+    parent_lookup을 주면 검색된 자식 청크를 부모로 확장하여 프롬프트를 만듭니다.
+    """
+    engine = RetrievalEngine(corpus_df, pipeline['retrieval'], bm25_index_root, embedding_cache_dir,
+                             embedding_model='fake' if fake else None, pool=pool, vector_store=vector_store,
+                             vector_store_root=vector_store_root, rescore=rescore)
+    # 형태소 분석기 초기화 등 첫 질의에서만 드는 비용을 시작할 때 치릅니다.
+    engine.retrieve(['워밍업 질의'])
+    generator_params = pipeline.get('generator')
+    if generator_params is not None and generator_params['module_type'] != 'openai_llm':
+        raise ValueError(f"서빙할 수 없는 generator 모듈입니다: {generator_params['module_type']}")
+    generator = None if generator_params is None else Generator(generator_params, fake=fake)
+    return QueryService(engine, pipeline.get('prompt_maker'), generator, max_batch, max_wait_ms, parent_lookup)
+
+
+@click.group()
+def cli():
+    pass
+
+
+@cli.command()
+@click.option('--project_dir', type=click.Path(file_okay=False), default=os.path.join(root_dir, 'benchmark'))
+@click.option('--trial', default=None, help='서빙할 trial 이름 (기본값: 마지막 trial)')
+@click.option('--config', type=click.Path(exists=True, dir_okay=False), default=None,
+              help='trial 대신 설정 파일의 노드별 첫 모듈로 서빙합니다.')
+@click.option('--corpus_data_path', type=click.Path(exists=True, dir_okay=False), default=None,
+              help='corpus 경로 (기본값: project_dir/data/corpus.parquet)')
+@click.option('--host', default='127.0.0.1')
+@click.option('--port', type=int, default=8080)
+@click.option('--max_batch', type=int, default=32, help='retrieval 배치 최대 질의 수')
+@click.option('--max_wait_ms', type=float, default=2.0, help='배치를 모으기 위해 기다리는 최대 시간 (ms)')
+@click.option('--pool', type=int, default=None, help='hybrid 융합 후보 수 (기본값: 전체 문서)')
+@click.option('--embedding_cache_dir', type=click.Path(file_okay=False), default=os.path.join(root_dir, 'embedding_cache'))
+@click.option('--bm25_index_root', type=click.Path(file_okay=False), default=os.path.join(root_dir, 'bm25_index'))
+@click.option('--vector_store', type=click.Choice(['float16', 'int8']), default=None,
+              help='문서 임베딩을 양자화 memory-map 저장소(quantized_store.py)로 검색합니다.')
+@click.option('--vector_store_root', type=click.Path(file_okay=False), default=os.path.join(root_dir, 'quantized_store'))
+@click.option('--rescore', type=int, default=0, help='--vector_store에서 float32로 다시 계산할 후보 수 (vectordb 모듈)')
+@click.option('--response_cache_path', type=click.Path(dir_okay=False), default=None,
+              help='generator 응답 캐시 파일 (response_cache.py, 기본값: 사용하지 않음)')
+@click.option('--expand_parents/--no_expand_parents', default=None,
+              help='검색된 자식 청크를 부모 조로 확장합니다 (기본값: corpus 옆에 .parents.parquet이 있으면 확장)')
+@click.option('--fake', is_flag=True, default=False, help='가짜 임베딩과 가짜 LLM을 사용합니다 (API 키 불필요).')
+def serve(project_dir, trial, config, corpus_data_path, host, port, max_batch, max_wait_ms, pool,
+          embedding_cache_dir, bm25_index_root, vector_store, vector_store_root, rescore, response_cache_path,
+          expand_parents, fake):
+    """best 파이프라인을 HTTP API로 서빙합니다."""
+    from aiohttp import web
+
+    from corpus_io import read_corpus
+
+    if config is not None:
+        import yaml
+        with open(config, 'r', encoding='utf-8') as f:
+            pipeline = pipeline_from_config(yaml.safe_load(f))
+    else:
+        pipeline = load_best_pipeline(project_dir, trial)
+    corpus_data_path = corpus_data_path or os.path.join(project_dir, 'data', 'corpus.parquet')
+    if not fake:
+        from dotenv import load_dotenv
+        load_dotenv()
+    if response_cache_path and not fake:
+        from openai_hooks import install_openai_hooks
+        from response_cache import ResponseCache
+        install_openai_hooks(response_cache=ResponseCache(response_cache_path))
+
+    start = time.perf_counter()
+    corpus_df = read_corpus(corpus_data_path, columns=['doc_id', 'contents'])
+    parent_lookup = None
+    if expand_parents is None:
+        from parent_corpus import parents_path
+        expand_parents = os.path.exists(parents_path(corpus_data_path))
+    if expand_parents:
+        from parent_corpus import ParentLookup
+        parent_lookup = ParentLookup.load(corpus_data_path)
+        print(f"부모 확장: 부모 {len(parent_lookup.parent_ids)}개")
+    service = build_service(pipeline, corpus_df, bm25_index_root, embedding_cache_dir, fake=fake, pool=pool,
+                            max_batch=max_batch, max_wait_ms=max_wait_ms, vector_store=vector_store,
+                            vector_store_root=vector_store_root, rescore=rescore, parent_lookup=parent_lookup)
+    for node_type, params in pipeline.items():
+        print(f"{node_type}: {params['module_type']} "
+              f"{ {key: value for key, value in params.items() if key not in ('module_type', 'prompt')} }")
+    print(f"문서 {len(corpus_df)}개 색인 준비: {time.perf_counter() - start:.1f}초")
+    web.run_app(create_app(service), host=host, port=port)
+
+
+async def _bench(url, queries, endpoint, concurrency, requests):
+    import aiohttp
+
+    latencies, errors = [], 0
+    counter = iter(range(requests))
+
+    async def worker(session):
+        nonlocal errors
+        for i in counter:
+            start = time.perf_counter()
+            async with session.post(f"{url}/{endpoint}", json={'query': queries[i % len(queries)]}) as response:
+                await response.read()
+                if response.status != 200:
+                    errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    async with aiohttp.ClientSession() as session:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(session) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+        async with session.get(f"{url}/stats") as response:
+            server_stats = await response.json()
+    return latencies, errors, elapsed, server_stats
+
+
+@cli.command()
+@click.option('--url', default='http://127.0.0.1:8080')
+@click.option('--qa_data_path', type=click.Path(exists=True, dir_okay=False), default=os.path.join(root_dir, 'data', 'qa.parquet'))
+@click.option('--endpoint', type=click.Choice(['query', 'retrieve']), default='query')
+@click.option('--concurrency', type=int, default=16, help='동시 요청 수')
+@click.option('--requests', type=int, default=200, help='전체 요청 수')
+def bench(url, qa_data_path, endpoint, concurrency, requests):
+    """qa의 질의로 동시 요청을 보내 클라이언트/서버 지연 시간을 출력합니다."""
+    from corpus_io import read_qa
+
+    queries = read_qa(qa_data_path, columns=['query'])['query'].tolist()
+    latencies, errors, elapsed, server_stats = asyncio.run(
+        _bench(url.rstrip('/'), queries, endpoint, concurrency, requests))
+    values = np.asarray(latencies) * 1000
+    print(f"요청 {len(latencies)}개 (실패 {errors}개), 동시 {concurrency}개: {len(latencies) / elapsed:.1f} req/s, "
+          f"p50 {np.percentile(values, 50):.1f}ms, p99 {np.percentile(values, 99):.1f}ms")
+    print("서버:")
+    batches = server_stats['batches']
+    print_latency_summary(server_stats['latency'])
+    print(f"retrieval 배치: {batches['count']}개, 평균 크기 {batches['mean_size']:.1f}, 최대 {batches['max_size']}")
+
+
+if __name__ == '__main__':
+    cli()
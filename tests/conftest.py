@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 저장소 최상단의 스크립트 모듈(import_budget, serve 등)을 테스트에서 불러올 수 있게 합니다.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
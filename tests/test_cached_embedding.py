@@ -0,0 +1,25 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('llama_index.core')
+
+from cached_embedding import CachedEmbedding, FakeEmbedding  # noqa: E402
+from embedding_store import EmbeddingStore  # noqa: E402
+
+TEXTS = ['미성년자가 맺은 계약은 취소할 수 있습니다.', '보험금의 지급사유', '계약 전 알릴 의무']
+
+
+def test_second_pass_reads_from_store(tmp_path):
+    store = EmbeddingStore(str(tmp_path / 'embedding_cache'))
+    embedding = CachedEmbedding(FakeEmbedding(), store)
+
+    first = embedding.get_text_embedding_batch(TEXTS)
+    first_query = embedding.get_query_embedding(TEXTS[0])
+    assert store.misses == len(TEXTS) + 1 and store.hits == 0
+
+    second = embedding.get_text_embedding_batch(TEXTS)
+    second_query = embedding.get_query_embedding(TEXTS[0])
+    assert store.misses == len(TEXTS) + 1 and store.hits == len(TEXTS) + 1
+    np.testing.assert_array_equal(np.asarray(first, dtype=np.float32), np.asarray(second, dtype=np.float32))
+    np.testing.assert_array_equal(np.asarray(first_query, dtype=np.float32),
+                                  np.asarray(second_query, dtype=np.float32))
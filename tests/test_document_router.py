@@ -0,0 +1,23 @@
+import pandas as pd
+
+from document_router import MANIFEST_NAME, route_document, route_documents
+
+DOCUMENT_CLASSES = {
+    'business_method_document': ['방법서', '사업 내용'],
+    'product_summary': ['요약', '상품 설명'],
+}
+
+
+def test_routes_use_the_given_document_classes(tmp_path):
+    pd.DataFrame({'file_name': ['a.pdf', 'b.pdf', 'c.pdf', 'c.pdf'],
+                  'url_column': ['요약서', '방법서', '요약서', '방법서']}).to_parquet(tmp_path / MANIFEST_NAME)
+    file_names = ['a.pdf', 'b.pdf', 'c.pdf', '상품요약서_d.pdf', '판매약관_e.pdf', 'f.pdf']
+
+    routes = route_documents(str(tmp_path), file_names, DOCUMENT_CLASSES)
+    assert routes['document_type'].tolist() == ['요약', '방법서', None, '요약', None, None]
+    assert routes['routed_by'].tolist() == ['manifest', 'manifest', None, 'filename', None, None]
+
+    assert route_document(str(tmp_path / 'b.pdf'), DOCUMENT_CLASSES) == ('방법서', 'manifest')
+    assert route_document(str(tmp_path / '판매약관_e.pdf'), DOCUMENT_CLASSES) == (None, None)
+    terms = {**DOCUMENT_CLASSES, 'terms_and_conditions': ['약관']}
+    assert route_document(str(tmp_path / '판매약관_e.pdf'), terms) == ('약관', 'filename')
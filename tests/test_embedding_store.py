@@ -0,0 +1,59 @@
+import os
+
+import numpy as np
+
+from embedding_store import KEY_SIZE, EmbeddingStore, text_key
+from fake_backends import fake_embeddings
+
+TEXTS = ['미성년자가 맺은 계약은 취소할 수 있습니다.', '보험금의 지급사유', '계약 전 알릴 의무']
+
+
+def not_expected(texts):
+    raise AssertionError(f'저장소에 있어야 할 텍스트를 다시 임베딩했습니다: {texts}')
+
+
+def test_round_trip(tmp_path):
+    store = EmbeddingStore(str(tmp_path))
+    first = store.get_or_compute(TEXTS, fake_embeddings, 'model-a')
+    assert (store.hits, store.misses) == (0, len(TEXTS))
+
+    reopened = EmbeddingStore(str(tmp_path))
+    second = reopened.get_or_compute(TEXTS, not_expected, 'model-a')
+    assert (reopened.hits, reopened.misses) == (len(TEXTS), 0)
+    np.testing.assert_array_equal(first, second)
+    np.testing.assert_allclose(second, np.asarray(fake_embeddings(TEXTS), dtype=np.float32))
+
+
+def test_models_and_kinds_are_separate(tmp_path):
+    store = EmbeddingStore(str(tmp_path))
+    assert len({text_key(TEXTS[0], 'model-a'), text_key(TEXTS[0], 'model-b'),
+                text_key(TEXTS[0], 'model-a', kind='query')}) == 3
+
+    a = store.get_or_compute(TEXTS[:1], fake_embeddings, 'model-a')
+    b = store.get_or_compute(TEXTS[:1], lambda texts: [-np.asarray(v) for v in fake_embeddings(texts)], 'model-b')
+    query = store.get_or_compute(TEXTS[:1], lambda texts: np.ones((1, a.shape[1])), 'model-a', kind='query')
+    assert store.misses == 3 and len(store) == 3
+    np.testing.assert_array_equal(store.get_or_compute(TEXTS[:1], not_expected, 'model-b'), b)
+    np.testing.assert_array_equal(store.get_or_compute(TEXTS[:1], not_expected, 'model-a', kind='query'), query)
+    np.testing.assert_array_equal(store.get_or_compute(TEXTS[:1], not_expected, 'model-a'), a)
+
+
+def test_torn_tail_is_truncated(tmp_path):
+    store = EmbeddingStore(str(tmp_path))
+    vectors = store.get_or_compute(TEXTS, fake_embeddings, 'model-a')
+    dim = vectors.shape[1]
+    # 마지막 행의 벡터와 키를 쓰다가 중단된 상태
+    os.truncate(store.vectors_path, os.path.getsize(store.vectors_path) - 7)
+    os.truncate(store.hashes_path, os.path.getsize(store.hashes_path) - 3)
+
+    reopened = EmbeddingStore(str(tmp_path))
+    assert len(reopened) == len(TEXTS) - 1
+    assert os.path.getsize(reopened.vectors_path) == (len(TEXTS) - 1) * 4 * dim
+    assert os.path.getsize(reopened.hashes_path) == (len(TEXTS) - 1) * KEY_SIZE
+
+    again = reopened.get_or_compute(TEXTS + ['새 텍스트'], fake_embeddings, 'model-a')
+    assert reopened.misses == 2
+    np.testing.assert_array_equal(again[:len(TEXTS)], vectors)
+
+    final = EmbeddingStore(str(tmp_path))
+    np.testing.assert_array_equal(final.get_or_compute(TEXTS + ['새 텍스트'], not_expected, 'model-a'), again)
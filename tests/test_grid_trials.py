@@ -0,0 +1,92 @@
+import os
+
+import pandas as pd
+import pytest
+import yaml
+
+from grid_trials import expand_grid, prefix_config, run_grid, shared_prefix_length
+from trial_cache import (_cached_prefix_length, _make_trial_dir, import_cache_entries, load_cache, node_cache_keys,
+                         record_trial)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+QA_PATH = os.path.join(ROOT, 'data', 'qa.parquet')
+CORPUS_PATH = os.path.join(ROOT, 'data', 'corpus.parquet')
+
+
+@pytest.fixture
+def tutorial_config():
+    with open(os.path.join(ROOT, 'config', 'tutorial_ko.yaml'), 'r', encoding='utf-8') as f:
+        return yaml.safe_load(f)
+
+
+def test_retrieval_is_shared_by_all_units(tutorial_config):
+    units = expand_grid(tutorial_config)
+    assert len(units) == 4
+    assert shared_prefix_length(units) == 1
+
+    prefix = prefix_config(units[0][1], 1)
+    assert [node_line['node_line_name'] for node_line in prefix['node_lines']] == ['retrieve_node_line']
+    prefix_key = node_cache_keys(prefix, QA_PATH, CORPUS_PATH)[0][2]
+    assert all(node_cache_keys(unit_config, QA_PATH, CORPUS_PATH)[0][2] == prefix_key for _, unit_config in units)
+
+
+def test_nothing_shared_when_retrieval_follows_a_split_node(tutorial_config):
+    tutorial_config['node_lines'].reverse()
+    assert shared_prefix_length(expand_grid(tutorial_config)) == 0
+
+
+def _write_retrieval_trial(project_dir, config):
+    """AutoRAG가 남기는 형식(summary.csv, best_*.parquet)으로 완료된 retrieval 노드 결과를 만듭니다."""
+    os.makedirs(project_dir)
+    trial_name = _make_trial_dir(project_dir)
+    node_dir = os.path.join(project_dir, trial_name, 'retrieve_node_line', 'retrieval')
+    os.makedirs(node_dir)
+    pd.DataFrame({'filename': ['0.parquet'], 'module_name': ['bm25'], 'module_params': ["{'top_k': 3}"],
+                  'execution_time': [0.1], 'is_best': [True]}).to_csv(os.path.join(node_dir, 'summary.csv'),
+                                                                       index=False)
+    pd.DataFrame({'qid': ['q0'], 'retrieved_ids': [['doc0']]}).to_parquet(os.path.join(node_dir, 'best_0.parquet'))
+    keys = node_cache_keys(config, QA_PATH, CORPUS_PATH)
+    record_trial(project_dir, trial_name, keys, {})
+
+
+def test_units_reuse_shared_retrieval(tmp_path, tutorial_config):
+    units = expand_grid(tutorial_config)
+    shared_dir = str(tmp_path / 'shared')
+    _write_retrieval_trial(shared_dir, prefix_config(units[0][1], shared_prefix_length(units)))
+
+    for unit_id, unit_config in units:
+        unit_dir = str(tmp_path / unit_id)
+        os.makedirs(unit_dir)
+        keys = node_cache_keys(unit_config, QA_PATH, CORPUS_PATH)
+        assert import_cache_entries(unit_dir, shared_dir, keys) == 1
+        cache = load_cache(unit_dir)
+        assert cache[keys[0][2]]['project_dir'] == shared_dir
+        assert _cached_prefix_length(unit_dir, keys, cache) == 1
+
+
+def test_grid_end_to_end(tmp_path):
+    pytest.importorskip('autorag')
+    config = {'node_lines': [
+        {'node_line_name': 'retrieve_node_line',
+         'nodes': [{'node_type': 'retrieval', 'strategy': {'metrics': ['retrieval_f1', 'retrieval_recall']},
+                    'top_k': 3, 'modules': [{'module_type': 'bm25', 'bm25_tokenizer': 'ko_kiwi'}]}]},
+        {'node_line_name': 'post_retrieve_node_line',
+         'nodes': [{'node_type': 'prompt_maker',
+                    'strategy': {'metrics': ['bleu', 'rouge'],
+                                 'generator_modules': [{'module_type': 'llama_index_llm', 'llm': 'mock'}]},
+                    'modules': [{'module_type': 'fstring',
+                                 'prompt': ['질문: {query} 단락: {retrieved_contents} 답변:',
+                                            '단락: {retrieved_contents} 질문: {query} 답변:']}]}]},
+    ]}
+    config_path = str(tmp_path / 'config.yaml')
+    with open(config_path, 'w', encoding='utf-8') as f:
+        yaml.safe_dump(config, f, allow_unicode=True)
+    project_dir = str(tmp_path / 'project')
+
+    leaderboard = run_grid(config_path, QA_PATH, CORPUS_PATH, project_dir, workers=2)
+    assert len(leaderboard) == 2
+    # corpus 적재와 retrieval은 shared에서 한 번만 실행되고 unit들은 그 결과를 복사해 씁니다.
+    assert os.path.exists(os.path.join(project_dir, 'grid', 'shared', 'resources', 'bm25_ko_kiwi.pkl'))
+    for trial_dir in leaderboard['trial_dir']:
+        assert not os.path.exists(os.path.join(os.path.dirname(trial_dir), 'resources', 'bm25_ko_kiwi.pkl'))
+        assert os.path.exists(os.path.join(trial_dir, 'retrieve_node_line', 'retrieval', 'summary.csv'))
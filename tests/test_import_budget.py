@@ -0,0 +1,9 @@
+from import_budget import check_budgets
+
+
+def test_entry_points_within_import_budget():
+    results = check_budgets()
+    failures = {result['module']: result['error'] or f"{result['milliseconds']:.1f}ms / {result['budget']}ms, "
+                                                    f"heavy={result['heavy']}"
+                for result in results if not result['ok']}
+    assert not failures, failures
@@ -0,0 +1,59 @@
+import multiprocessing
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+SCRIPT = textwrap.dedent("""
+    import multiprocessing
+    import sys
+    from concurrent.futures import ProcessPoolExecutor
+
+    from instrumentation import span
+
+
+    def work(i):
+        with span('child', document=i) as s:
+            with span('child_step'):
+                s.count('pages', 2)
+        return i
+
+
+    if __name__ == '__main__':
+        with span('parent'):
+            pass
+        context = multiprocessing.get_context(sys.argv[1])
+        with ProcessPoolExecutor(2, mp_context=context) as executor:
+            assert list(executor.map(work, range(6))) == list(range(6))
+        with context.Pool(2) as pool:
+            pool.map(work, range(6))
+            pool.terminate()
+""")
+
+
+@pytest.mark.parametrize('start_method', ['fork', 'spawn'])
+def test_worker_processes_write_per_pid_files(tmp_path, start_method):
+    if start_method not in multiprocessing.get_all_start_methods():
+        pytest.skip(f'{start_method} 시작 방식을 지원하지 않습니다.')
+    root_dir = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+    script_path = tmp_path / 'traced.py'
+    script_path.write_text(SCRIPT, encoding='utf-8')
+    prom_path = tmp_path / 'trace.prom'
+    env = {**os.environ, 'PIPELINE_TRACE_PROM': str(prom_path),
+           'PYTHONPATH': os.pathsep.join(filter(None, [root_dir, os.environ.get('PYTHONPATH')]))}
+    subprocess.run([sys.executable, str(script_path), start_method], cwd=tmp_path, env=env, check=True, timeout=120)
+
+    parent_text = prom_path.read_text(encoding='utf-8')
+    assert 'stage="parent"' in parent_text and 'stage="child"' not in parent_text
+    worker_files = sorted(tmp_path.glob('trace.*.prom'))
+    assert worker_files
+    pages = 0.0
+    for path in worker_files:
+        text = path.read_text(encoding='utf-8')
+        assert f'pid="{path.name.split(".")[1]}"' in text
+        pages += sum(float(line.rsplit(' ', 1)[1]) for line in text.splitlines()
+                     if line.startswith('pipeline_stage_counter_total{stage="child",counter="pages"'))
+    assert pages == 2 * 12
+    assert not list(tmp_path.glob('*.tmp*'))
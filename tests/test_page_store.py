@@ -0,0 +1,42 @@
+import os
+
+from page_store import INDEX_DTYPE, PageStore
+
+DOC_A = '0' * 32
+DOC_B = '1' * 32
+
+
+def test_round_trip(tmp_path):
+    store = PageStore(str(tmp_path))
+    store.put_pages(DOC_A, [(1, '첫 페이지'), (2, '')], name='약관')
+    store.put(DOC_A, 1, '다시 쓴 첫 페이지')
+
+    reopened = PageStore(str(tmp_path))
+    assert reopened.pages(DOC_A) == [(1, '다시 쓴 첫 페이지'), (2, '')]
+    assert reopened.find('약관') == [DOC_A]
+
+
+def test_torn_index_record_is_truncated(tmp_path):
+    store = PageStore(str(tmp_path))
+    store.put_pages(DOC_A, [(1, '첫 페이지'), (2, '둘째 페이지')])
+    index_path = os.path.join(str(tmp_path), 'pages.idx')
+    os.truncate(index_path, os.path.getsize(index_path) - 10)
+
+    store = PageStore(str(tmp_path))
+    assert os.path.getsize(index_path) % INDEX_DTYPE.itemsize == 0
+    assert store.pages(DOC_A) == [(1, '첫 페이지')]
+    store.put_pages(DOC_B, [(1, '새 문서')])
+
+    reopened = PageStore(str(tmp_path))
+    assert reopened.pages(DOC_B) == [(1, '새 문서')]
+    assert reopened.pages(DOC_A) == [(1, '첫 페이지')]
+
+
+def test_index_ahead_of_data_is_dropped(tmp_path):
+    store = PageStore(str(tmp_path))
+    store.put_pages(DOC_A, [(1, '첫 페이지'), (2, '둘째 페이지')])
+    data_path = os.path.join(str(tmp_path), 'pages.dat')
+    os.truncate(data_path, os.path.getsize(data_path) - 1)
+
+    store = PageStore(str(tmp_path))
+    assert store.pages(DOC_A) == [(1, '첫 페이지')]
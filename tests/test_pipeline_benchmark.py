@@ -0,0 +1,29 @@
+import json
+
+from click.testing import CliRunner
+
+import pipeline_benchmark
+
+OK_RESULT = {'stage': 'corpus_parquet_write', 'scale': 1, 'pages': 10, 'bytes': 1000, 'seconds': 0.1,
+             'mb_per_sec': 0.01}
+ERROR_RESULT = {'stage': 'pdf_text_extraction', 'scale': 1, 'error': 'ModuleNotFoundError: fitz'}
+
+
+def _run_save_baseline(tmp_path, monkeypatch, results):
+    monkeypatch.setattr(pipeline_benchmark, 'run_benchmarks', lambda stages, scales: results)
+    baseline = tmp_path / 'baseline.json'
+    result = CliRunner().invoke(pipeline_benchmark.main, ['--save_baseline', '--baseline', str(baseline)])
+    return result, baseline
+
+
+def test_save_baseline(tmp_path, monkeypatch):
+    result, baseline = _run_save_baseline(tmp_path, monkeypatch, [OK_RESULT])
+    assert result.exit_code == 0
+    assert json.loads(baseline.read_text(encoding='utf-8'))['results'] == [OK_RESULT]
+
+
+def test_save_baseline_refuses_failed_stages(tmp_path, monkeypatch):
+    result, baseline = _run_save_baseline(tmp_path, monkeypatch, [OK_RESULT, ERROR_RESULT])
+    assert result.exit_code == 1
+    assert not baseline.exists()
+    assert 'pdf_text_extraction 1x' in result.output
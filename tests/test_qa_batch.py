@@ -0,0 +1,75 @@
+import os
+
+import pandas as pd
+import pytest
+
+from qa_batch import BatchFailedError, LocalBatchClient, make_batch_qa
+
+PROMPT = '다음 단락으로 질문 {{num_questions}}개를 만드세요.\n단락: {{text}}'
+
+
+@pytest.fixture
+def corpus_df():
+    return pd.DataFrame({'doc_id': [f'doc{i}' for i in range(6)],
+                         'contents': [f'제{i}조 회사는 보험금을 지급합니다. 계약자는 보험료를 납입합니다.' for i in range(6)]})
+
+
+class StuckClient(LocalBatchClient):
+    """상태 조회 결과를 정해 둔 LocalBatchClient"""
+
+    def __init__(self, work_dir, result):
+        super().__init__(work_dir)
+        self.result = result
+
+    def status(self, batch_id):
+        return self.result
+
+
+def test_local_batch_round_trip(tmp_path, corpus_df):
+    batch_dir = str(tmp_path)
+    qa_df = make_batch_qa(corpus_df, PROMPT, batch_dir, LocalBatchClient(str(tmp_path / 'local')), content_size=3,
+                          poll_interval=0, random_state=0)
+    assert len(qa_df) > 0
+    assert set(doc for gt in qa_df['retrieval_gt'] for doc in gt[0]) <= set(corpus_df['doc_id'])
+    assert not os.path.exists(tmp_path / 'local_batch_state.json')
+
+
+@pytest.mark.parametrize('result', [('expired', None), ('completed', None)])
+def test_finished_batch_without_output_clears_state(tmp_path, corpus_df, result):
+    client = StuckClient(str(tmp_path / 'local'), result)
+    with pytest.raises(BatchFailedError):
+        make_batch_qa(corpus_df, PROMPT, str(tmp_path), client, content_size=3, poll_interval=0)
+    assert not os.path.exists(tmp_path / 'local_batch_state.json')
+
+
+def test_timeout_keeps_state_and_resume_checks_settings(tmp_path, corpus_df):
+    batch_dir = str(tmp_path)
+    client = StuckClient(str(tmp_path / 'local'), ('in_progress', None))
+    with pytest.raises(TimeoutError):
+        make_batch_qa(corpus_df, PROMPT, batch_dir, client, content_size=3, poll_interval=0, timeout=0)
+    assert os.path.exists(tmp_path / 'local_batch_state.json')
+
+    with pytest.raises(ValueError, match='content_size'):
+        make_batch_qa(corpus_df, PROMPT, batch_dir, client, content_size=4, poll_interval=0)
+    changed_df = corpus_df.assign(contents=corpus_df['contents'] + ' 개정')
+    with pytest.raises(ValueError, match='corpus'):
+        make_batch_qa(changed_df, PROMPT, batch_dir, client, content_size=3, poll_interval=0)
+
+    qa_df = make_batch_qa(corpus_df, PROMPT, batch_dir, LocalBatchClient(str(tmp_path / 'local')), content_size=3,
+                          poll_interval=0)
+    assert len(qa_df) > 0
+    assert not os.path.exists(tmp_path / 'local_batch_state.json')
+
+
+def test_clients_use_separate_state(tmp_path, corpus_df):
+    class PendingOpenAIClient(StuckClient):
+        name = 'openai'
+
+    with pytest.raises(TimeoutError):
+        make_batch_qa(corpus_df, PROMPT, str(tmp_path), PendingOpenAIClient(str(tmp_path / 'openai'),
+                                                                          ('in_progress', None)),
+                      content_size=3, poll_interval=0, timeout=0)
+    qa_df = make_batch_qa(corpus_df, PROMPT, str(tmp_path), LocalBatchClient(str(tmp_path / 'local')),
+                          content_size=2, poll_interval=0)
+    assert len(qa_df) > 0
+    assert os.path.exists(tmp_path / 'openai_batch_state.json')
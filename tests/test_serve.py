@@ -0,0 +1,91 @@
+import asyncio
+
+import pandas as pd
+import pytest
+
+pytest.importorskip('aiohttp')
+pytest.importorskip('kiwipiepy')
+
+from serve import build_service, create_app  # noqa: E402
+
+CONTENTS = [
+    '미성년자가 법정대리인의 동의 없이 맺은 계약은 취소할 수 있습니다.',
+    '회사는 피보험자가 암으로 진단확정된 경우 암진단비를 지급합니다.',
+    '계약자는 청약할 때 회사가 서면으로 질문한 사항에 대하여 사실대로 알려야 합니다.',
+    '보험료의 납입이 연체되는 경우 회사는 14일 이상의 납입최고기간을 정하여 알려드립니다.',
+    '계약자는 계약이 소멸하기 전에 언제든지 계약을 해지할 수 있습니다.',
+]
+PIPELINE = {
+    'retrieval': {'module_type': 'hybrid_cc', 'top_k': 2, 'weight': 0.5},
+    'prompt_maker': {'module_type': 'fstring',
+                     'prompt': '단락을 읽고 질문에 답하세요.\n단락: {retrieved_contents}\n질문: {query}\n답변:'},
+    'generator': {'module_type': 'openai_llm', 'llm': 'gpt-3.5-turbo', 'batch': 4},
+}
+
+
+@pytest.fixture
+def service(tmp_path):
+    corpus_df = pd.DataFrame({'doc_id': [f'doc{i}' for i in range(len(CONTENTS))], 'contents': CONTENTS})
+    return build_service(PIPELINE, corpus_df, str(tmp_path / 'bm25_index'), str(tmp_path / 'embedding_cache'),
+                         fake=True, max_batch=32, max_wait_ms=50)
+
+
+def test_concurrent_queries_are_batched(service):
+    queries = [f'{content[:12]} {i}' for i, content in enumerate(CONTENTS * 4)]
+
+    async def run():
+        service.batcher.start()
+        try:
+            return await asyncio.gather(*(service.answer(query) for query in queries))
+        finally:
+            await service.batcher.stop()
+
+    results = asyncio.run(run())
+    assert [result['query'] for result in results] == queries
+    assert all(len(result['retrieved']) == 2 and result['answer'] for result in results)
+    assert max(service.batcher.batch_sizes) > 1
+    assert sum(service.batcher.batch_sizes) == len(queries)
+
+
+def test_query_endpoint(service):
+    from aiohttp.test_utils import TestClient, TestServer
+
+    async def run():
+        async with TestClient(TestServer(create_app(service))) as client:
+            response = await client.post('/query', json={'query': '미성년자 계약은 취소할 수 있나요?'})
+            assert response.status == 200
+            body = await response.json()
+            assert body['retrieved'][0]['doc_id'] == 'doc0'
+            assert body['answer']
+
+            for data in ('not json', '{"query": ""}', '["query"]'):
+                response = await client.post('/query', data=data)
+                assert response.status == 400
+
+    asyncio.run(run())
+
+
+def test_parent_expansion(tmp_path):
+    from parent_corpus import ParentLookup
+
+    parents_df = pd.DataFrame({'parent_id': ['p0', 'p1'],
+                               'contents': ['제1조(계약의 취소)\n' + '\n'.join(CONTENTS[:2]),
+                                            '제2조(계약 전 알릴 의무)\n' + '\n'.join(CONTENTS[2:])]})
+    corpus_df = pd.DataFrame({'doc_id': [f'doc{i}' for i in range(len(CONTENTS))], 'contents': CONTENTS,
+                              'parent_id': ['p0', 'p0', 'p1', 'p1', 'p1']})
+    service = build_service(PIPELINE, corpus_df[['doc_id', 'contents']], str(tmp_path / 'bm25_index'),
+                            str(tmp_path / 'embedding_cache'), fake=True,
+                            parent_lookup=ParentLookup(corpus_df, parents_df))
+
+    async def run():
+        service.batcher.start()
+        try:
+            return await service.answer('미성년자가 맺은 계약은 취소할 수 있나요?')
+        finally:
+            await service.batcher.stop()
+
+    result = asyncio.run(run())
+    parent_ids = [parent['parent_id'] for parent in result['parents']]
+    assert parent_ids[0] == 'p0' and len(parent_ids) == len(set(parent_ids))
+    assert result['parents'][0]['contents'].startswith('제1조(계약의 취소)')
+    assert '제1조(계약의 취소)' in result['prompt']
@@ -0,0 +1,238 @@
+"""
+main.py 평가(trial) 결과 캐시
+
+Evaluator.start_trial은 매번 모든 노드를 처음부터 다시 실행합니다. 이 모듈은 노드별 캐시 키를
+corpus/qa 파일 해시와 "앞선 노드들의 설정 + 해당 노드 설정"으로 만들고, project_dir의 이전 trial에서
+같은 키로 실행된 노드 결과 디렉토리를 새 trial로 복사하여 재사용합니다.
+예를 들어 generator의 temperature만 바꾸면 retrieval, prompt_maker 노드는 복사되고 generator만 실행됩니다.
+
+캐시 색인은 project_dir/trial_cache.json 에 저장됩니다.
+{캐시 키: {"trial": "0", "node_line": "retrieve_node_line", "node_type": "retrieval"}}
+다른 project_dir의 결과를 가리키는 항목은 "project_dir"에 그 경로를 가집니다 (import_cache_entries, main.py --grid).
+"""
+
+import glob
+import hashlib
+import json
+import os
+import shutil
+from datetime import datetime
+
+import pandas as pd
+import yaml
+
+CACHE_FILE = 'trial_cache.json'
+# 이 노드 타입은 실행 전에 corpus 적재(ingest)가 필요하므로 캐시가 끊기면 전체 trial로 실행합니다.
+INGEST_NODE_TYPES = {'retrieval'}
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """파일 내용의 sha256 해시를 계산합니다."""
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(chunk_size), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def _hash_config(value):
+    return json.dumps(value, sort_keys=True, ensure_ascii=False, default=str)
+
+
+def node_cache_keys(config, qa_path, corpus_path):
+    """
+    설정의 노드마다 캐시 키를 만듭니다. 노드 결과는 앞선 노드들의 결과에 의존하므로
+    키는 이전 노드 키에 현재 노드 설정을 이어 붙여 해시합니다.
+
+    매개변수:
+    - config: YAML 설정 딕셔너리
+    - qa_path, corpus_path: 평가 데이터 경로
+
+    반환값:
+    - list: (node_line_name, node_dict, key) 튜플 리스트 (실행 순서)
+    """
+    global_config = {k: v for k, v in config.items() if k != 'node_lines'}
+    key = hashlib.sha256('|'.join([file_hash(corpus_path), file_hash(qa_path),
+                                   _hash_config(global_config)]).encode('utf-8')).hexdigest()
+    keys = []
+    for node_line in config['node_lines']:
+        for node_dict in node_line['nodes']:
+            key = hashlib.sha256((key + _hash_config(node_dict)).encode('utf-8')).hexdigest()
+            keys.append((node_line['node_line_name'], node_dict, key))
+    return keys
+
+
+def load_cache(project_dir):
+    cache_path = os.path.join(project_dir, CACHE_FILE)
+    if not os.path.exists(cache_path):
+        return {}
+    with open(cache_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_cache(project_dir, cache):
+    with open(os.path.join(project_dir, CACHE_FILE), 'w', encoding='utf-8') as f:
+        json.dump(cache, f, indent=4, ensure_ascii=False)
+
+
+def _node_dir(project_dir, entry):
+    return os.path.join(entry.get('project_dir', project_dir), entry['trial'], entry['node_line'], entry['node_type'])
+
+
+def _best_result_path(node_dir):
+    best_files = glob.glob(os.path.join(node_dir, 'best_*.parquet'))
+    return best_files[0] if best_files else None
+
+
+def _is_complete(node_dir):
+    return os.path.exists(os.path.join(node_dir, 'summary.csv')) and _best_result_path(node_dir) is not None
+
+
+def _cached_prefix_length(project_dir, keys, cache):
+    """앞에서부터 연속으로 캐시된 노드 개수를 셉니다."""
+    count = 0
+    for _, _, key in keys:
+        entry = cache.get(key)
+        if entry is None or not _is_complete(_node_dir(project_dir, entry)):
+            break
+        count += 1
+    return count
+
+
+def _read_trials(project_dir):
+    trial_json_path = os.path.join(project_dir, 'trial.json')
+    if not os.path.exists(trial_json_path):
+        return []
+    with open(trial_json_path, 'r') as f:
+        return json.load(f)
+
+
+def _make_trial_dir(project_dir):
+    """Evaluator와 같은 형식으로 trial.json에 새 trial을 추가하고 디렉토리를 만듭니다."""
+    trials = _read_trials(project_dir)
+    trial_name = str(int(trials[-1]['trial_name']) + 1) if trials else '0'
+    trials.append({
+        'trial_name': trial_name,
+        'start_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+    })
+    os.makedirs(os.path.join(project_dir, trial_name))
+    with open(os.path.join(project_dir, 'trial.json'), 'w') as f:
+        json.dump(trials, f, indent=4)
+    return trial_name
+
+
+def _best_node_summary(node_dir, node_type):
+    node_summary_df = pd.read_csv(os.path.join(node_dir, 'summary.csv'))
+    best_node_row = node_summary_df.loc[node_summary_df['is_best']]
+    return {
+        'node_type': node_type,
+        'best_module_filename': best_node_row['filename'].values[0],
+        'best_module_name': best_node_row['module_name'].values[0],
+        'best_module_params': best_node_row['module_params'].values[0],
+        'best_execution_time': best_node_row['execution_time'].values[0],
+    }
+
+
+def record_trial(project_dir, trial_name, keys, cache):
+    """완료된 trial의 노드 결과를 캐시 색인에 등록합니다."""
+    for node_line_name, node_dict, key in keys:
+        entry = {'trial': trial_name, 'node_line': node_line_name, 'node_type': node_dict['node_type']}
+        if key not in cache and _is_complete(_node_dir(project_dir, entry)):
+            cache[key] = entry
+    save_cache(project_dir, cache)
+
+
+def import_cache_entries(project_dir, source_dir, keys):
+    """
+    다른 project_dir(source_dir)에서 완료된 앞부분 노드 결과를 project_dir의 캐시 색인에 등록합니다.
+    노드 결과는 복사하지 않고 source_dir을 가리키며, 다음 trial에서 필요할 때 복사됩니다.
+
+    매개변수:
+    - project_dir: 캐시 항목을 등록할 project_dir
+    - source_dir: 노드 결과가 있는 project_dir
+    - keys: node_cache_keys의 반환값
+
+    반환값:
+    - int: 등록된 (또는 이미 있던) 앞부분 노드 개수
+    """
+    source_cache = load_cache(source_dir)
+    cache = load_cache(project_dir)
+    count = 0
+    for _, _, key in keys:
+        entry = source_cache.get(key)
+        if entry is None:
+            break
+        entry = {**entry, 'project_dir': os.path.abspath(entry.get('project_dir', source_dir))}
+        if not _is_complete(_node_dir(project_dir, entry)):
+            break
+        if key not in cache or not _is_complete(_node_dir(project_dir, cache[key])):
+            cache[key] = entry
+        count += 1
+    save_cache(project_dir, cache)
+    return count
+
+
+def _run_partial_trial(project_dir, config_path, config, keys, cached_count, cache):
+    """캐시된 앞부분 노드는 복사하고 나머지 노드만 실행합니다."""
+    trial_name = _make_trial_dir(project_dir)
+    trial_dir = os.path.join(project_dir, trial_name)
+    shutil.copy(config_path, os.path.join(trial_dir, 'config.yaml'))
+
+    previous_result = pd.read_parquet(os.path.join(project_dir, 'data', 'qa.parquet'), engine='pyarrow')
+    trial_summary = []
+    key_iter = iter(enumerate(keys))
+    for node_line in config['node_lines']:
+        node_line_name = node_line['node_line_name']
+        node_line_dir = os.path.join(trial_dir, node_line_name)
+        os.makedirs(node_line_dir, exist_ok=False)
+        node_line_summary = []
+        for node_dict in node_line['nodes']:
+            i, (_, _, key) = next(key_iter)
+            node_type = node_dict['node_type']
+            node_dir = os.path.join(node_line_dir, node_type)
+            if i < cached_count:
+                cached_dir = _node_dir(project_dir, cache[key])
+                print(f"캐시 재사용: {node_line_name}/{node_type} (trial {cache[key]['trial']})")
+                shutil.copytree(cached_dir, node_dir)
+                previous_result = pd.read_parquet(_best_result_path(node_dir), engine='pyarrow')
+            else:
+                from autorag.schema import Node
+
+                print(f"노드 실행: {node_line_name}/{node_type}")
+                previous_result = Node.from_dict(node_dict).run(previous_result, node_line_dir)
+            node_line_summary.append(_best_node_summary(node_dir, node_type))
+        pd.DataFrame(node_line_summary).to_csv(os.path.join(node_line_dir, 'summary.csv'), index=False)
+        trial_summary.extend({'node_line_name': node_line_name, **row} for row in node_line_summary)
+
+    pd.DataFrame(trial_summary).to_csv(os.path.join(trial_dir, 'summary.csv'), index=False)
+    return trial_name
+
+
+def start_cached_trial(evaluator, config_path, qa_path, corpus_path, project_dir):
+    """
+    캐시를 이용하여 trial을 실행합니다. 재사용할 노드가 없으면 evaluator.start_trial을 그대로 호출합니다.
+
+    매개변수:
+    - evaluator: autorag.evaluator.Evaluator 인스턴스
+    - config_path: YAML 설정 파일 경로
+    - qa_path, corpus_path: 평가 데이터 경로 (캐시 키 계산용)
+    - project_dir: Evaluator의 project_dir
+
+    반환값:
+    - str: 실행된 trial 이름
+    """
+    with open(config_path, 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f)
+    keys = node_cache_keys(config, qa_path, corpus_path)
+    cache = load_cache(project_dir)
+    cached_count = _cached_prefix_length(project_dir, keys, cache)
+    remaining_types = {node_dict['node_type'] for _, node_dict, _ in keys[cached_count:]}
+
+    print(f"캐시된 노드 {cached_count}/{len(keys)}개")
+    if cached_count == 0 or remaining_types & INGEST_NODE_TYPES:
+        evaluator.start_trial(config_path)
+        trial_name = _read_trials(project_dir)[-1]['trial_name']
+    else:
+        trial_name = _run_partial_trial(project_dir, config_path, config, keys, cached_count, cache)
+    record_trial(project_dir, trial_name, keys, cache)
+    return trial_name